@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+# Cold-start benchmark (standard library only, so it runs on the phone/tablet server itself).
+# Each run uses a fresh interpreter: first `import server` on its own (time, and which heavy
+# optional modules it pulled in), then a spawned server timed from process start until it answers
+# its first HTTP request (index page) and its first socket.io handshake.
+#
+#   python bench_startup.py                                   # 5 runs
+#   python bench_startup.py --runs 10 --report after.json --compare before.json
+#   python bench_startup.py --server-env WEBRTC_ENABLED=0
+
+HEAVY_MODULES = ("aiortc", "av", "openai", "deep_translator", "pandas")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import server
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def median(values):
+    ordered = sorted(v for v in values if v is not None)
+    if not ordered:
+        return None
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def git_label():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def server_env(args):
+    env = dict(os.environ)
+    for item in args.server_env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    return env
+
+
+def measure_import(args):
+    """Process start -> `import server` done, in a fresh interpreter"""
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=server_env(args), capture_output=True, text=True)
+    process_seconds = time.perf_counter() - started
+    if out.returncode != 0:
+        raise RuntimeError(f"import server failed:\n{out.stderr[-2000:]}")
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = process_seconds
+    return result
+
+
+def get(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_server(args):
+    """Spawn uvicorn and time the first answered page request and socket.io handshake"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:sio_app", "--port", str(port), "--log-level", "warning"],
+        env=server_env(args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {'first_request_seconds': None, 'first_socketio_seconds': None, 'startup': None}
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline:
+            try:
+                get(f"{url}/")
+                result['first_request_seconds'] = time.perf_counter() - started
+                break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.01)
+        if result['first_request_seconds'] is None:
+            raise RuntimeError("server did not answer within --timeout")
+        get(f"{url}/socket.io/?EIO=4&transport=polling")
+        result['first_socketio_seconds'] = time.perf_counter() - started
+        try:
+            result['startup'] = json.loads(get(f"{url}/api/startup")[1])
+        except urllib.error.HTTPError:
+            pass  # older build without /api/startup
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def run(args):
+    imports = []
+    servers = []
+    for i in range(args.runs):
+        imports.append(measure_import(args))
+        servers.append(measure_server(args))
+        print(f"run {i + 1}/{args.runs}: import {ms(imports[-1]['seconds'])} ms, "
+              f"first request {ms(servers[-1]['first_request_seconds'])} ms")
+    startup = servers[-1]['startup'] or {}
+    return {
+        'label': args.label or git_label(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('report', 'compare', 'label')},
+        'import_ms': ms(median(r['seconds'] for r in imports)),
+        'import_process_ms': ms(median(r['process_seconds'] for r in imports)),
+        'loaded_on_import': imports[-1]['loaded'],
+        'first_request_ms': ms(median(r['first_request_seconds'] for r in servers)),
+        'first_socketio_ms': ms(median(r['first_socketio_seconds'] for r in servers)),
+        'startup_hooks_ms': ms(median((r['startup'] or {}).get('startup_seconds') for r in servers)),
+        'loaded_after_first_request': [m for m, loaded in startup.get('loaded', {}).items() if loaded],
+        'runs': {'import': imports, 'server': servers},
+    }
+
+
+HEADLINE = [
+    ('import ms', 'import_ms'),
+    ('import process ms', 'import_process_ms'),
+    ('first request ms', 'first_request_ms'),
+    ('first socket.io ms', 'first_socketio_ms'),
+    ('startup hooks ms', 'startup_hooks_ms'),
+    ('heavy on import', 'loaded_on_import'),
+]
+
+
+def cell(value):
+    if isinstance(value, list):
+        return ",".join(value) or "-"
+    return str(value)
+
+
+def print_summary(report, baseline=None):
+    title = f"{'':<20}{report['label']:>14}"
+    print("\n" + (title + f"{baseline['label']:>14}" if baseline else title))
+    for name, key in HEADLINE:
+        line = f"{name:<20}{cell(report.get(key)):>14}"
+        if baseline:
+            line += f"  {cell(baseline.get(key))}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-request benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the first answer")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE", help="environment of the spawned server")
+    parser.add_argument("--label", help="build label in the report (default: git describe)")
+    parser.add_argument("--report", help="JSON report path (default: startup_report_<time>.json)")
+    parser.add_argument("--compare", help="earlier report to print side by side")
+    args = parser.parse_args()
+
+    report = run(args)
+    path = args.report or f"startup_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+    print(f"\nReport written to {path}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("Benchmark Stopped")
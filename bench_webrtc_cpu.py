@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import fractions
+import math
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import socketio
+from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc.contrib.media import MediaBlackhole
+from aiortc.mediastreams import AudioStreamTrack
+from av import AudioFrame
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Measures server CPU per additional WebRTC listener.
+# Starts server.py once per forwarding mode, connects a guide that sends a 440 Hz tone,
+# then adds tourists step by step and samples the server process CPU at each step.
+#
+#   python bench_webrtc_cpu.py                       # both modes, 0..30 listeners
+#   python bench_webrtc_cpu.py --modes encode-once --max 60 --step 10
+
+SAMPLE_RATE = 48000
+FRAME_SAMPLES = 960  # 20 ms
+
+
+class ToneTrack(AudioStreamTrack):
+    """Mono 440 Hz tone, paced in real time like a microphone"""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = 0
+        self.started = None
+
+    async def recv(self):
+        if self.started is None:
+            self.started = time.time()
+        wait = self.started + self.samples / SAMPLE_RATE - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        t = (np.arange(FRAME_SAMPLES) + self.samples) / SAMPLE_RATE
+        pcm = (np.sin(2 * math.pi * 440 * t) * 8000).astype(np.int16)
+        frame = AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        frame.pts = self.samples
+        frame.time_base = fractions.Fraction(1, SAMPLE_RATE)
+        self.samples += FRAME_SAMPLES
+        return frame
+
+
+async def connect_peer(url, role, track=None):
+    client = socketio.AsyncClient()
+    answered = asyncio.get_running_loop().create_future()
+
+    @client.on('answer')
+    async def on_answer(data):
+        if not answered.done():
+            answered.set_result(data)
+
+    @client.on('webrtc_unavailable')
+    async def on_unavailable(data):
+        if not answered.done():
+            answered.set_result(None)
+
+    await client.connect(url)
+    await client.call('join_room', {'role': role})
+    pc = RTCPeerConnection()
+    sink = None
+    if track is not None:
+        pc.addTrack(track)
+    else:
+        pc.addTransceiver('audio', direction='recvonly')
+        sink = MediaBlackhole()
+
+        @pc.on('track')
+        def on_track(remote):
+            sink.addTrack(remote)
+            asyncio.ensure_future(sink.start())
+
+    await pc.setLocalDescription(await pc.createOffer())
+    await client.emit('offer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type, 'role': role})
+    answer = await asyncio.wait_for(answered, 15)
+    if answer is None:
+        raise RuntimeError("server refused the peer connection (MAX_PEER_CONNECTIONS?)")
+    await pc.setRemoteDescription(RTCSessionDescription(**answer))
+    return client, pc, sink
+
+
+async def close_peer(peer):
+    client, pc, sink = peer
+    if sink is not None:
+        await sink.stop()
+    await pc.close()
+    await client.disconnect()
+
+
+def sample_cpu(proc, seconds):
+    proc.cpu_percent(None)
+    time.sleep(seconds)
+    return proc.cpu_percent(None)
+
+
+async def bench_mode(mode, args):
+    env = dict(os.environ, WEBRTC_FORWARDING=mode, MAX_PEER_CONNECTIONS=str(args.max + 10))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:sio_app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://localhost:{args.port}"
+    results = []
+    peers = []
+    try:
+        for _ in range(60):
+            try:
+                await asyncio.sleep(0.5)
+                guide = await connect_peer(url, 'guide', ToneTrack())
+                break
+            except Exception:
+                continue
+        else:
+            raise RuntimeError("server did not start")
+        await asyncio.sleep(2)
+        proc = psutil.Process(server.pid)
+
+        listeners = 0
+        while True:
+            await asyncio.sleep(args.settle)
+            cpu = await asyncio.to_thread(sample_cpu, proc, args.window)
+            results.append((listeners, cpu))
+            print(f"  [{mode}] {listeners:3d} listeners: {cpu:6.1f}% CPU")
+            if listeners >= args.max:
+                break
+            for _ in range(args.step):
+                peers.append(await connect_peer(url, 'tourist'))
+            listeners += args.step
+
+        for peer in peers:
+            await close_peer(peer)
+        await close_peer(guide)
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def per_listener(results):
+    """Least-squares slope of CPU% over listener count"""
+    xs = [n for n, _ in results]
+    ys = [cpu for _, cpu in results]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / den if den else 0.0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Server CPU per additional WebRTC listener")
+    parser.add_argument("--modes", default="per-listener,encode-once")
+    parser.add_argument("--max", type=int, default=30, help="listeners at the last step")
+    parser.add_argument("--step", type=int, default=5)
+    parser.add_argument("--window", type=float, default=5.0, help="seconds of CPU sampling per step")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait after adding listeners")
+    parser.add_argument("--port", type=int, default=5077)
+    args = parser.parse_args()
+
+    if psutil is None:
+        print("psutil is required: pip install psutil")
+        return
+
+    summary = {}
+    for mode in args.modes.split(","):
+        print(f"Benchmarking WEBRTC_FORWARDING={mode}")
+        results = await bench_mode(mode, args)
+        summary[mode] = (results, per_listener(results))
+
+    print("\nmode            base CPU   CPU @max   CPU per listener")
+    for mode, (results, slope) in summary.items():
+        print(f"{mode:<15} {results[0][1]:7.1f}%  {results[-1][1]:8.1f}%  {slope:10.2f}%")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Benchmark Stopped")
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import socketio
+
+# Local multi-worker check: starts local_broker.py and the server with 2 workers (no SSL),
+# spreads tourists over both workers and verifies that presence, guide state, transcripts
+# and WS audio reach clients on the worker that does not host the guide.
+#
+#   python cluster_test.py
+
+WORKERS = 2
+PORT = 5071
+BROKER_PORT = 6399
+SERVER_URL = f"http://localhost:{PORT}"
+
+
+class Probe:
+    def __init__(self, role, language='en'):
+        self.role = role
+        self.language = language
+        self.sio = socketio.AsyncClient()
+        self.worker = None
+        self.events = {}
+        self.audio_chunks = 0
+        self.ack = None
+
+        @self.sio.on('connection_success')
+        async def on_connected(data):
+            self.worker = data.get('worker')
+
+        @self.sio.on('*')
+        async def on_event(event, *args):
+            self.events.setdefault(event, []).append(args[0] if args else None)
+
+        @self.sio.on('audio_chunk')
+        async def on_audio(data):
+            self.audio_chunks += 1
+
+    async def connect(self):
+        await self.sio.connect(SERVER_URL, transports=['websocket'])
+        for _ in range(50):
+            if self.worker:
+                break
+            await asyncio.sleep(0.05)
+        self.ack = await self.sio.call('join_room', {'role': self.role, 'language': self.language})
+
+
+async def spread(role, per_worker, language='en'):
+    """Connect clients until each worker has per_worker of them (new connections land randomly)"""
+    by_worker = {}
+    extra = []
+    for _ in range(60):
+        probe = Probe(role, language)
+        await probe.connect()
+        if len(by_worker.setdefault(probe.worker, [])) < per_worker:
+            by_worker[probe.worker].append(probe)
+        else:
+            extra.append(probe)
+        if len(by_worker) == WORKERS and all(len(p) >= per_worker for p in by_worker.values()):
+            break
+    for probe in extra:
+        await probe.sio.disconnect()
+    return by_worker
+
+
+def check(name, ok):
+    print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    return ok
+
+
+async def main():
+    env = dict(os.environ, CLIENT_MANAGER_URL=f"redis://127.0.0.1:{BROKER_PORT}/0", TRANSLATOR_BACKEND="stub",
+               MONITOR_UPDATE_INTERVAL="0.2")
+    broker = subprocess.Popen([sys.executable, "local_broker.py", "--port", str(BROKER_PORT)])
+    time.sleep(0.5)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:sio_app", "--port", str(PORT),
+                               "--workers", str(WORKERS), "--log-level", "warning"], env=env)
+    results = []
+    try:
+        for _ in range(60):
+            try:
+                httpx.get(f"{SERVER_URL}/api/cluster")
+                break
+            except httpx.HTTPError:
+                await asyncio.sleep(0.5)
+        await asyncio.sleep(1)
+
+        tourists = await spread('tourist', 2, 'ja')
+        guide = Probe('guide')
+        await guide.connect()
+        remote = [p for worker, probes in tourists.items() if worker != guide.worker for p in probes]
+        local = tourists.get(guide.worker, [])
+        print(f"guide on worker {guide.worker}; tourists: {{{', '.join(f'{w}: {len(p)}' for w, p in tourists.items())}}}")
+        results.append(check("tourists spread over both workers", len(tourists) == WORKERS))
+
+        await asyncio.sleep(0.5)
+        results.append(check("remote tourists see the guide come online",
+                             all(any(s and s.get('online') for s in p.events.get('guide_status', [])) for p in remote)))
+
+        monitors = await spread('monitor', 1)
+        snapshots = [p.events['monitor_update'][0] for probes in monitors.values() for p in probes]
+        results.append(check("monitors on every worker count all tourists",
+                             all(s['total_tourists'] == 4 and s['guide_online'] for s in snapshots)))
+
+        await guide.sio.emit('transcript_msg', {'text': '안녕하세요 여러분', 'isFinal': True, 'source_lang': 'ko'})
+        await guide.sio.emit('reset_audio_session')
+        await asyncio.sleep(0.2)
+        for i in range(20):
+            await guide.sio.emit('binary_audio', (b'\x1a\x45\xdf\xa3' if i == 0 else b'\x1f\x43\xb6\x75') + bytes(200))
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(1)
+        results.append(check("transcripts reach tourists on both workers",
+                             all(p.events.get('transcript') for probes in tourists.values() for p in probes)))
+        results.append(check("WS audio reaches tourists on both workers",
+                             all(p.audio_chunks == 20 for probes in tourists.values() for p in probes)))
+
+        late = Probe('tourist', 'ja')
+        await late.connect()
+        await late.sio.emit('request_audio_init')
+        await asyncio.sleep(0.5)
+        results.append(check(f"late joiner (worker {late.worker}) gets a catch-up", bool(late.events.get('audio_catchup'))))
+
+        left = remote[0]
+        await left.sio.disconnect()
+        await asyncio.sleep(1)
+        diffs = [d for probes in monitors.values() for p in probes for d in p.events['monitor_update'][1:]]
+        results.append(check("a tourist leaving another worker reaches every monitor",
+                             all(any(d.get('total_tourists') == 4 for d in p.events['monitor_update'][1:])
+                                 for probes in monitors.values() for p in probes) and bool(diffs)))
+
+        await guide.sio.disconnect()
+        await asyncio.sleep(1)
+        results.append(check("remote tourists see the guide go offline",
+                             all(p.events['guide_status'][-1].get('online') is False for p in remote[1:] + local)))
+
+        for probes in list(tourists.values()) + list(monitors.values()):
+            for p in probes:
+                if p.sio.connected:
+                    await p.sio.disconnect()
+        await late.sio.disconnect()
+    finally:
+        server.terminate()
+        server.wait()
+        broker.terminate()
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""
+Local stand-in for the OpenAI chat completions API, for testing /summarize offline.
+
+    python fake_llm_server.py --port 5100 --delay 0.5
+    AI_INTEGRATIONS_OPENAI_BASE_URL=http://localhost:5100/v1 AI_INTEGRATIONS_OPENAI_API_KEY=fake python server.py
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+
+app = FastAPI()
+DELAY = 0.0
+stats = {'requests': 0}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats['requests'] += 1
+    if DELAY:
+        await asyncio.sleep(DELAY)
+
+    prompt = body['messages'][-1]['content']
+    text = prompt.split("\n\n", 1)[-1]
+    lines = [line for line in text.splitlines() if line.strip()]
+    summary = f"[fake summary of {len(lines)} lines, {len(text)} chars] " + " / ".join(line[:40] for line in lines[:3])
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get('model', 'fake'),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": summary},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(summary) // 4, "total_tokens": (len(prompt) + len(summary)) // 4}
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--delay", type=float, default=0.0, help="Artificial latency per request (seconds)")
+    args = parser.parse_args()
+    DELAY = args.delay
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
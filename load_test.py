@@ -1,46 +1,634 @@
+import argparse
 import asyncio
-import socketio
+import json
+import multiprocessing as mp
+import os
+import struct
+import subprocess
+import sys
 import time
+from datetime import datetime
+
+import aiohttp
+import httpx
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Load and latency benchmark.
+# A simulated guide streams audio at a fixed bitrate and sends transcript bursts while thousands of
+# tourists (spread over client processes, optionally plus aiortc WebRTC tourists) receive them over
+# the raw /ws/audio socket or socket.io events (--transport). Every chunk and transcript carries its send time, so the report has
+# end-to-end delivery latency percentiles and drop rates next to server CPU/RSS over time.
+#
+#   python load_test.py                                     # spawns a local server, 200 tourists, 60 s
+#   python load_test.py --tourists 2000 --client-procs 4 --webrtc 10
+#   python load_test.py --url https://192.168.0.5:5000 --pid 4321 --report tablet.json
+#   python load_test.py --compare before.json --report after.json
+
+EBML_HEADER = b'\x1a\x45\xdf\xa3'
+WEBM_CLUSTER = b'\x1f\x43\xb6\x75'
+CHUNK_HEADER = struct.Struct('!4sId')  # marker, seq, send time (time.time())
+AUDIO_FRAME_HEADER = struct.Struct('!BIQ')  # /ws/audio frames: flags, server seq, server time (ms)
+AUDIO_FLAG_CATCHUP = 0x04
+
+
+def make_chunk(seq, size, keyframe):
+    marker = EBML_HEADER if seq == 0 else WEBM_CLUSTER if keyframe else b'\x00' * 4
+    header = CHUNK_HEADER.pack(marker, seq, time.time())
+    return header + bytes(max(0, size - len(header)))
+
+
+def parse_chunk(data):
+    if len(data) < CHUNK_HEADER.size:
+        return None
+    _, seq, sent = CHUNK_HEADER.unpack_from(data)
+    return seq, sent
+
+
+def percentiles(values):
+    """Latency summary in ms"""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50': round(pick(0.50), 2),
+        'p90': round(pick(0.90), 2),
+        'p99': round(pick(0.99), 2),
+        'max': round(ordered[-1] * 1000, 2),
+    }
+
+
+def raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+# --- Socket.IO tourists (run in client processes) ---
+
+class Tourist:
+    def __init__(self, url, language, transport):
+        self.url = url
+        self.language = language
+        self.transport = transport
+        self.sio = socketio.AsyncClient(reconnection=False, ssl_verify=False)
+        self.ws = None
+        self.reader = None
+        self.audio = {}  # {seq: latency}
+        self.transcripts = {'final': {}, 'interim': {}}  # {seq: latency}
+        self.utterance = None
+        self.interim_text = ''
+        self.catchups = 0
+        self.demoted = False
+        self.join_seconds = None
+        self.error = None
+
+        @self.sio.on('audio_chunk')
+        async def on_audio(data):
+            parsed = parse_chunk(data)
+            if parsed:
+                self.audio.setdefault(parsed[0], time.time() - parsed[1])
+
+        @self.sio.on('audio_catchup')
+        async def on_catchup(data):
+            self.catchups += 1
+
+        @self.sio.on('audio_demoted')
+        async def on_demoted(data):
+            self.demoted = True
 
-# Number of tourists to simulate
-NUM_TOURISTS = 60
-SERVER_URL = "http://localhost:5000"
+        @self.sio.on('transcript')
+        async def on_transcript(data):
+            self.record_transcript(str(data.get('original', '')))
 
-async def start_tourist(idx):
-    sio = socketio.AsyncClient()
-    
-    @sio.event
-    async def connect():
-        # print(f"[Tourist #{idx}] Connected")
-        await sio.emit('join_room', {'role': 'tourist'})
+        @self.sio.on('transcript_delta')
+        async def on_delta(delta):
+            # Interims are coalesced by the server: only some of the sent ones arrive, by design
+            if delta['u'] != self.utterance:
+                if delta['p']:
+                    return
+                self.utterance, self.interim_text = delta['u'], ''
+            self.interim_text = self.interim_text[:delta['p']] + delta['s']
+            self.record_transcript(self.interim_text)
 
-    @sio.event
-    async def guide_status(data):
-        status = "Online" if data['online'] else "Offline"
-        print(f"[Tourist #{idx}] Guide Status: {status}")
+    def record_transcript(self, text):
+        parts = text.split()
+        if len(parts) == 4 and parts[0] == 'bench':
+            self.transcripts[parts[1]].setdefault(int(parts[2]), time.time() - float(parts[3]))
 
-    @sio.event
-    async def transcript(data):
-        print(f"[Tourist #{idx}] Received Transcript: {data['original'][:20]}...")
+    async def start(self, timeout, session):
+        started = time.time()
+        try:
+            await self.sio.connect(self.url, transports=['websocket'], wait_timeout=timeout)
+            await self.sio.call('join_room', {'role': 'tourist', 'language': self.language}, timeout=timeout)
+            if self.transport == 'raw':
+                self.ws = await session.ws_connect(f"{self.url}/ws/audio?sid={self.sio.get_sid()}", ssl=False, timeout=timeout)
+                self.reader = asyncio.create_task(self._read_frames())
+                await self.sio.emit('audio_transport', {'mode': 'raw'})
+            self.join_seconds = time.time() - started
+        except Exception as e:
+            self.error = type(e).__name__
 
+    async def _read_frames(self):
+        async for message in self.ws:
+            if message.type != aiohttp.WSMsgType.BINARY:
+                break
+            flags = message.data[0]
+            if flags & AUDIO_FLAG_CATCHUP:
+                self.catchups += 1
+                continue
+            parsed = parse_chunk(message.data[AUDIO_FRAME_HEADER.size:])
+            if parsed:
+                self.audio.setdefault(parsed[0], time.time() - parsed[1])
+        if self.ws.close_code == 4001:
+            self.demoted = True
+
+    async def stop(self):
+        try:
+            if self.ws is not None:
+                await self.ws.close()
+            await asyncio.wait_for(self.sio.disconnect(), 5)
+        except Exception:
+            pass
+
+
+async def measure_loop_lag(samples, interval=0.1):
+    """Client-side event loop lag: if this grows, latencies include client overload"""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_tourists(url, count, offset, languages, transport, ramp, join_timeout, ready_queue, stop_event):
+    lag = []
+    lag_task = asyncio.create_task(measure_loop_lag(lag))
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+    tourists = [Tourist(url, languages[(offset + i) % len(languages)], transport) for i in range(count)]
+
+    async def start(i, tourist):
+        await asyncio.sleep(i / ramp)
+        await tourist.start(join_timeout, session)
+
+    await asyncio.gather(*(start(i, t) for i, t in enumerate(tourists)))
+    ready_queue.put(sum(1 for t in tourists if t.join_seconds is not None))
+    lag.clear()
+    await asyncio.get_running_loop().run_in_executor(None, stop_event.wait)
+    lag_task.cancel()
+    await asyncio.gather(*(t.stop() for t in tourists))
+    await session.close()
+
+    joined = [t for t in tourists if t.join_seconds is not None]
+    return {
+        'joined': len(joined),
+        'failed': [t.error for t in tourists if t.join_seconds is None],
+        'join_seconds': [t.join_seconds for t in joined],
+        'audio_latency': [v for t in joined for v in t.audio.values()],
+        'audio_seqs': [list(t.audio) for t in joined],
+        'transcript_latency': {kind: [v for t in joined for v in t.transcripts[kind].values()] for kind in ('final', 'interim')},
+        'transcript_seqs': {kind: [list(t.transcripts[kind]) for t in joined] for kind in ('final', 'interim')},
+        'catchups': sum(t.catchups for t in joined),
+        'demoted': sum(1 for t in joined if t.demoted),
+        'client_loop_lag': lag,
+    }
+
+
+def tourist_process(url, count, offset, languages, transport, ramp, join_timeout, ready_queue, stop_event, result_queue):
+    raise_fd_limit()
     try:
-        await sio.connect(SERVER_URL)
-        await sio.wait()
+        result = asyncio.run(run_tourists(url, count, offset, languages, transport, ramp, join_timeout, ready_queue, stop_event))
     except Exception as e:
-        print(f"[Tourist #{idx}] Connection Error: {e}")
-
-async def main():
-    print(f"Starting Load Test with {NUM_TOURISTS} Tourists...")
-    tasks = []
-    for i in range(1, NUM_TOURISTS + 1):
-        tasks.append(start_tourist(i))
-        # Stagger slightly
-        await asyncio.sleep(0.1)
-    
-    await asyncio.gather(*tasks)
+        ready_queue.put(0)
+        result = {'error': repr(e)}
+    result_queue.put(result)
+
+
+# --- WebRTC tourists and guide (main process) ---
+
+class WebRTCTourist:
+    def __init__(self, url):
+        self.url = url
+        self.sio = socketio.AsyncClient(reconnection=False, ssl_verify=False)
+        self.pc = None
+        self.frames = 0
+        self.counting = False
+        self.connect_seconds = None
+        self.error = None
+        self.reader = None
+
+    async def start(self):
+        from aiortc import RTCPeerConnection, RTCSessionDescription
+        started = time.time()
+        answered = asyncio.get_running_loop().create_future()
+
+        @self.sio.on('answer')
+        async def on_answer(data):
+            if not answered.done():
+                answered.set_result(data)
+
+        @self.sio.on('webrtc_unavailable')
+        async def on_unavailable(data):
+            if not answered.done():
+                answered.set_result(None)
+
+        try:
+            await self.sio.connect(self.url, transports=['websocket'])
+            await self.sio.call('join_room', {'role': 'tourist'}, timeout=30)
+            self.pc = RTCPeerConnection()
+            self.pc.addTransceiver('audio', direction='recvonly')
+
+            @self.pc.on('track')
+            def on_track(track):
+                self.reader = asyncio.ensure_future(self._read(track))
+
+            await self.pc.setLocalDescription(await self.pc.createOffer())
+            await self.sio.emit('offer', {'sdp': self.pc.localDescription.sdp, 'type': self.pc.localDescription.type, 'role': 'tourist'})
+            answer = await asyncio.wait_for(answered, 15)
+            if answer is None:
+                self.error = 'capacity'
+                return
+            await self.pc.setRemoteDescription(RTCSessionDescription(**answer))
+            for _ in range(150):
+                if self.pc.connectionState == 'connected':
+                    self.connect_seconds = time.time() - started
+                    return
+                await asyncio.sleep(0.1)
+            self.error = f"ice {self.pc.connectionState}"
+        except Exception as e:
+            self.error = type(e).__name__
+
+    async def _read(self, track):
+        try:
+            while True:
+                await track.recv()
+                if self.counting:
+                    self.frames += 1
+        except Exception:
+            pass
+
+    async def stop(self):
+        if self.reader:
+            self.reader.cancel()
+        if self.pc:
+            await self.pc.close()
+        try:
+            await asyncio.wait_for(self.sio.disconnect(), 5)
+        except Exception:
+            pass
+
+
+async def start_webrtc_guide(guide):
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from bench_webrtc_cpu import ToneTrack
+    answered = asyncio.get_running_loop().create_future()
+    guide.on('answer', lambda data: answered.done() or answered.set_result(data))
+    pc = RTCPeerConnection()
+    pc.addTrack(ToneTrack())
+    await pc.setLocalDescription(await pc.createOffer())
+    await guide.emit('offer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type, 'role': 'guide'})
+    await pc.setRemoteDescription(RTCSessionDescription(**await asyncio.wait_for(answered, 15)))
+    return pc
+
+
+# --- Guide traffic ---
+
+async def stream_audio(send, args, sent):
+    chunk_bytes = int(args.bitrate / 8 * args.chunk_ms / 1000)
+    interval = args.chunk_ms / 1000
+    started = time.perf_counter()
+    seq = 0
+    while time.perf_counter() - started < args.duration:
+        await send(make_chunk(seq, chunk_bytes, seq % args.keyframe_every == 0))
+        sent['audio'] += 1
+        seq += 1
+        delay = started + seq * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def send_transcripts(guide, args, sent):
+    started = time.perf_counter()
+    final_seq = interim_seq = 0
+    while time.perf_counter() - started < args.duration:
+        for _ in range(args.burst):
+            for _ in range(args.interims):
+                await guide.emit('transcript_msg', {'text': f"bench interim {interim_seq} {time.time():.6f}", 'isFinal': False, 'source_lang': 'ko'})
+                interim_seq += 1
+            await guide.emit('transcript_msg', {'text': f"bench final {final_seq} {time.time():.6f}", 'isFinal': True, 'source_lang': 'ko'})
+            final_seq += 1
+        sent['final'], sent['interim'] = final_seq, interim_seq
+        await asyncio.sleep(args.transcript_interval)
+
+
+# --- Server process sampling ---
+
+async def sample_server(pid, interval, samples, phase):
+    if psutil is None or pid is None:
+        return
+    try:
+        root = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    procs = {}
+    started = time.time()
+    while True:
+        try:
+            current = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        cpu = rss = 0.0
+        for proc in current:
+            try:
+                if proc.pid not in procs:
+                    procs[proc.pid] = proc
+                    proc.cpu_percent(None)
+                cpu += procs[proc.pid].cpu_percent(None)
+                rss += proc.memory_info().rss
+            except psutil.NoSuchProcess:
+                procs.pop(proc.pid, None)
+        samples.append({'t': round(time.time() - started, 1), 'phase': phase[0], 'cpu': round(cpu, 1), 'rss_mb': round(rss / 2**20, 1)})
+        await asyncio.sleep(interval)
+
+
+def scrape_metrics(url):
+    """Non-histogram samples from /metrics -> {name{labels}: value}"""
+    try:
+        text = httpx.get(f"{url}/metrics", verify=False, timeout=10).text
+    except httpx.HTTPError:
+        return {}
+    values = {}
+    for line in text.splitlines():
+        if line.startswith('#') or '_bucket{' in line or not line.strip():
+            continue
+        name, _, value = line.rpartition(' ')
+        try:
+            values[name] = float(value)
+        except ValueError:
+            pass
+    return values
+
+
+def git_label():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def start_server(args):
+    env = dict(os.environ, TRANSLATOR_BACKEND=os.environ.get('TRANSLATOR_BACKEND', 'stub'))
+    for item in args.server_env:
+        key, _, value = item.partition('=')
+        env[key] = value
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:sio_app", "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://localhost:{args.port}"
+    for _ in range(120):
+        try:
+            httpx.get(f"{url}/api/monitor", timeout=1)
+            return server, url
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def delivery(sent, seqs_per_client, latencies):
+    expected = sent * len(seqs_per_client)
+    delivered = sum(sum(1 for s in seqs if s < sent) for seqs in seqs_per_client)
+    return {
+        'sent': sent,
+        'clients': len(seqs_per_client),
+        'expected': expected,
+        'delivered': delivered,
+        'drop_rate': round(1 - delivered / expected, 5) if expected else None,
+        'latency_ms': percentiles(latencies),
+    }
+
+
+async def run(args):
+    raise_fd_limit()
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        server, url = await asyncio.to_thread(start_server, args)
+        pid = server.pid
+    url = url.rstrip('/')
+    samples, phase = [], ['connect']
+    sampler = asyncio.create_task(sample_server(pid, args.sample_interval, samples, phase))
+    procs, webrtc, guide_pc = [], [], None
+    sent = {'audio': 0, 'final': 0, 'interim': 0}
+    try:
+        guide = socketio.AsyncClient(reconnection=False, ssl_verify=False)
+        await guide.connect(url, transports=['websocket'])
+        await guide.call('join_room', {'role': 'guide'}, timeout=30)
+
+        ctx = mp.get_context('spawn')
+        ready_queue, result_queue, stop_event = ctx.Queue(), ctx.Queue(), ctx.Event()
+        languages = args.languages.split(',')
+        per_proc = [args.tourists // args.client_procs + (1 if i < args.tourists % args.client_procs else 0)
+                    for i in range(args.client_procs)]
+        connect_started = time.time()
+        offset = 0
+        for count in per_proc:
+            proc = ctx.Process(target=tourist_process, args=(url, count, offset, languages, args.transport, args.ramp / args.client_procs,
+                                                             args.join_timeout, ready_queue, stop_event, result_queue))
+            proc.start()
+            procs.append(proc)
+            offset += count
+        joined = 0
+        for _ in procs:
+            joined += await asyncio.to_thread(ready_queue.get)
+        connect_seconds = time.time() - connect_started
+        print(f"{joined}/{args.tourists} socket.io tourists joined in {connect_seconds:.1f}s")
+
+        if args.webrtc:
+            guide_pc = await start_webrtc_guide(guide)
+            await asyncio.sleep(2)
+            webrtc = [WebRTCTourist(url) for _ in range(args.webrtc)]
+            await asyncio.gather(*(t.start() for t in webrtc))
+            print(f"{sum(1 for t in webrtc if t.connect_seconds)}/{args.webrtc} WebRTC tourists connected")
+
+        phase[0] = 'warmup'
+        await guide.emit('reset_audio_session')
+        await asyncio.sleep(args.warmup)
+
+        print(f"Streaming for {args.duration:.0f}s ({args.bitrate // 1000} kbps, {args.chunk_ms} ms chunks)")
+        phase[0] = 'stream'
+        for t in webrtc:
+            t.counting = True
+        stream_started = time.time()
+        if args.transport == 'raw':
+            session = aiohttp.ClientSession()
+            guide_ws = await session.ws_connect(f"{url}/ws/audio?sid={guide.get_sid()}", ssl=False)
+            send_audio = guide_ws.send_bytes
+        else:
+            send_audio = lambda chunk: guide.emit('binary_audio', chunk)
+        await asyncio.gather(stream_audio(send_audio, args, sent), send_transcripts(guide, args, sent))
+        stream_seconds = time.time() - stream_started
+        for t in webrtc:
+            t.counting = False
+        phase[0] = 'drain'
+        await asyncio.sleep(args.drain)
+
+        server_metrics = await asyncio.to_thread(scrape_metrics, url)
+        stop_event.set()
+        results = [await asyncio.to_thread(result_queue.get) for _ in procs]
+        if args.transport == 'raw':
+            await guide_ws.close()
+            await session.close()
+        await guide.disconnect()
+    finally:
+        for proc in procs:
+            proc.join(30)
+        for t in webrtc:
+            await t.stop()
+        if guide_pc:
+            await guide_pc.close()
+        sampler.cancel()
+        if server:
+            server.terminate()
+            server.wait()
+
+    results = [r for r in results if 'error' not in r]
+    merged = lambda key: [v for r in results for v in r[key]]
+    stream_samples = [s for s in samples if s['phase'] == 'stream']
+    webrtc_connected = [t for t in webrtc if t.connect_seconds]
+    expected_frames = int(stream_seconds * 50) * len(webrtc_connected)
+    received_frames = sum(t.frames for t in webrtc_connected)
+
+    return {
+        'label': args.label or git_label(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'url': args.url or 'spawned',
+        'config': {k: v for k, v in vars(args).items() if k not in ('report', 'compare', 'label')},
+        'connect': {
+            'tourists': args.tourists,
+            'joined': sum(r['joined'] for r in results),
+            'failed': dict((e, merged('failed').count(e)) for e in set(merged('failed'))),
+            'seconds': round(connect_seconds, 2),
+            'join_latency_ms': percentiles(merged('join_seconds')),
+        },
+        'audio': dict(delivery(sent['audio'], merged('audio_seqs'), merged('audio_latency')),
+                      catchups=sum(r['catchups'] for r in results), demoted=sum(r['demoted'] for r in results)),
+        'transcripts': {
+            kind: delivery(sent[kind], [s for r in results for s in r['transcript_seqs'][kind]],
+                           [v for r in results for v in r['transcript_latency'][kind]])
+            for kind in ('final', 'interim')
+        },
+        'webrtc': {
+            'tourists': len(webrtc),
+            'connected': len(webrtc_connected),
+            'errors': [t.error for t in webrtc if t.error],
+            'connect_ms': percentiles([t.connect_seconds for t in webrtc_connected]),
+            'expected_frames': expected_frames,
+            'received_frames': received_frames,
+            'drop_rate': round(max(0.0, 1 - received_frames / expected_frames), 5) if expected_frames else None,
+        },
+        'client_loop_lag_ms': percentiles(merged('client_loop_lag')),
+        'server': {
+            'pid': pid,
+            'cpu_avg': round(sum(s['cpu'] for s in stream_samples) / len(stream_samples), 1) if stream_samples else None,
+            'cpu_max': max((s['cpu'] for s in stream_samples), default=None),
+            'rss_max_mb': max((s['rss_mb'] for s in samples), default=None),
+            'samples': samples,
+        },
+        'server_metrics': server_metrics,
+    }
+
+
+HEADLINE = [
+    ('audio p50 ms', ('audio', 'latency_ms', 'p50')),
+    ('audio p99 ms', ('audio', 'latency_ms', 'p99')),
+    ('audio drop rate', ('audio', 'drop_rate')),
+    ('final p50 ms', ('transcripts', 'final', 'latency_ms', 'p50')),
+    ('final p99 ms', ('transcripts', 'final', 'latency_ms', 'p99')),
+    ('final drop rate', ('transcripts', 'final', 'drop_rate')),
+    ('interim p99 ms', ('transcripts', 'interim', 'latency_ms', 'p99')),
+    ('join p99 ms', ('connect', 'join_latency_ms', 'p99')),
+    ('webrtc drop rate', ('webrtc', 'drop_rate')),
+    ('server CPU avg %', ('server', 'cpu_avg')),
+    ('server RSS max MB', ('server', 'rss_max_mb')),
+    ('client lag p99 ms', ('client_loop_lag_ms', 'p99')),
+]
+
+
+def headline(report, path):
+    value = report
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def print_summary(report, baseline=None):
+    title = f"{'':<20}{report['label']:>14}"
+    print("\n" + (title + f"{baseline['label']:>14}" if baseline else title))
+    for name, path in HEADLINE:
+        current = headline(report, path)
+        line = f"{name:<20}{str(current):>14}"
+        if baseline:
+            line += f"{str(headline(baseline, path)):>14}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load and latency benchmark")
+    parser.add_argument("--url", help="server to test (default: spawn server.py locally)")
+    parser.add_argument("--pid", type=int, help="server PID for CPU/RSS sampling when --url is given (workers included)")
+    parser.add_argument("--port", type=int, default=5088, help="port of the spawned server")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE", help="environment of the spawned server")
+    parser.add_argument("--tourists", type=int, default=200)
+    parser.add_argument("--client-procs", type=int, default=max(1, min(os.cpu_count() or 1, 4)),
+                        help="processes the socket.io tourists are spread over")
+    parser.add_argument("--ramp", type=float, default=100, help="tourist connections per second")
+    parser.add_argument("--join-timeout", type=float, default=60)
+    parser.add_argument("--languages", default="en,ja,zh-CN,es")
+    parser.add_argument("--transport", choices=("raw", "socketio"), default="raw",
+                        help="WS audio path: the /ws/audio socket or socket.io binary_audio/audio_chunk events")
+    parser.add_argument("--webrtc", type=int, default=0, help="aiortc WebRTC tourists (the guide also sends a WebRTC tone)")
+    parser.add_argument("--bitrate", type=int, default=128000, help="guide audio bits/s (MediaRecorder default in app.js)")
+    parser.add_argument("--chunk-ms", type=int, default=1000, help="binary_audio chunk interval (MediaRecorder timeslice)")
+    parser.add_argument("--keyframe-every", type=int, default=1, help="chunks per WebM cluster start")
+    parser.add_argument("--transcript-interval", type=float, default=3.0, help="seconds between transcript bursts")
+    parser.add_argument("--burst", type=int, default=2, help="final transcripts per burst")
+    parser.add_argument("--interims", type=int, default=3, help="interim transcripts before each final")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--drain", type=float, default=3, help="seconds to wait for stragglers after streaming")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--label", help="build label in the report (default: git describe)")
+    parser.add_argument("--report", help="JSON report path (default: load_report_<time>.json)")
+    parser.add_argument("--compare", help="earlier report to print side by side")
+    args = parser.parse_args()
+
+    if psutil is None:
+        print("psutil not installed: server CPU/RSS will not be sampled (pip install psutil)")
+    report = asyncio.run(run(args))
+    path = args.report or f"load_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+    print(f"\nReport written to {path}")
+
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
         print("Test Stopped")
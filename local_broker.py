@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import fnmatch
+import time
+
+# Stand-in message broker for running several server workers on one box without installing Redis.
+# It speaks the subset of the Redis protocol (RESP2, and RESP3 after HELLO 3) that the socket.io Redis client manager and the
+# server's shared tour state use: pub/sub, strings with expiry, hashes and sets. Everything lives in
+# memory; restart it and the workers rebuild presence from their own clients.
+#
+#   python local_broker.py --port 6390
+#   CLIENT_MANAGER_URL=redis://127.0.0.1:6390/0 python server.py --workers 4
+
+
+class Broker:
+    def __init__(self):
+        self.strings = {}  # {key: (value, expires_at or None)}
+        self.hashes = {}  # {key: {field: value}}
+        self.sets = {}  # {key: set()}
+        self.channels = {}  # {channel: set(Client)}
+        self.published = 0
+
+    def expired(self, key):
+        entry = self.strings.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.strings[key]
+            return True
+        return False
+
+    def exists(self, key):
+        self.expired(key)
+        return key in self.strings or key in self.hashes or key in self.sets
+
+    def delete(self, key):
+        found = self.exists(key)
+        self.strings.pop(key, None)
+        self.hashes.pop(key, None)
+        self.sets.pop(key, None)
+        return found
+
+    def keys(self, pattern):
+        for key in list(self.strings):
+            self.expired(key)
+        pattern = pattern.decode()
+        names = set(self.strings) | set(self.hashes) | set(self.sets)
+        return [k for k in names if fnmatch.fnmatchcase(k.decode(), pattern)]
+
+
+broker = Broker()
+
+
+def encode(value, resp3=False):
+    """RESP encoding of None, int, bytes/str, list, errors and (RESP3) maps, sets and pushes"""
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, Error):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, Status):
+        return b"+" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, dict):
+        if resp3:
+            return b"%%%d\r\n" % len(value) + b"".join(encode(k, resp3) + encode(v, resp3) for k, v in value.items())
+        value = [x for pair in value.items() for x in pair]
+    if isinstance(value, Push):
+        prefix = b">" if resp3 else b"*"
+        return prefix + b"%d\r\n" % len(value) + b"".join(encode(v, resp3) for v in value)
+    if isinstance(value, set):
+        prefix = b"~" if resp3 else b"*"
+        return prefix + b"%d\r\n" % len(value) + b"".join(encode(v, resp3) for v in value)
+    return b"*%d\r\n" % len(value) + b"".join(encode(v, resp3) for v in value)
+
+
+class Error(str):
+    pass
+
+
+class Status(str):
+    pass
+
+
+class Push(list):
+    """Out-of-band pub/sub frame (RESP3 push, plain array in RESP2)"""
+
+
+OK = Status("OK")
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.subscriptions = set()
+        self.resp3 = False
+
+    async def read_command(self):
+        line = await self.reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # inline command (telnet / redis-cli ping)
+        args = []
+        for _ in range(int(line[1:])):
+            header = await self.reader.readline()
+            length = int(header[1:])
+            data = await self.reader.readexactly(length + 2)
+            args.append(data[:-2])
+        return args
+
+    def send(self, value):
+        self.writer.write(encode(value, self.resp3))
+
+    async def serve(self):
+        try:
+            while True:
+                args = await self.read_command()
+                if args is None:
+                    break
+                if not args:
+                    continue
+                self.send(self.execute(args[0].upper().decode(), args[1:]))
+                if self.writer.transport.get_write_buffer_size() > 1024 * 1024:
+                    await self.writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in self.subscriptions:
+                broker.channels.get(channel, set()).discard(self)
+            self.writer.close()
+
+    def execute(self, cmd, args):
+        b = broker
+        if cmd == "PING":
+            if self.subscriptions:
+                return Push([b"pong", args[0] if args else b""])
+            return Status("PONG") if not args else args[0]
+        if cmd == "HELLO":
+            self.resp3 = bool(args) and args[0] == b"3"
+            return {b"server": b"local_broker", b"version": b"7.0.0", b"proto": 3 if self.resp3 else 2,
+                    b"mode": b"standalone", b"role": b"master", b"modules": []}
+        if cmd in ("SELECT", "CLIENT", "READONLY"):
+            return OK
+        if cmd == "ECHO":
+            return args[0]
+        if cmd == "SUBSCRIBE":
+            replies = []
+            for channel in args:
+                self.subscriptions.add(channel)
+                b.channels.setdefault(channel, set()).add(self)
+                replies.append(Push([b"subscribe", channel, len(self.subscriptions)]))
+            for reply in replies[:-1]:
+                self.send(reply)
+            return replies[-1]
+        if cmd == "UNSUBSCRIBE":
+            channels = args or list(self.subscriptions)
+            replies = []
+            for channel in channels:
+                self.subscriptions.discard(channel)
+                b.channels.get(channel, set()).discard(self)
+                replies.append(Push([b"unsubscribe", channel, len(self.subscriptions)]))
+            if not replies:
+                return Push([b"unsubscribe", None, 0])
+            for reply in replies[:-1]:
+                self.send(reply)
+            return replies[-1]
+        if cmd == "PUBLISH":
+            channel, message = args
+            receivers = b.channels.get(channel, ())
+            for client in list(receivers):
+                client.send(Push([b"message", channel, message]))
+            b.published += 1
+            return len(receivers)
+        if cmd == "SET":
+            key, value = args[0], args[1]
+            expires = None
+            options = [a.upper() for a in args[2:]]
+            if b"NX" in options and b.exists(key):
+                return None
+            if b"EX" in options:
+                expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            if b"PX" in options:
+                expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            b.strings[key] = (value, expires)
+            return OK
+        if cmd == "GET":
+            b.expired(args[0])
+            entry = b.strings.get(args[0])
+            return entry[0] if entry else None
+        if cmd == "EXPIRE":
+            entry = b.strings.get(args[0])
+            if entry is None:
+                return 0
+            b.strings[args[0]] = (entry[0], time.monotonic() + int(args[1]))
+            return 1
+        if cmd == "EXISTS":
+            return sum(1 for key in args if b.exists(key))
+        if cmd == "DEL":
+            return sum(1 for key in args if b.delete(key))
+        if cmd == "KEYS":
+            return b.keys(args[0])
+        if cmd == "HSET":
+            h = b.hashes.setdefault(args[0], {})
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in h
+                h[field] = value
+            return added
+        if cmd == "HGET":
+            return b.hashes.get(args[0], {}).get(args[1])
+        if cmd == "HGETALL":
+            return dict(b.hashes.get(args[0], {}))
+        if cmd == "HDEL":
+            h = b.hashes.get(args[0], {})
+            removed = sum(1 for field in args[1:] if h.pop(field, None) is not None)
+            if not h:
+                b.hashes.pop(args[0], None)
+            return removed
+        if cmd == "HLEN":
+            return len(b.hashes.get(args[0], {}))
+        if cmd == "SADD":
+            s = b.sets.setdefault(args[0], set())
+            before = len(s)
+            s.update(args[1:])
+            return len(s) - before
+        if cmd == "SREM":
+            s = b.sets.get(args[0], set())
+            removed = 0
+            for member in args[1:]:
+                if member in s:
+                    s.discard(member)
+                    removed += 1
+            if not s:
+                b.sets.pop(args[0], None)
+            return removed
+        if cmd == "SMEMBERS":
+            return set(b.sets.get(args[0], ()))
+        if cmd == "INFO":
+            return (f"# Server\r\nredis_version:7.0.0-local\r\n"
+                    f"connected_clients:{len({c for s in b.channels.values() for c in s})}\r\n"
+                    f"published_messages:{b.published}\r\n").encode()
+        return Error(f"ERR unknown command '{cmd}'")
+
+
+async def handle(reader, writer):
+    await Client(reader, writer).serve()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis-compatible broker for local multi-worker runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = await asyncio.start_server(handle, args.host, args.port)
+    print(f"Local broker listening on redis://{args.host}:{args.port}/0")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Broker Stopped")
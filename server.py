@@ -1,204 +1,2161 @@
 import argparse
 import asyncio
+import atexit
+import bisect
+import codecs
+import functools
+import gzip
+import hashlib
+import html
+import importlib
+import importlib.util
+import inspect
+import itertools
 import json
 import logging
+import mimetypes
 import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
 import uuid
-from datetime import datetime
+import wave
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
 
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 import socketio
-from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
-from aiortc.contrib.media import MediaRelay, MediaRecorder
-from openai import OpenAI
 
 # Log Setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("GuideSystem")
 
+# --- Lazy Imports ---
+# aiortc/PyAV, the OpenAI SDK, deep_translator and pandas take seconds to import on a phone, and
+# many sessions never touch them (WS audio only, no summary, no .xls upload). They are imported
+# on first use; a fresh server only pays for FastAPI and socket.io before it can show the QR code.
+HEAVY_MODULES = ("aiortc", "av", "openai", "deep_translator", "pandas")
+lazy_import_seconds = {}  # {module: seconds its first import took}
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            lazy_import_seconds[self._name] = round(time.perf_counter() - started, 3)
+            logger.info(f"Loaded {self._name} on first use ({lazy_import_seconds[self._name] * 1000:.0f} ms)")
+        return getattr(self._module, attr)
+
+aiortc = LazyModule("aiortc")
+aiortc_media = LazyModule("aiortc.contrib.media")
+aiortc_opus = LazyModule("aiortc.codecs.opus")
+av = LazyModule("av")
+
+# Multi-worker mode: with CLIENT_MANAGER_URL (redis://host:port/db - a Redis server or the
+# bundled local_broker.py) socket.io rooms and emits are shared by all workers. Workers share
+# the port without sticky sessions, so only the websocket transport is offered then.
+CLIENT_MANAGER_URL = os.environ.get("CLIENT_MANAGER_URL", "")
+CLUSTER_CHANNEL = os.environ.get("CLUSTER_CHANNEL", "songsusin")
+
 # App Setup
-app = FastAPI()
-sio_server = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# Startup and shutdown run here in an explicit order; the steps are defined with their subsystems
+# further down. The schema and search triggers exist before any writer or cluster event can touch
+# the database, and shutdown stops the producers before the writers flush what they were given.
+startup_timing = {'started': None, 'seconds': None}
+
+@asynccontextmanager
+async def lifespan(app):
+    startup_timing['started'] = time.perf_counter()
+    await instrument_socketio_handlers()
+    await create_tables()
+    await create_search_index()
+    await start_persistence_writer()
+    await start_recording_writer()
+    await start_cluster()
+    await load_static_assets()
+    await start_peer_reaper()
+    await start_session_maintenance()
+    await reconcile_recordings()
+    startup_timing['seconds'] = round(time.perf_counter() - startup_timing['started'], 3)
+    logger.info(f"Startup finished in {startup_timing['seconds'] * 1000:.0f} ms")
+    try:
+        yield
+    finally:
+        for task in (app.state.peer_reaper, app.state.session_maintenance):
+            task.cancel()
+        await stop_cluster()
+        await stop_recording_writer()
+        await stop_persistence_writer()
+
+app = FastAPI(lifespan=lifespan)
+if CLIENT_MANAGER_URL:
+    sio_server = socketio.AsyncServer(
+        async_mode='asgi', cors_allowed_origins='*', transports=['websocket'],
+        client_manager=socketio.AsyncRedisManager(CLIENT_MANAGER_URL, channel=f"{CLUSTER_CHANNEL}:socketio")
+    )
+else:
+    sio_server = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
 sio_app = socketio.ASGIApp(sio_server, app)
 
-# Mount Static
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# --- Metrics ---
+# In-process registry rendered in Prometheus text format at /metrics. Hot paths only bump a
+# counter or a histogram bucket; queue depths, peers and cache sizes are read at scrape time.
+# With --workers each worker keeps its own registry (samples carry a worker label).
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_RATE_WINDOW = 10  # seconds averaged by the *_per_second gauges
+
+class MetricsRegistry:
+    """Counters, histograms and scrape-time gauges (updates are safe from worker threads)"""
+
+    def __init__(self, prefix="songsusin_"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.families = {}  # {name: (type, help)}
+        self.buckets = {}  # {histogram name: upper bounds}
+        self.series = {}  # {name: {label tuple: value}} - histogram value: [bucket counts..., sum]
+        self.collectors = {}  # {name: callable -> [(labels dict, value)]}
+
+    def counter(self, name, help):
+        self.families[name] = ('counter', help)
+        self.series.setdefault(name, {})
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        self.families[name] = ('histogram', help)
+        self.buckets[name] = tuple(buckets)
+        self.series.setdefault(name, {})
+
+    def gauge(self, name, help, collect, type='gauge'):
+        """collect() is called at scrape time; a value is a number or [(labels dict, number)]"""
+        self.families[name] = (type, help)
+        self.collectors[name] = collect
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        bounds = self.buckets[name]
+        with self.lock:
+            series = self.series[name]
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(bounds) + 2)
+            counts[bisect.bisect_left(bounds, value)] += 1
+            counts[-1] += value
+
+    def _samples(self, name):
+        collect = self.collectors.get(name)
+        if collect is None:
+            with self.lock:
+                return [(dict(key), value[:] if isinstance(value, list) else value)
+                        for key, value in self.series[name].items()]
+        try:
+            value = collect()
+        except Exception as e:
+            logger.error(f"Metrics collector {name} failed: {e}")
+            return []
+        return [({}, value)] if isinstance(value, (int, float)) else list(value)
+
+    def render(self):
+        worker = cluster.worker_id if cluster.enabled else None
+        lines = []
+        for name, (kind, help) in self.families.items():
+            full = self.prefix + name
+            lines.append(f"# HELP {full} {help}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in self._samples(name):
+                if worker:
+                    labels = dict(labels, worker=worker)
+                if kind != 'histogram':
+                    lines.append(f"{full}{format_labels(labels)} {format_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets[name] + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else format_number(bound)
+                    lines.append(f"{full}_bucket{format_labels(dict(labels, le=le))} {cumulative}")
+                lines.append(f"{full}_sum{format_labels(labels)} {format_number(value[-1])}")
+                lines.append(f"{full}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+def format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(int(value))
+
+class RateMeter:
+    """Events and bytes per second over the last METRICS_RATE_WINDOW seconds (one bucket per second)"""
+
+    def __init__(self):
+        self.buckets = deque()  # [[second, events, bytes]]
+
+    def add(self, nbytes):
+        now = int(time.monotonic())
+        if self.buckets and self.buckets[-1][0] == now:
+            self.buckets[-1][1] += 1
+            self.buckets[-1][2] += nbytes
+        else:
+            self.buckets.append([now, 1, nbytes])
+            while self.buckets[0][0] <= now - METRICS_RATE_WINDOW:
+                self.buckets.popleft()
+
+    def rates(self):
+        cutoff = int(time.monotonic()) - METRICS_RATE_WINDOW
+        recent = [b for b in self.buckets if b[0] > cutoff]
+        return (sum(b[1] for b in recent) / METRICS_RATE_WINDOW, sum(b[2] for b in recent) / METRICS_RATE_WINDOW)
 
-# WebRTC State
-pcs = set()
-relay = MediaRelay()
-guide_track = None
-guide_pc = None
+metrics = MetricsRegistry()
+
+metrics.histogram('socketio_handler_seconds', "socket.io event handler latency")
+metrics.histogram('tourist_emit_seconds', "Time to emit one event to a tourist room")
+
+def timed_handler(event, handler):
+    """Wrap a socket.io handler to record its latency (extra trailing args are dropped, as
+    python-socketio's own legacy-signature retry would)"""
+    params = inspect.signature(handler).parameters.values()
+    nargs = None if any(p.kind == p.VAR_POSITIONAL for p in params) else len(params)
+
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            return await handler(*args[:nargs])
+        finally:
+            metrics.observe('socketio_handler_seconds', time.perf_counter() - started, event=event)
+    wrapper.timed = True
+    return wrapper
+
+async def instrument_socketio_handlers():
+    for handlers in sio_server.handlers.values():
+        for event, handler in list(handlers.items()):
+            if inspect.iscoroutinefunction(handler) and not getattr(handler, 'timed', False):
+                handlers[event] = timed_handler(event, handler)
+
+async def emit_to_tourists(event, data, room, **kwargs):
+    """sio_server.emit to the tour's 'tourists' room or one of its language rooms, timed"""
+    started = time.perf_counter()
+    await sio_server.emit(event, data, room=room, **kwargs)
+    metrics.observe('tourist_emit_seconds', time.perf_counter() - started, event=event)
 
 # Connected Users Tracking
-connected_users = {}  # {sid: {'role': 'guide/tourist', 'language': 'en', 'connected_at': datetime, 'status': 'active'}}
-guide_info = {'sid': None, 'broadcasting': False, 'started_at': None}
+connected_users = {}  # {sid: {'role': 'guide/tourist', 'language': 'en', 'tour': 'default', 'connected_at': datetime, 'status': 'active'}}
+
+# --- WebSocket Audio Relay ---
+# binary_audio only appends to per-subscriber bounded queues; one sender task per tourist drains
+# its own queue, so a tourist on weak Wi-Fi never delays the guide or the other listeners.
+RELAY_QUEUE_SIZE = int(os.environ.get("RELAY_QUEUE_SIZE", "32"))  # chunks buffered per tourist
+RELAY_OVERFLOW_POLICY = os.environ.get("RELAY_OVERFLOW_POLICY", "skip-to-keyframe")  # or 'drop-oldest'
+RELAY_TRANSPORT_HIGH_WATER = int(os.environ.get("RELAY_TRANSPORT_HIGH_WATER", "8"))  # engine.io packets in flight
+RELAY_SLOW_OVERFLOWS = int(os.environ.get("RELAY_SLOW_OVERFLOWS", "5"))  # overflows within the window...
+RELAY_SLOW_WINDOW = float(os.environ.get("RELAY_SLOW_WINDOW", "30"))  # ...mark a client as chronically slow
+RELAY_SLOW_ACTION = os.environ.get("RELAY_SLOW_ACTION", "demote")  # 'demote' (text only) or 'disconnect'
+
+AUDIO_RING_SECONDS = float(os.environ.get("AUDIO_RING_SECONDS", "8"))  # recent audio kept for late joiners
+AUDIO_RING_MAX_CHUNKS = int(os.environ.get("AUDIO_RING_MAX_CHUNKS", "256"))
+
+WEBM_CLUSTER_ID = b'\x1f\x43\xb6\x75'
+WEBM_EBML_ID = b'\x1a\x45\xdf\xa3'  # a MediaRecorder stream starts with its EBML header
+
+# Raw audio socket (/ws/audio): each chunk travels as one binary WebSocket message behind a compact
+# header instead of a socket.io event. The header+chunk buffer is built once per chunk and the same
+# bytes object is handed to every raw subscriber; socket.io is left with the control messages.
+AUDIO_FRAME_HEADER = struct.Struct('!BIQ')  # flags, seq, server time (unix ms)
+AUDIO_FLAG_KEYFRAME = 0x01  # chunk contains a WebM cluster start
+AUDIO_FLAG_INIT = 0x02  # first chunk of a session (EBML header)
+AUDIO_FLAG_CATCHUP = 0x04  # init segment + decodable tail in one payload, for (re)joining tourists
+AUDIO_SOCKET_DEMOTED = 4001  # close code: too slow, wait for the audio_demoted retry
+
+def audio_frame(seq, flags, data):
+    return AUDIO_FRAME_HEADER.pack(flags, seq, int(time.time() * 1000)) + data
+
+def is_keyframe_chunk(data):
+    """True if a MediaRecorder WebM chunk contains a Cluster start, where a decoder can resume"""
+    try:
+        return WEBM_CLUSTER_ID in data
+    except TypeError:
+        return False
+
+def transport_backlog(sid):
+    """Packets engine.io has queued for this client but not yet written to its socket"""
+    try:
+        eio_sid = sio_server.manager.eio_sid_from_sid(sid, '/')
+        socket = sio_server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket is not None else 0
+    except Exception:
+        return 0
+
+class AudioSubscriber:
+    """Bounded send queue + sender task for one tourist (socket.io audio_chunk events)"""
+    raw = False
+
+    def __init__(self, sid, fanout):
+        self.sid = sid
+        self.fanout = fanout
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.waiting_for_keyframe = False
+        self.skipped_while_waiting = 0
+        self.caught_up_at = None
+        self.overflow_times = deque()
+        # Lag counters
+        self.sent = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.task = asyncio.create_task(self._sender())
+
+    def offer(self, data, keyframe):
+        if self.waiting_for_keyframe:
+            # Give up waiting if the stream has no detectable clusters
+            if not keyframe and self.skipped_while_waiting < RELAY_QUEUE_SIZE * 2:
+                self.skipped_while_waiting += 1
+                self.dropped += 1
+                return
+            self.waiting_for_keyframe = False
+
+        if len(self.queue) >= RELAY_QUEUE_SIZE:
+            self.overflows += 1
+            if RELAY_OVERFLOW_POLICY == 'drop-oldest':
+                self.queue.popleft()
+                self.dropped += 1
+            else:
+                # Flush the backlog and resume at the next cluster boundary
+                self.dropped += len(self.queue)
+                self.queue.clear()
+                if not keyframe:
+                    self.waiting_for_keyframe = True
+                    self.skipped_while_waiting = 1
+                    self.dropped += 1
+                    self._check_slow()
+                    return
+            if self._check_slow():
+                return
+
+        self.queue.append(('audio_chunk', data))
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
+        self.wakeup.set()
+
+    def catch_up(self, payload):
+        """Replace whatever is queued with one batched catch-up send (it already covers those chunks)"""
+        self.queue.clear()
+        self.waiting_for_keyframe = False
+        self.queue.append(('audio_catchup', payload))
+        self.wakeup.set()
+
+    def _check_slow(self):
+        now = time.monotonic()
+        self.overflow_times.append(now)
+        while self.overflow_times and now - self.overflow_times[0] > RELAY_SLOW_WINDOW:
+            self.overflow_times.popleft()
+        if len(self.overflow_times) >= RELAY_SLOW_OVERFLOWS:
+            self.fanout.handle_slow(self)
+            return True
+        return False
+
+    async def _sender(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                await self._wait_for_transport()
+                if not self.queue:
+                    continue
+                event, data = self.queue.popleft()
+                await self._send(event, data)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Audio sender for {self.sid} failed: {e}")
+
+    async def _wait_for_transport(self):
+        # Let the client's socket drain before handing engine.io more data
+        while self.transport_backlog() > RELAY_TRANSPORT_HIGH_WATER:
+            await asyncio.sleep(0.02)
+
+    async def _send(self, event, data):
+        await sio_server.emit(event, data, to=self.sid, ignore_queue=True)
+
+    def transport_backlog(self):
+        return transport_backlog(self.sid)
+
+    def close(self, code=1000):
+        self.queue.clear()
+        self.task.cancel()
+
+    def stats(self):
+        return {
+            'sid': self.sid[:8],
+            'transport': 'raw' if self.raw else 'socketio',
+            'queue_depth': len(self.queue),
+            'max_queue_depth': self.max_depth,
+            'transport_backlog': self.transport_backlog(),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'overflows': self.overflows,
+            'waiting_for_keyframe': self.waiting_for_keyframe,
+        }
+
+class RawAudioSubscriber(AudioSubscriber):
+    """Same queueing and overflow policy, delivered as pre-framed messages on a /ws/audio socket"""
+    raw = True
+
+    def __init__(self, sid, fanout, websocket):
+        self.websocket = websocket
+        super().__init__(sid, fanout)
+
+    def catch_up(self, payload):
+        data = b"".join(payload['chunks'])
+        super().catch_up(audio_frame(self.fanout.seq, AUDIO_FLAG_CATCHUP | AUDIO_FLAG_INIT | AUDIO_FLAG_KEYFRAME, data))
+
+    async def _wait_for_transport(self):
+        pass  # send_bytes waits for the socket's write buffer to drain
+
+    async def _send(self, event, data):
+        try:
+            await self.websocket.send_bytes(data)
+        except Exception:
+            # The socket is gone; audio_socket's receive loop notices and detaches this subscriber
+            self.queue.clear()
+
+    def transport_backlog(self):
+        return 0
+
+    def close(self, code=1000):
+        super().close()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code):
+        try:
+            await self.websocket.close(code)
+        except Exception:
+            pass
+
+class AudioFanout:
+    """Per-tour WS audio fan-out to AudioSubscribers"""
+
+    def __init__(self, tour_id):
+        self.tour_id = tour_id
+        self.subscribers = {}  # {sid: AudioSubscriber}
+        self.demoted = {}  # {sid: final stats} - slow clients taken off the audio path
+        # Ring buffer of recent chunks for late joiners: [(monotonic time, data, keyframe)]
+        self.ring = deque()
+        self.last_keyframe = None
+        self.published = 0
+        self.seq = 0  # sequence number of the last published chunk (raw frame header)
+
+    def subscribe(self, sid):
+        if sid not in self.subscribers:
+            self.demoted.pop(sid, None)
+            self.subscribers[sid] = AudioSubscriber(sid, self)
+
+    def unsubscribe(self, sid):
+        subscriber = self.subscribers.pop(sid, None)
+        if subscriber:
+            subscriber.close()
+        self.demoted.pop(sid, None)
+
+    def attach_raw(self, sid, websocket):
+        """Deliver to sid over a /ws/audio socket from now on (replaces its current subscriber)"""
+        previous = self.subscribers.pop(sid, None)
+        if previous:
+            previous.close()
+        self.demoted.pop(sid, None)
+        subscriber = self.subscribers[sid] = RawAudioSubscriber(sid, self, websocket)
+        return subscriber
+
+    def detach_raw(self, sid, subscriber):
+        if self.subscribers.get(sid) is subscriber:
+            del self.subscribers[sid]
+            subscriber.close()
+
+    def publish(self, data, init=False):
+        keyframe = is_keyframe_chunk(data)
+        self.published += 1
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self._remember(data, keyframe)
+        frame = None
+        for subscriber in list(self.subscribers.values()):
+            if subscriber.raw:
+                if frame is None:
+                    flags = (AUDIO_FLAG_KEYFRAME if keyframe else 0) | (AUDIO_FLAG_INIT if init else 0)
+                    frame = audio_frame(self.seq, flags, data)
+                subscriber.offer(frame, keyframe)
+            else:
+                subscriber.offer(data, keyframe)
+
+    def _remember(self, data, keyframe):
+        now = time.monotonic()
+        entry = (now, data, keyframe)
+        self.ring.append(entry)
+        if keyframe:
+            self.last_keyframe = entry
+        # Trim by age, but keep everything from the latest cluster start so the tail stays decodable
+        cutoff = now - AUDIO_RING_SECONDS
+        while len(self.ring) > 1 and (
+            len(self.ring) > AUDIO_RING_MAX_CHUNKS
+            or (self.ring[0][0] < cutoff and self.ring[0] is not self.last_keyframe)
+        ):
+            dropped = self.ring.popleft()
+            if dropped is self.last_keyframe:
+                self.last_keyframe = None
+
+    def reset_ring(self):
+        self.ring.clear()
+        self.last_keyframe = None
+
+    def decodable_tail(self):
+        """Chunks from the most recent cluster start to now (empty if no cluster is buffered)"""
+        if self.last_keyframe is None:
+            return []
+        tail = []
+        for entry in reversed(self.ring):
+            tail.append(entry[1])
+            if entry is self.last_keyframe:
+                break
+        tail.reverse()
+        return tail
+
+    def catch_up(self, sid, init_segment):
+        """Init segment + minimal decodable tail, delivered in one batched send"""
+        subscriber = self.subscribers.get(sid)
+        if subscriber is not None and subscriber.caught_up_at == self.published:
+            return 0  # duplicate request, nothing new since the last catch-up
+        tail = self.decodable_tail()
+        chunks = tail if tail and tail[0] is init_segment else [init_segment] + tail
+        payload = {'chunks': chunks}
+        if subscriber is not None:
+            subscriber.caught_up_at = self.published
+            subscriber.catch_up(payload)
+        else:
+            asyncio.create_task(sio_server.emit('audio_catchup', payload, to=sid, ignore_queue=True))
+        return len(chunks)
+
+    def handle_slow(self, subscriber):
+        """Take a chronically slow client off the audio fan-out"""
+        sid = subscriber.sid
+        self.subscribers.pop(sid, None)
+        subscriber.close(AUDIO_SOCKET_DEMOTED)
+        self.demoted[sid] = subscriber.stats()
+        if RELAY_SLOW_ACTION == 'disconnect':
+            logger.warning(f"Disconnecting slow audio client {sid} (tour '{self.tour_id}')")
+            asyncio.create_task(sio_server.disconnect(sid))
+        else:
+            logger.warning(f"Demoting slow audio client {sid} to text-only (tour '{self.tour_id}')")
+            # A raw socket may live on a different worker than the client's socket.io connection
+            asyncio.create_task(sio_server.emit('audio_demoted', {'reason': 'slow_connection'}, to=sid, ignore_queue=not subscriber.raw))
+
+    def stats(self):
+        return {
+            'tour': self.tour_id,
+            'policy': RELAY_OVERFLOW_POLICY,
+            'queue_size': RELAY_QUEUE_SIZE,
+            'ring_chunks': len(self.ring),
+            'ring_tail_chunks': len(self.decodable_tail()),
+            'subscribers': [s.stats() for s in self.subscribers.values()],
+            'demoted': list(self.demoted.values()),
+        }
+
+audio_relay_meter = RateMeter()
+
+def collect_audio_clients(field):
+    return [({'tour': tour.id, 'sid': sid[:8], 'transport': stats['transport']}, stats[field])
+            for tour in list(tours.values())
+            for sid, stats in ((sid, s.stats()) for sid, s in list(tour.audio_fanout.subscribers.items()))]
+
+metrics.counter('audio_relay_chunks_total', "WS audio chunks relayed to this worker's tourists")
+metrics.counter('audio_relay_bytes_total', "WS audio bytes relayed to this worker's tourists")
+metrics.gauge('audio_relay_chunks_per_second', "WS audio chunks relayed per second", lambda: audio_relay_meter.rates()[0])
+metrics.gauge('audio_relay_bytes_per_second', "WS audio bytes relayed per second", lambda: audio_relay_meter.rates()[1])
+metrics.gauge('audio_client_queue_depth', "Chunks waiting in a tourist's send queue", lambda: collect_audio_clients('queue_depth'))
+metrics.gauge('audio_client_transport_backlog', "engine.io packets queued but not yet written to a tourist's socket",
+              lambda: collect_audio_clients('transport_backlog'))
+metrics.gauge('audio_client_dropped', "Chunks dropped for a tourist by the overflow policy", lambda: collect_audio_clients('dropped'))
+
+# --- Encode-Once WebRTC Forwarding ---
+# With MediaRelay every tourist sender decodes nothing but re-encodes the guide's audio to Opus
+# on its own, so CPU grows with each listener. In 'encode-once' mode a single task per tour reads
+# the guide track once, encodes Opus once, and hands the same packets to every tourist track;
+# aiortc senders only packetize pre-encoded packets. 'per-listener' keeps the old relay path.
+WEBRTC_FORWARDING = os.environ.get("WEBRTC_FORWARDING", "encode-once")  # 'encode-once' or 'per-listener'
+FORWARD_QUEUE_PACKETS = int(os.environ.get("FORWARD_QUEUE_PACKETS", "25"))  # 20ms packets per tourist
+# '0' keeps every client on WS audio and never loads aiortc; 'auto' turns WebRTC on when aiortc is installed
+WEBRTC_SETTING = os.environ.get("WEBRTC_ENABLED", "auto")
+WEBRTC_ENABLED = importlib.util.find_spec("aiortc") is not None if WEBRTC_SETTING == "auto" else WEBRTC_SETTING != "0"
+
+@functools.cache
+def forwarded_audio_track_class():
+    """The track class derives from aiortc's MediaStreamTrack, so it is defined on first use"""
+
+    class ForwardedAudioTrack(aiortc.MediaStreamTrack):
+        """Tourist-side track yielding Opus packets encoded once by the tour's forwarder"""
+
+        kind = "audio"
+
+        def __init__(self, forwarder):
+            super().__init__()
+            self.forwarder = forwarder
+            self.queue = asyncio.Queue(maxsize=FORWARD_QUEUE_PACKETS)
+            self.dropped = 0
+
+        def push(self, packet):
+            if self.queue.full():
+                # A stalled sender only loses its own oldest audio
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(packet)
+
+        async def recv(self):
+            if self.readyState != "live":
+                raise aiortc.MediaStreamError
+            packet = await self.queue.get()
+            if packet is None:
+                self.stop()
+                raise aiortc.MediaStreamError
+            return packet
+
+        def stop(self):
+            super().stop()
+            self.forwarder.unsubscribe(self)
+
+    return ForwardedAudioTrack
+
+class EncodedAudioForwarder:
+    """Encodes a tour's guide audio once and fans the Opus packets out to tourist tracks"""
+
+    def __init__(self, tour_id):
+        self.tour_id = tour_id
+        self.subscribers = set()
+        self.source = None
+        self.task = None
+        self.encoded_packets = 0
+        self.encode_seconds = 0.0
+
+    def subscribe(self):
+        track = forwarded_audio_track_class()(self)
+        self.subscribers.add(track)
+        return track
+
+    def unsubscribe(self, track):
+        self.subscribers.discard(track)
+
+    def attach(self, track, relay):
+        """Start forwarding a new guide track (through its own relay subscription)"""
+        self.detach()
+        self.source = relay.subscribe(track)
+        self.task = asyncio.create_task(self._run(self.source))
+
+    def detach(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.source is not None:
+            self.source.stop()
+            self.source = None
+        self._end_subscribers()
+
+    def push_remote(self, pts, payload):
+        """Packet encoded by the guide's worker, received over the cluster broker"""
+        if not self.subscribers:
+            return  # no WebRTC tourists on this worker (and no reason to load PyAV for them)
+        packet = av.Packet(payload)
+        packet.pts = pts
+        packet.time_base = aiortc_opus.TIME_BASE
+        self.encoded_packets += 1
+        for track in list(self.subscribers):
+            track.push(packet)
+
+    def end_remote(self):
+        if self.task is None:
+            self._end_subscribers()
+
+    def _end_subscribers(self):
+        # Tourists renegotiate on the next guide_ready, like relayed tracks ending
+        for track in list(self.subscribers):
+            track.push(None)
+        self.subscribers.clear()
+
+    async def _run(self, source):
+        loop = asyncio.get_running_loop()
+        encoder = None
+        try:
+            while True:
+                frame = await source.recv()
+                if not self.subscribers and not cluster.enabled:
+                    encoder = None  # nobody listening, skip the encode entirely
+                    continue
+                if encoder is None:
+                    encoder = aiortc_opus.OpusEncoder()
+                started = time.perf_counter()
+                payloads, timestamp = await loop.run_in_executor(None, encoder.encode, frame)
+                self.encode_seconds += time.perf_counter() - started
+                for i, payload in enumerate(payloads):
+                    packet = av.Packet(payload)
+                    packet.pts = timestamp + i * 960
+                    packet.time_base = aiortc_opus.TIME_BASE
+                    self.encoded_packets += 1
+                    for track in list(self.subscribers):
+                        track.push(packet)
+                    await cluster.share_packet(self.tour_id, packet.pts, payload)
+        except aiortc.MediaStreamError:
+            logger.info(f"Guide audio ended, forwarder of tour '{self.tour_id}' stopped")
+            self._end_subscribers()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Audio forwarder error (tour '{self.tour_id}'): {e}")
+            self._end_subscribers()
+
+    def stats(self):
+        return {
+            'mode': WEBRTC_FORWARDING,
+            'active': self.task is not None and not self.task.done(),
+            'subscribers': len(self.subscribers),
+            'encoded_packets': self.encoded_packets,
+            'encode_ms': round(self.encode_seconds * 1000, 1),
+            'dropped': sum(track.dropped for track in self.subscribers),
+        }
+
+def add_guide_audio(tour, pc, offer_sdp):
+    """Attach the tour's guide audio to a tourist PC (before the offer is applied)"""
+    # A guide on another worker only reaches this one as forwarded Opus packets
+    remote = tour.guide_track is None
+    if (WEBRTC_FORWARDING == 'encode-once' or remote) and 'opus' in offer_sdp.lower():
+        pc.addTrack(tour.audio_forwarder.subscribe())
+        # Pre-encoded packets only fit an Opus sender
+        opus = [c for c in aiortc.RTCRtpSender.getCapabilities('audio').codecs if c.mimeType.lower() == 'audio/opus']
+        for transceiver in pc.getTransceivers():
+            if transceiver.kind == 'audio':
+                transceiver.setCodecPreferences(opus)
+    else:
+        pc.addTrack(tour.relay.subscribe(tour.guide_track))
+
+# --- Segmented Recording ---
+# Both audio paths are recorded compressed and split into time-based segments:
+#   - WebRTC guide track -> Opus in OGG (encoded on the writer thread, ~32 kbps instead of WAV's 1.5 Mbps)
+#   - WS recorder-mode chunks -> the browser's WebM/Opus stored as-is, each segment starting with
+#     the init segment and a cluster so it plays on its own
+# The event loop only enqueues into a bounded buffer; a single writer thread owns every open file.
+RECORDINGS_DIR = "recordings"
+RECORDING_SEGMENT_SECONDS = float(os.environ.get("RECORDING_SEGMENT_SECONDS", "300"))
+RECORDING_QUEUE_SIZE = int(os.environ.get("RECORDING_QUEUE_SIZE", "1000"))  # frames/chunks
+RECORDING_OPUS_BITRATE = int(os.environ.get("RECORDING_OPUS_BITRATE", "32000"))
+
+class OggOpusSegment:
+    """One OGG/Opus file fed with decoded PCM frames (writer thread only)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.container = av.open(path, "w", format="ogg")
+        self.stream = self.container.add_stream("libopus", rate=48000, layout="mono")
+        self.stream.bit_rate = RECORDING_OPUS_BITRATE
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=48000, frame_size=960)
+        self.samples = 0
+
+    def duration(self):
+        return self.samples / 48000
+
+    def write(self, frame):
+        for chunk in self.resampler.resample(frame):
+            chunk.pts = self.samples
+            self.samples += chunk.samples
+            for packet in self.stream.encode(chunk):
+                self.container.mux(packet)
+
+    def close(self):
+        for packet in self.stream.encode(None):
+            self.container.mux(packet)
+        self.container.close()
+
+class RawSegment:
+    """One file of pass-through bytes, e.g. WebM chunks (writer thread only)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.opened = time.monotonic()
+
+    def duration(self):
+        # Chunks arrive in real time, so wall time is the segment's length
+        return time.monotonic() - self.opened
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+class RecordingWriter:
+    """Bounded queue of ('frame'|'bytes'|'close', key, path, payload) ops drained by one thread"""
+
+    def __init__(self, max_items=RECORDING_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_items)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.segments = {}  # {key: OggOpusSegment | RawSegment} - touched by the writer thread only
+        self.enqueued = 0
+        self.dropped = 0
+        self.errors = 0
+        self.segments_closed = 0
+        self.bytes_written = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            os.makedirs(RECORDINGS_DIR, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name="recording-writer", daemon=True)
+            self.thread.start()
+
+    def submit(self, op, key, path=None, payload=None):
+        """Queue one op without ever blocking the event loop; drops (and counts) when full"""
+        if self.thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait((op, key, path, payload))
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=10.0):
+        """Write out what is queued, finalize open segments and stop the thread"""
+        with self.lock:
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                return
+            self.queue.put(_RECORDER_STOP)
+        thread.join(timeout)
+        logger.info(f"Recording writer stopped ({self.segments_closed} segments, {self.dropped} dropped)")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _RECORDER_STOP:
+                break
+            op, key, path, payload = item
+            try:
+                if op == 'close':
+                    self._close(key)
+                    continue
+                segment = self.segments.get(key)
+                if segment is None or segment.path != path:
+                    self._close(key)
+                    segment = OggOpusSegment(path) if op == 'frame' else RawSegment(path)
+                    self.segments[key] = segment
+                    index_recording_started(segment, key)
+                    logger.info(f"Recording segment started: {path}")
+                segment.write(payload)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Recording write error ({path}): {e}")
+        for key in list(self.segments):
+            self._close(key)
+
+    def _close(self, key):
+        segment = self.segments.pop(key, None)
+        if segment is None:
+            return
+        try:
+            segment.close()
+            size = os.path.getsize(segment.path)
+            self.bytes_written += size
+            index_recording_finished(segment, size)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Recording close error ({segment.path}): {e}")
+        self.segments_closed += 1
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'open_segments': len(self.segments),
+            'segments_closed': self.segments_closed,
+            'bytes_written': self.bytes_written,
+            'segment_seconds': RECORDING_SEGMENT_SECONDS,
+            'running': self.thread is not None and self.thread.is_alive(),
+        }
+
+_RECORDER_STOP = object()
+recording_writer = RecordingWriter()
+
+# The recordings table is kept current through the persistence writer: a row when a segment
+# opens (status 'recording'), completed with size/duration/transcript range when it closes.
+def utc_timestamp(seconds_ago=0):
+    """Same format and clock as SQLite's CURRENT_TIMESTAMP"""
+    return datetime.fromtimestamp(time.time() - seconds_ago, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def index_recording_started(segment, key):
+    tour_id, source = key
+    segment.started_at = utc_timestamp()
+    persistence_writer.submit(
+        "INSERT OR IGNORE INTO recordings (filename, tour_id, source, format, started_at, status) "
+        "VALUES (?, ?, ?, ?, ?, 'recording')",
+        (os.path.basename(segment.path), tour_id, source, segment.path.rsplit(".", 1)[-1], segment.started_at)
+    )
+
+def index_recording_finished(segment, size):
+    ended_at = utc_timestamp()
+    persistence_writer.submit(
+        "UPDATE recordings SET size_bytes = ?, duration_seconds = ?, ended_at = ?, status = 'complete', "
+        "transcript_from = (SELECT MIN(id) FROM transcripts WHERE created_at BETWEEN ? AND ?), "
+        "transcript_to = (SELECT MAX(id) FROM transcripts WHERE created_at BETWEEN ? AND ?) "
+        "WHERE filename = ?",
+        (size, round(segment.duration(), 2), ended_at, segment.started_at, ended_at, segment.started_at, ended_at,
+         os.path.basename(segment.path))
+    )
+
+async def start_recording_writer():
+    recording_writer.start()
+
+async def stop_recording_writer():
+    await asyncio.get_running_loop().run_in_executor(None, recording_writer.stop)
+
+atexit.register(recording_writer.stop)
+
+def recording_path(tour_id, source, ext):
+    safe_tour = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in tour_id)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(RECORDINGS_DIR, f"{source}_{safe_tour}_{stamp}_{uuid.uuid4().hex[:6]}.{ext}")
+
+class TourRecording:
+    """Decides segment boundaries for one tour's two audio paths; the writer does the I/O"""
+
+    def __init__(self, tour_id):
+        self.tour_id = tour_id
+        self.guide_task = None
+        self.guide_source = None
+        self.guide_path = None
+        self.guide_started = 0.0
+        self.ws_path = None
+        self.ws_started = 0.0
+        self.ws_init = None
+
+    # WebRTC path
+    def attach_guide_track(self, track, relay):
+        self.detach_guide_track()
+        self.guide_source = relay.subscribe(track)
+        self.guide_task = asyncio.create_task(self._record_guide(self.guide_source))
+
+    def detach_guide_track(self):
+        if self.guide_task is not None:
+            self.guide_task.cancel()
+            self.guide_task = None
+        if self.guide_source is not None:
+            self.guide_source.stop()
+            self.guide_source = None
+        self._close_guide()
+
+    def _close_guide(self):
+        if self.guide_path is not None:
+            recording_writer.submit('close', (self.tour_id, 'guide'))
+            self.guide_path = None
+
+    async def _record_guide(self, source):
+        try:
+            while True:
+                frame = await source.recv()
+                now = time.monotonic()
+                if self.guide_path is None or now - self.guide_started >= RECORDING_SEGMENT_SECONDS:
+                    self.guide_path = recording_path(self.tour_id, "guide", "ogg")
+                    self.guide_started = now
+                recording_writer.submit('frame', (self.tour_id, 'guide'), self.guide_path, frame)
+        except aiortc.MediaStreamError:
+            self._close_guide()
+        except asyncio.CancelledError:
+            pass
+
+    # WS (recorder mode) path
+    def ws_chunk(self, data, is_init):
+        now = time.monotonic()
+        if is_init:
+            # Keep only the EBML/Tracks header; its first cluster must not repeat in later segments
+            cut = data.find(WEBM_CLUSTER_ID)
+            self.ws_init = data[:cut] if cut > 0 else data
+            self._start_ws_segment(now)
+        elif self.ws_init is None:
+            return  # joined mid-session without a header; nothing decodable to store
+        elif self.ws_path is None or (now - self.ws_started >= RECORDING_SEGMENT_SECONDS
+                                      and is_keyframe_chunk(data)):
+            # Rotate on a cluster boundary and repeat the header so each file plays alone
+            self._start_ws_segment(now)
+            recording_writer.submit('bytes', (self.tour_id, 'ws'), self.ws_path, self.ws_init)
+        recording_writer.submit('bytes', (self.tour_id, 'ws'), self.ws_path, data)
+
+    def _start_ws_segment(self, now):
+        self.ws_path = recording_path(self.tour_id, "ws", "webm")
+        self.ws_started = now
+
+    def close_ws(self):
+        if self.ws_path is not None:
+            recording_writer.submit('close', (self.tour_id, 'ws'))
+        self.ws_path = None
+        self.ws_init = None
+
+    def close(self):
+        self.detach_guide_track()
+        self.close_ws()
+
+# --- Interim Transcript Coalescing ---
+# Partial STT hypotheses arrive many times a second and mostly repeat the previous one. Only the
+# latest partial is kept and pushed at most once per interval, as a delta against the last one sent
+# for the same utterance (prefix length to keep + new suffix). Finals bypass this and go out in full.
+INTERIM_TRANSCRIPT_INTERVAL = float(os.environ.get("INTERIM_TRANSCRIPT_INTERVAL", "0.25"))  # max one interim push per interval
+INTERIM_FULL_EVERY = int(os.environ.get("INTERIM_FULL_EVERY", "8"))  # every Nth push resends the whole text (late joiners)
+
+def common_prefix_length(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+def utf16_length(text):
+    """Length as JavaScript counts it (prefix lengths are applied with String.slice on the client)"""
+    return len(text.encode('utf-16-le')) // 2
+
+class InterimTranscripts:
+    """Per-tour interim pipeline: latest partial wins, flushed as a transcript_delta"""
+
+    def __init__(self, tour):
+        self.tour = tour
+        self.utterance = 1
+        self.pending = None  # (text, source_lang) waiting for the next push
+        self.sent_text = ''  # last text pushed for the current utterance
+        self.sent_count = 0
+        self.last_flush = 0.0
+        self.flush_task = None
+        # Counters
+        self.received = 0
+        self.sent = 0
+        self.full_chars = 0  # what pushing every partial in full would have cost
+        self.sent_chars = 0
+
+    def submit(self, text, source_lang):
+        self.received += 1
+        self.full_chars += len(text)
+        metrics.inc('interim_transcripts_received_total')
+        self.pending = (text, source_lang)
+        if self.flush_task is None:
+            delay = max(0.0, self.last_flush + INTERIM_TRANSCRIPT_INTERVAL - time.monotonic())
+            self.flush_task = asyncio.create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.flush()
+        finally:
+            if self.flush_task is asyncio.current_task():
+                self.flush_task = None
+
+    async def flush(self):
+        if self.pending is None:
+            return
+        text, source_lang = self.pending
+        self.pending = None
+        self.last_flush = time.monotonic()
+        if text == self.sent_text:
+            return
+        prefix = 0 if self.sent_count % INTERIM_FULL_EVERY == 0 else common_prefix_length(self.sent_text, text)
+        delta = {'u': self.utterance, 'p': utf16_length(text[:prefix]), 's': text[prefix:], 'l': source_lang}
+        self.sent_text = text
+        self.sent_count += 1
+        self.sent += 1
+        self.sent_chars += len(delta['s'])
+        metrics.inc('interim_transcripts_sent_total')
+        await emit_to_tourists('transcript_delta', delta, [self.tour.room('tourists'), self.tour.room('guides')])
+
+    def finish_utterance(self):
+        """A final arrived: it supersedes the pending partial. Returns the finished utterance id."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        utterance = self.utterance
+        self.utterance += 1
+        self.pending = None
+        self.sent_text = ''
+        self.sent_count = 0
+        return utterance
+
+    def stats(self):
+        return {
+            'tour': self.tour.id,
+            'interval': INTERIM_TRANSCRIPT_INTERVAL,
+            'utterance': self.utterance,
+            'received': self.received,
+            'sent': self.sent,
+            'coalesced': self.received - self.sent,
+            'full_chars': self.full_chars,
+            'sent_chars': self.sent_chars,
+        }
+
+metrics.counter('interim_transcripts_received_total', "Interim hypotheses received from guides")
+metrics.counter('interim_transcripts_sent_total', "transcript_delta pushes after coalescing")
+
+# --- Ordered Final Transcripts ---
+# Concurrent socket.io handlers must not let a slow translation reorder finals. Each tour drains its
+# finals one at a time: the original is saved and sent at once, in arrival order; translations run
+# concurrently and follow as transcript_translation ({utterance, translations}), and the saved row
+# gets them through an UPDATE queued behind its INSERT.
+class FinalTranscripts:
+    """Per-tour FIFO of final transcripts"""
+
+    def __init__(self, tour):
+        self.tour = tour
+        self.queue = deque()  # (text, source_lang, utterance)
+        self.drain_task = None
+        self.translations = set()  # running follow-up tasks (kept referenced until done)
+
+    def submit(self, text, source_lang):
+        self.queue.append((text, source_lang, self.tour.interim.finish_utterance()))
+        if self.drain_task is None:
+            self.drain_task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        try:
+            while self.queue:
+                try:
+                    await self._publish(*self.queue.popleft())
+                except Exception as e:
+                    logger.error(f"Final transcript error (tour '{self.tour.id}'): {e}")
+        finally:
+            self.drain_task = None
+
+    async def _publish(self, text, source_lang, utterance):
+        tour = self.tour
+        languages = translation_engine.target_languages(tour_languages(tour), source_lang)
+        session_id = await transcript_sessions.current(tour)
+        # Write-behind; translations stay NULL until the follow-up fills them in
+        persistence_writer.submit(
+            "INSERT INTO transcripts (text, translations, tour_id, session_id) VALUES (?, ?, ?, ?)",
+            (text, None if languages else "{}", tour.id, session_id),
+            text_line=text
+        )
+        response = {'original': text, 'source_lang': source_lang, 'translations': {}, 'isFinal': True,
+                    'utterance': utterance, 'translating': languages}
+        await emit_to_tourists('transcript', response, [tour.room('tourists'), tour.room('guides')])
+        logger.info(f"[TRANSCRIPT] Broadcasted to tour '{tour.id}': '{text[:20]}...' ({len(languages)} translations to follow)")
+        if languages:
+            task = asyncio.create_task(self._translate(text, source_lang, utterance, session_id, languages))
+            self.translations.add(task)
+            task.add_done_callback(self.translations.discard)
+
+    async def _translate(self, text, source_lang, utterance, session_id, languages):
+        tour = self.tour
+        translations = await translation_engine.translate_many(text, source_lang, languages)
+        persistence_writer.submit(
+            "UPDATE transcripts SET translations = ? WHERE id = (SELECT MIN(id) FROM transcripts "
+            "WHERE session_id = ? AND text = ? AND translations IS NULL)",
+            (json.dumps(translations, ensure_ascii=False), session_id, text)
+        )
+        # Per-language fan-out: each tourist only receives its own language (an empty dict means
+        # the server could not translate it and the client falls back to its own translation)
+        for lang in languages:
+            await emit_to_tourists('transcript_translation',
+                                   {'utterance': utterance, 'translations': {lang: translations[lang]} if lang in translations else {}},
+                                   tour.room(f"lang:{lang}"))
+        await sio_server.emit('transcript_translation', {'utterance': utterance, 'translations': translations},
+                              room=tour.room('guides'))
+
+# --- Multi-Tour State ---
+# One server process can host several tour groups at once. Everything that used to be a
+# process-global guide singleton (track, PC, audio cache, rooms) now lives on a Tour.
+DEFAULT_TOUR_ID = "default"
+MONITOR_UPDATE_INTERVAL = float(os.environ.get("MONITOR_UPDATE_INTERVAL", "0.5"))  # max one monitor push per interval
+JOIN_ADMISSION_RATE = float(os.environ.get("JOIN_ADMISSION_RATE", "30"))  # joins admitted per second
+JOIN_ADMISSION_BURST = int(os.environ.get("JOIN_ADMISSION_BURST", "20"))
+
+class Tour:
+    """State owned by a single tour group"""
+
+    def __init__(self, tour_id):
+        self.id = tour_id
+        self._relay = None
+        self.guide_track = None
+        self.guide_pc = None
+        self.guide_info = {'sid': None, 'broadcasting': False, 'started_at': None}
+        # WS audio relay stats and init segment cache
+        self.audio_chunks_count = 0
+        self.audio_init_segment = None
+        self.audio_session_active = False
+        self.audio_fanout = AudioFanout(tour_id)
+        self.audio_forwarder = EncodedAudioForwarder(tour_id)
+        self.recording = TourRecording(tour_id)
+        self.interim = InterimTranscripts(self)
+        self.finals = FinalTranscripts(self)
+        self.session_id = None  # open transcript session, looked up on the first final transcript
+        # Members and counters, maintained incrementally on join/leave/language change
+        self.users = {}  # {sid: info} - same dicts as connected_users
+        self.role_counts = Counter()
+        self.lang_counts = Counter()  # tourists only
+        # Coalesced monitor pushes
+        self.monitor_pending = set()  # sids touched since the last push
+        self.monitor_reported = set()  # tourist sids the monitors currently list
+        self.monitor_flush_task = None
+        self.last_status_broadcast = None  # guide_status last sent to the tourists room
+
+    @property
+    def relay(self):
+        """MediaRelay for the guide's WebRTC track, created with the first peer connection"""
+        if self._relay is None:
+            self._relay = aiortc_media.MediaRelay()
+        return self._relay
+
+    def room(self, name):
+        """Socket.io room name scoped to this tour ('tourists', 'guides', 'monitors')"""
+        return f"{self.id}:{name}"
+
+    def guide_status(self):
+        return {'online': self.guide_info['sid'] is not None,
+                'broadcasting': self.guide_info.get('broadcasting', False)}
+
+    def reset_guide(self):
+        self.recording.close()
+        self.guide_track = None
+        self.guide_pc = None
+        self.guide_info = {'sid': None, 'broadcasting': False, 'started_at': None}
+
+    def reset_audio(self):
+        self.audio_chunks_count = 0
+        self.audio_init_segment = None
+        self.audio_session_active = False
+        self.audio_fanout.reset_ring()
+
+    def members(self):
+        return self.users
+
+    def add_user(self, sid, info):
+        self.users[sid] = info
+        self.role_counts[info['role']] += 1
+        if info['role'] == 'tourist':
+            self.lang_counts[info['language']] += 1
+        self.monitor_pending.add(sid)
+
+    def remove_user(self, sid):
+        info = self.users.pop(sid, None)
+        if info is None:
+            return None
+        self.role_counts[info['role']] -= 1
+        if info['role'] == 'tourist':
+            self.lang_counts[info['language']] -= 1
+        self.monitor_pending.add(sid)
+        return info
+
+    def set_language(self, sid, language):
+        info = self.users.get(sid)
+        if info is None:
+            return
+        if info['role'] == 'tourist':
+            self.lang_counts[info['language']] -= 1
+            self.lang_counts[language] += 1
+        info['language'] = language
+        self.monitor_pending.add(sid)
+
+tours = {}  # {tour_id: Tour}
+
+class AdmissionQueue:
+    """FIFO token bucket that spreads a burst of joins (a bus scanning the QR code) over time"""
+
+    def __init__(self, rate=JOIN_ADMISSION_RATE, burst=JOIN_ADMISSION_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+        self.admitted = 0
+        self.max_wait_ms = 0.0
+
+    async def admit(self):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self.lock:
+                while True:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+        self.admitted += 1
+        self.max_wait_ms = max(self.max_wait_ms, (time.monotonic() - started) * 1000)
+
+    def stats(self):
+        return {'rate': self.rate, 'burst': self.burst, 'waiting': self.waiting,
+                'admitted': self.admitted, 'max_wait_ms': round(self.max_wait_ms, 1)}
+
+join_admission = AdmissionQueue()
+
+async def publish_guide_status(tour):
+    """Broadcast guide_status to the tour's tourists only when online/broadcasting actually changed"""
+    await cluster.share_guide(tour)
+    status = tour.guide_status()
+    if status == tour.last_status_broadcast:
+        return
+    tour.last_status_broadcast = status
+    logger.info(f"Broadcast guide_status to tour '{tour.id}': online={status['online']}, broadcasting={status['broadcasting']}")
+    # Every worker derives this from its replica of the tour, so each one tells only its own clients
+    await emit_to_tourists('guide_status', status, tour.room('tourists'), ignore_queue=True)
+
+def normalize_tour_id(tour_id):
+    tour_id = str(tour_id or '').strip()
+    return tour_id[:64] if tour_id else DEFAULT_TOUR_ID
+
+def get_tour(tour_id=None):
+    """Return the Tour for tour_id, creating it on first use"""
+    tour_id = normalize_tour_id(tour_id)
+    tour = tours.get(tour_id)
+    if tour is None:
+        tour = Tour(tour_id)
+        tours[tour_id] = tour
+        logger.info(f"Created tour '{tour_id}'")
+    return tour
+
+def existing_tour(tour_id):
+    """Tour for tour_id if it is live on this worker (read-only lookups must not create tours)"""
+    return tours.get(normalize_tour_id(tour_id))
+
+def unknown_tour(tour_id):
+    body = json.dumps({"status": "error", "message": f"Unknown tour '{tour_id}'"})
+    return Response(content=body, status_code=404, media_type="application/json")
+
+def tour_for_sid(sid):
+    """Tour the given client joined (default tour if it has not joined yet)"""
+    user = connected_users.get(sid)
+    return get_tour(user.get('tour') if user else None)
+
+def release_tour_if_empty(tour):
+    if tour.id == DEFAULT_TOUR_ID or tour.members():
+        return
+    tours.pop(tour.id, None)
+    logger.info(f"Released empty tour '{tour.id}'")
+
+# --- Multi-Worker Cluster ---
+# On top of the socket.io client manager, every worker keeps a replica of each tour's presence and
+# guide state. Changes made by a worker's own clients are stored in the backend (so a starting
+# worker can load them) and announced on a state channel that the other workers apply to their
+# replicas. Guide audio is published once per WS chunk / encoded Opus packet and every worker fans
+# it out to its own tourists, so relay work is sharded across workers.
+CLUSTER_HEARTBEAT = float(os.environ.get("CLUSTER_HEARTBEAT", "5"))  # seconds; a worker is dead after 3 missed
+
+class Cluster:
+    """Shared tour state and audio between workers (inactive without CLIENT_MANAGER_URL)"""
+
+    def __init__(self, url, prefix=CLUSTER_CHANNEL):
+        self.url = url
+        self.enabled = bool(url)
+        self.worker_id = uuid.uuid4().hex[:8]
+        self.prefix = prefix
+        self.state_channel = f"{prefix}:state"
+        self.audio_channel = f"{prefix}:audio"
+        self.opus_channel = f"{prefix}:opus"
+        self.redis = None
+        self.tasks = []
+        self.shared_guide = {}  # {tour_id: guide_info as last shared/applied}
+        self.remote_users = {}  # {sid: (tour_id, worker_id)} users connected to other workers
+        self.published = 0
+        self.received = 0
+
+    def key(self, *parts):
+        return ":".join((self.prefix,) + parts)
+
+    async def start(self):
+        if not self.enabled:
+            return
+        from redis import asyncio as aioredis  # optional dependency, only needed with CLIENT_MANAGER_URL
+        self.redis = aioredis.Redis.from_url(self.url)
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.state_channel, self.audio_channel, self.opus_channel)
+        await self._heartbeat()
+        await self._load()
+        self.tasks = [asyncio.create_task(self._listen(pubsub)), asyncio.create_task(self._heartbeat_loop())]
+        logger.info(f"Cluster worker {self.worker_id} joined via {self.url}")
+
+    async def stop(self):
+        if self.redis is None:
+            return
+        for task in self.tasks:
+            task.cancel()
+        # Clients of this worker are gone with it
+        for sid, info in list(connected_users.items()):
+            await self.user_left(info.get('tour'), sid)
+        await self.redis.delete(self.key("worker", self.worker_id))
+        await self.redis.aclose()
+        self.redis = None
+
+    # Local changes -> backend
+    async def _publish_state(self, message):
+        message['worker'] = self.worker_id
+        await self.redis.publish(self.state_channel, json.dumps(message))
+        self.published += 1
+
+    async def share_presence(self, tour, sid, info):
+        if self.redis is None:
+            return
+        entry = dict(info, worker=self.worker_id)
+        await self.redis.sadd(self.key("tours"), tour.id)
+        await self.redis.hset(self.key("users", tour.id), sid, json.dumps(entry))
+        await self._publish_state({'type': 'presence', 'tour': tour.id, 'sid': sid, 'info': entry})
 
-@app.get("/", response_class=HTMLResponse)
+    async def user_left(self, tour_id, sid):
+        if self.redis is None:
+            return
+        await self.redis.hdel(self.key("users", tour_id), sid)
+        await self._publish_state({'type': 'leave', 'tour': tour_id, 'sid': sid})
+
+    async def share_guide(self, tour):
+        if self.redis is None or self.shared_guide.get(tour.id) == tour.guide_info:
+            return
+        self.shared_guide[tour.id] = dict(tour.guide_info)
+        await self.redis.set(self.key("guide", tour.id), json.dumps(tour.guide_info))
+        await self._publish_state({'type': 'guide', 'tour': tour.id, 'info': tour.guide_info})
+
+    async def share_event(self, kind, tour_id=None):
+        """Tell the other workers to drop derived state ('places', 'session_closed')"""
+        if self.redis is None:
+            return
+        await self._publish_state({'type': kind, 'tour': tour_id})
+
+    def _frame(self, tour_id, *fields):
+        tour = tour_id.encode("utf-8")
+        return self.worker_id.encode() + struct.pack("!H", len(tour)) + tour + b"".join(fields)
+
+    async def share_audio(self, tour, data, is_init):
+        if self.redis is None:
+            return
+        if is_init:
+            await self.redis.set(self.key("audio_init", tour.id), data)
+        await self.redis.publish(self.audio_channel, self._frame(tour.id, data))
+
+    async def share_packet(self, tour_id, pts, payload):
+        if self.redis is None:
+            return
+        await self.redis.publish(self.opus_channel, self._frame(tour_id, struct.pack("!q", pts), payload))
+
+    def guide_elsewhere(self, tour):
+        """True if the tour's guide is connected to another worker (its audio arrives over the broker)"""
+        sid = tour.guide_info.get('sid')
+        return self.enabled and sid is not None and sid in self.remote_users
+
+    async def put_value(self, name, value, ttl):
+        if self.redis is not None:
+            await self.redis.set(self.key(name), json.dumps(value), ex=ttl)
+
+    async def get_value(self, name):
+        if self.redis is None:
+            return None
+        raw = await self.redis.get(self.key(name))
+        return json.loads(raw) if raw else None
+
+    # Backend -> local replicas
+    async def _load(self):
+        """Bootstrap the replicas from the stored state of live workers"""
+        for raw_tour in await self.redis.smembers(self.key("tours")):
+            tour_id = raw_tour.decode("utf-8")
+            users = await self.redis.hgetall(self.key("users", tour_id))
+            for raw_sid, raw_info in users.items():
+                info = json.loads(raw_info)
+                await self._apply_presence(tour_id, raw_sid.decode(), info)
+            guide = await self.redis.get(self.key("guide", tour_id))
+            if guide:
+                await self._apply_guide(tour_id, json.loads(guide))
+            init_segment = await self.redis.get(self.key("audio_init", tour_id))
+            if init_segment:
+                get_tour(tour_id).audio_init_segment = init_segment
+        await self._sweep()
+
+    async def _listen(self, pubsub):
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    self.received += 1
+                    channel = message['channel'].decode()
+                    if channel == self.state_channel:
+                        await self._apply_state(json.loads(message['data']))
+                    else:
+                        self._apply_frame(channel, message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cluster listener error: {e}")
+                await asyncio.sleep(1)
+
+    async def _apply_state(self, message):
+        if message.get('worker') == self.worker_id:
+            return
+        kind, tour_id = message['type'], message.get('tour')
+        if kind == 'presence':
+            await self._apply_presence(tour_id, message['sid'], message['info'])
+        elif kind == 'leave':
+            await self._apply_leave(message['sid'])
+        elif kind == 'guide':
+            await self._apply_guide(tour_id, message['info'])
+        elif kind == 'places':
+            places_catalog.invalidate()
+        elif kind == 'session_closed' and tour_id in tours:
+            tours[tour_id].session_id = None
+
+    def _apply_frame(self, channel, frame):
+        if frame[:8] == self.worker_id.encode():
+            return
+        (length,) = struct.unpack_from("!H", frame, 8)
+        tour = get_tour(frame[10:10 + length].decode("utf-8"))
+        body = frame[10 + length:]
+        if channel == self.audio_channel:
+            relay_audio_chunk(tour, body)
+        else:
+            (pts,) = struct.unpack_from("!q", body)
+            tour.audio_forwarder.push_remote(pts, body[8:])
+
+    async def _apply_presence(self, tour_id, sid, info):
+        if info.get('worker') == self.worker_id:
+            return
+        tour = get_tour(tour_id)
+        previous = self.remote_users.get(sid)
+        if previous and previous[0] != tour.id:
+            await self._apply_leave(sid)
+        current = tour.users.get(sid)
+        if current is not None and current['role'] == info['role']:
+            tour.set_language(sid, info['language'])
+        else:
+            tour.remove_user(sid)
+            tour.add_user(sid, info)
+        self.remote_users[sid] = (tour.id, info.get('worker'))
+        await broadcast_monitor_update(tour)
+
+    async def _apply_leave(self, sid):
+        entry = self.remote_users.pop(sid, None)
+        if entry is None:
+            return
+        tour = get_tour(entry[0])
+        tour.remove_user(sid)
+        tour.audio_fanout.unsubscribe(sid)  # its /ws/audio socket may be attached here
+        await broadcast_monitor_update(tour)
+        release_tour_if_empty(tour)
+
+    async def _apply_guide(self, tour_id, info):
+        tour = get_tour(tour_id)
+        self.shared_guide[tour.id] = dict(info)
+        tour.guide_info = info
+        if info.get('sid') is None:
+            tour.audio_forwarder.end_remote()
+        await publish_guide_status(tour)
+        await broadcast_monitor_update(tour)
+
+    # Worker liveness
+    async def _heartbeat(self):
+        await self.redis.set(self.key("worker", self.worker_id), "1", ex=int(CLUSTER_HEARTBEAT * 3))
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(CLUSTER_HEARTBEAT)
+            try:
+                await self._heartbeat()
+                await self._sweep()
+            except Exception as e:
+                logger.error(f"Cluster heartbeat error: {e}")
+
+    async def _sweep(self):
+        """Forget users of workers that stopped heartbeating (crashed without cleaning up)"""
+        workers = {worker for _, worker in self.remote_users.values()}
+        for worker in workers:
+            if await self.redis.exists(self.key("worker", worker)):
+                continue
+            logger.warning(f"Cluster worker {worker} is gone - dropping its users")
+            for sid, (tour_id, owner) in list(self.remote_users.items()):
+                if owner != worker:
+                    continue
+                await self.redis.hdel(self.key("users", tour_id), sid)
+                await self._apply_leave(sid)
+                tour = get_tour(tour_id)
+                if tour.guide_info.get('sid') == sid:
+                    tour.guide_info = {'sid': None, 'broadcasting': False, 'started_at': None}
+                    await self._apply_guide(tour_id, tour.guide_info)
+                    await self.redis.set(self.key("guide", tour_id), json.dumps(tour.guide_info))
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'worker': self.worker_id,
+            'pid': os.getpid(),
+            'local_clients': len(connected_users),
+            'remote_users': len(self.remote_users),
+            'published': self.published,
+            'received': self.received,
+        }
+
+cluster = Cluster(CLIENT_MANAGER_URL)
+
+async def start_cluster():
+    await cluster.start()
+
+async def stop_cluster():
+    await cluster.stop()
+
+get_tour(DEFAULT_TOUR_ID)
+
+# --- Static Asset Pipeline ---
+# Everything under static/ is read once at startup, hashed and precompressed (gzip, plus brotli when
+# the brotli package is installed). Pages link their scripts by content hash (/static/app.<hash>.js),
+# which phones cache for a year without asking again; the pages themselves revalidate with a 304.
+# Files edited under static/ are picked up on the next server start.
+STATIC_DIR = "static"
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_COMPRESS_MIN_BYTES = 512
+STATIC_LINK_PATTERN = re.compile(r'((?:src|href)=")/?static/([^"?#]+)"')
+
+def is_compressible(content_type):
+    return content_type.startswith("text/") or content_type in (
+        "application/javascript", "application/json", "image/svg+xml")
+
+class StaticAsset:
+    """One file under static/: its bytes per content-encoding, keyed by a content hash"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if is_compressible(self.content_type):
+            self.content_type += "; charset=utf-8"
+        self.hash = hashlib.sha256(data).hexdigest()[:12]
+        stem, dot, ext = name.rpartition(".")
+        self.hashed_name = f"{stem}.{self.hash}.{ext}" if dot else f"{name}.{self.hash}"
+        self.bodies = {"identity": data}  # {'identity' | 'gzip' | 'br': bytes}
+
+    def compress(self, encoding, compressor):
+        data = self.bodies["identity"]
+        if len(data) < STATIC_COMPRESS_MIN_BYTES or not is_compressible(self.content_type):
+            return
+        body = compressor(data)
+        if len(body) < len(data):
+            self.bodies = {**self.bodies, encoding: body}  # replaced, not mutated: requests read it concurrently
+
+    def etag(self, encoding):
+        return f'"{self.hash}"' if encoding == "identity" else f'"{self.hash}-{encoding}"'
+
+class StaticAssets:
+    """In-memory static/ directory with content negotiation, ETags and hashed URLs"""
+
+    def __init__(self, directory=STATIC_DIR):
+        self.directory = directory
+        self.assets = {}  # {name: StaticAsset}
+        self.hashed = {}  # {hashed name: StaticAsset}
+        self.responses = Counter()  # {status: count}
+        self.bytes_sent = Counter()  # {encoding: bytes}
+
+    def load(self):
+        """Read, hash and gzip every file (startup hook, off the event loop)"""
+        files = {}
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, self.directory).replace(os.sep, "/")] = f.read()
+        assets = {name: StaticAsset(name, data) for name, data in files.items() if not name.endswith(".html")}
+        # Pages are hashed after their links point at hashed scripts, so a new app.js also changes index.html
+        for name, data in files.items():
+            if name.endswith(".html"):
+                page = STATIC_LINK_PATTERN.sub(
+                    lambda m: f'{m.group(1)}/static/{assets[m.group(2)].hashed_name}"' if m.group(2) in assets else m.group(0),
+                    data.decode("utf-8"))
+                assets[name] = StaticAsset(name, page.encode("utf-8"))
+        for asset in assets.values():
+            asset.compress("gzip", lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+        self.assets = assets
+        self.hashed = {asset.hashed_name: asset for asset in assets.values()}
+        logger.info(f"Static assets loaded: {len(assets)} files, "
+                    f"{sum(len(a.bodies['identity']) for a in assets.values()) // 1024} KB")
+
+    def compress_brotli(self):
+        """Brotli at maximum quality is slow, so it runs after startup; gzip is served until then"""
+        try:
+            import brotli  # optional: pip install brotli
+        except ImportError:
+            return
+        for asset in list(self.assets.values()):
+            asset.compress("br", lambda data: brotli.compress(data, quality=11))
+
+    def lookup(self, path):
+        """-> (asset, immutable): hashed names may be cached forever, plain names must revalidate"""
+        asset = self.hashed.get(path)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(path), False
+
+    def response(self, request, asset, immutable=False):
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), asset.bodies)
+        body = asset.bodies[encoding]
+        headers = {
+            "ETag": asset.etag(encoding),
+            "Vary": "Accept-Encoding",
+            "Cache-Control": f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable" if immutable else "no-cache",
+        }
+        if etag_matches(request.headers.get("if-none-match"), asset.hash):
+            self.responses[304] += 1
+            metrics.inc('static_responses_total', status='304')
+            return Response(status_code=304, headers=headers)
+        headers["Content-Type"] = asset.content_type
+        headers["Content-Length"] = str(len(body))
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        self.responses[200] += 1
+        metrics.inc('static_responses_total', status='200')
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers)
+        self.bytes_sent[encoding] += len(body)
+        metrics.inc('static_bytes_sent_total', len(body), encoding=encoding)
+        return Response(content=body, headers=headers)
+
+    def stats(self):
+        return {
+            'assets': {name: {'url': f"/static/{a.hashed_name}",
+                              **{encoding: len(body) for encoding, body in a.bodies.items()}}
+                       for name, a in sorted(self.assets.items())},
+            'responses': dict(self.responses),
+            'bytes_sent': dict(self.bytes_sent),
+        }
+
+def negotiate_encoding(accept_encoding, available):
+    """Best of br > gzip > identity that the client accepts (q=0 excludes)"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+def etag_matches(if_none_match, content_hash):
+    """Any variant of the same content is still valid for the client (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == content_hash:
+            return True
+    return False
+
+static_assets = StaticAssets()
+
+metrics.counter('static_responses_total', "Static asset and page responses by status (200 or 304)")
+metrics.counter('static_bytes_sent_total', "Static asset body bytes sent by content-encoding")
+
+async def load_static_assets():
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, static_assets.load)
+    loop.run_in_executor(None, static_assets.compress_brotli)
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def get_static_asset(path: str, request: Request):
+    asset, immutable = static_assets.lookup(path)
+    if asset is None:
+        return Response(status_code=404)
+    return static_assets.response(request, asset, immutable)
+
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
 async def index(request: Request):
-    with open("static/index.html", encoding="utf-8") as f:
-        return f.read()
+    return static_assets.response(request, static_assets.assets["index.html"])
 
 @sio_server.event
 async def connect(sid, environ):
     logger.info(f"Client connected: {sid}")
-    await sio_server.emit('connection_success', {'sid': sid}, room=sid)
+    await sio_server.emit('connection_success', {'sid': sid, 'worker': cluster.worker_id}, room=sid, ignore_queue=True)
 
 @sio_server.event
 async def disconnect(sid):
-    global guide_track, guide_pc, guide_info
     logger.info(f"Client disconnected: {sid}")
     
     # Remove from connected users
     if sid in connected_users:
         user = connected_users.pop(sid)
-        logger.info(f"Removed {user['role']} from tracking")
+        tour = get_tour(user.get('tour'))
+        tour.remove_user(sid)
+        logger.info(f"Removed {user['role']} from tracking (tour '{tour.id}')")
+        await cluster.user_left(tour.id, sid)
+        tour.audio_fanout.unsubscribe(sid)
+        await peer_registry.close(sid, "client disconnected")
         
-        # If guide disconnected, reset all guide state
-        if user['role'] == 'guide':
-            guide_track = None
-            guide_pc = None
-            guide_info = {'sid': None, 'broadcasting': False, 'started_at': None}
-            logger.info("Guide disconnected - cleared guide_track and guide_info")
-            await sio_server.emit('guide_status', {'online': False}, room='tourists')
+        # If this tour's guide disconnected, reset its guide state
+        if user['role'] == 'guide' and tour.guide_info['sid'] == sid:
+            tour.reset_guide()
+            logger.info(f"Guide disconnected - cleared guide state of tour '{tour.id}'")
+            await publish_guide_status(tour)
         
         # Broadcast updated user count to monitors
-        await broadcast_monitor_update()
+        await broadcast_monitor_update(tour)
+        release_tour_if_empty(tour)
 
 @sio_server.event
 async def join_room(sid, data):
-    global guide_info
     role = data.get('role')
     language = data.get('language', 'en')
-    logger.info(f"Client {sid} joined as {role} with language {language}")
+
+    # Smooth connection bursts before doing any per-join work
+    await join_admission.admit()
+    if not sio_server.manager.is_connected(sid, '/'):
+        return None
+    tour = get_tour(data.get('tour'))
+    logger.info(f"Client {sid} joined tour '{tour.id}' as {role} with language {language}")
+
+    # Switching tours: leave the rooms of the previous one
+    previous = connected_users.get(sid)
+    if previous and previous.get('tour') != tour.id:
+        old_tour = get_tour(previous.get('tour'))
+        for name in ('guides', 'monitors', 'tourists', f"lang:{previous.get('language', 'en')}"):
+            await sio_server.leave_room(sid, old_tour.room(name))
+        old_tour.audio_fanout.unsubscribe(sid)
+        if old_tour.guide_info['sid'] == sid:
+            old_tour.reset_guide()
+            await publish_guide_status(old_tour)
+    if previous:
+        get_tour(previous.get('tour')).remove_user(sid)
     
     # Track user
     connected_users[sid] = {
         'role': role,
         'language': language,
+        'tour': tour.id,
         'connected_at': datetime.now().isoformat(),
         'status': 'active'
     }
+    tour.add_user(sid, connected_users[sid])
+    await cluster.share_presence(tour, sid, connected_users[sid])
+    if previous and previous.get('tour') != tour.id:
+        await broadcast_monitor_update(old_tour)
+        release_tour_if_empty(old_tour)
     
+    if role in ('guide', 'monitor'):
+        tour.audio_fanout.unsubscribe(sid)
+
     if role == 'guide':
-        await sio_server.enter_room(sid, 'guides')
-        guide_info['sid'] = sid
+        await sio_server.enter_room(sid, tour.room('guides'))
+        tour.guide_info['sid'] = sid
         # started_at should only be set when broadcast actually starts
     elif role == 'monitor':
-        await sio_server.enter_room(sid, 'monitors')
+        await sio_server.enter_room(sid, tour.room('monitors'))
+        # Full snapshot once; afterwards the monitor receives coalesced diffs. Every tourist in the
+        # snapshot joins the shared baseline so that its leaving is diffed; pending entries stay
+        # queued, as they are idempotent for this monitor but still owed to the others.
+        snapshot = get_connection_stats(tour)
+        tour.monitor_reported.update(s for s, info in tour.users.items() if info['role'] == 'tourist')
+        await sio_server.emit('monitor_update', snapshot, room=sid)
     else:
-        await sio_server.enter_room(sid, 'tourists')
-        # Notify new tourist about guide status
-        is_guide_online = (guide_info['sid'] is not None)
-        is_broadcasting = guide_info.get('broadcasting', False)
-        logger.info(f"Notifying {sid} of guide status: online={is_guide_online}, broadcasting={is_broadcasting}")
-        await sio_server.emit('guide_status', {'online': is_guide_online, 'broadcasting': is_broadcasting}, room=sid)
+        await sio_server.enter_room(sid, tour.room('tourists'))
+        # Per-language room for server-side translated transcripts
+        if previous and previous.get('tour') == tour.id and previous.get('language') != language:
+            await sio_server.leave_room(sid, tour.room(f"lang:{previous.get('language', 'en')}"))
+        await sio_server.enter_room(sid, tour.room(f"lang:{language}"))
+        # WS audio is delivered through a per-tourist bounded queue
+        tour.audio_fanout.subscribe(sid)
     
-    # BROADCAST STATUS TO ALL TOURISTS when ANYONE joins/changes
-    is_guide_online = (guide_info['sid'] is not None)
-    is_broadcasting = guide_info.get('broadcasting', False)
-    logger.info(f"Broadcast guide_status to all: online={is_guide_online}, broadcasting={is_broadcasting}")
-    await sio_server.emit('guide_status', {'online': is_guide_online, 'broadcasting': is_broadcasting}, room='tourists')
+    # Tourists only hear about the guide when its state changes (a guide joining);
+    # the joiner itself gets the current state in the join acknowledgement
+    await publish_guide_status(tour)
     
     # Broadcast updated user count to monitors
-    await broadcast_monitor_update()
+    await broadcast_monitor_update(tour)
+
+    status = tour.guide_status()
+    return {'status': 'ok', 'tour': tour.id, 'guide_status': status}
 
 @sio_server.event
 async def update_language(sid, data):
     """Update tourist's selected language"""
     language = data.get('language', 'en')
     if sid in connected_users:
-        connected_users[sid]['language'] = language
+        tour = tour_for_sid(sid)
+        old_language = connected_users[sid]['language']
+        tour.set_language(sid, language)
+        await cluster.share_presence(tour, sid, connected_users[sid])
+        if connected_users[sid]['role'] == 'tourist' and old_language != language:
+            await sio_server.leave_room(sid, tour.room(f"lang:{old_language}"))
+            await sio_server.enter_room(sid, tour.room(f"lang:{language}"))
         logger.info(f"Client {sid} changed language to {language}")
-        await broadcast_monitor_update()
+        await broadcast_monitor_update(tour)
 
-async def broadcast_monitor_update():
-    """Send real-time updates to all monitor clients"""
-    stats = get_connection_stats()
-    await sio_server.emit('monitor_update', stats, room='monitors')
+async def broadcast_monitor_update(tour):
+    """Schedule a coalesced update to the tour's monitor clients (at most one per MONITOR_UPDATE_INTERVAL)"""
+    if tour.monitor_flush_task is None:
+        tour.monitor_flush_task = asyncio.create_task(flush_monitor_update(tour))
 
-def get_connection_stats():
-    """Get current connection statistics"""
-    tourists = {sid: info for sid, info in connected_users.items() if info['role'] == 'tourist'}
-    guides = {sid: info for sid, info in connected_users.items() if info['role'] == 'guide'}
-    
-    # Count by language
-    lang_counts = {}
-    for sid, info in tourists.items():
-        lang = info.get('language', 'en')
-        lang_counts[lang] = lang_counts.get(lang, 0) + 1
-    
+async def flush_monitor_update(tour):
+    await asyncio.sleep(MONITOR_UPDATE_INTERVAL)
+    tour.monitor_flush_task = None
+    diff = get_monitor_diff(tour)  # advances the baseline even when no monitor is there to receive it
+    if tour.role_counts['monitor'] <= 0:
+        return
+    await sio_server.emit('monitor_update', diff, room=tour.room('monitors'), ignore_queue=True)
+
+def tourist_entry(sid, info):
+    return {'sid': sid[:8], 'language': info['language'], 'connected_at': info['connected_at']}
+
+def get_monitor_summary(tour):
+    """Counters only - O(languages), no scan of connected users"""
     return {
-        'guide_online': len(guides) > 0,
-        'guide_broadcasting': guide_info.get('broadcasting', False),
-        'guide_started_at': guide_info.get('started_at'),
-        'total_tourists': len(tourists),
-        'tourists_by_language': lang_counts,
-        'tourist_list': [{'sid': sid[:8], 'language': info['language'], 'connected_at': info['connected_at']} for sid, info in tourists.items()],
+        'tour': tour.id,
+        'guide_online': tour.role_counts['guide'] > 0,
+        'guide_broadcasting': tour.guide_info.get('broadcasting', False),
+        'guide_started_at': tour.guide_info.get('started_at'),
+        'total_tourists': tour.role_counts['tourist'],
+        'tourists_by_language': {lang: count for lang, count in tour.lang_counts.items() if count > 0},
         'timestamp': datetime.now().isoformat()
     }
 
+def get_monitor_diff(tour):
+    """Counters + tourists joined/left/changed since the last push"""
+    joined, left, changed = [], [], []
+    for sid in tour.monitor_pending:
+        info = tour.users.get(sid)
+        is_tourist = info is not None and info['role'] == 'tourist'
+        was_listed = sid in tour.monitor_reported
+        if is_tourist and not was_listed:
+            joined.append(tourist_entry(sid, info))
+            tour.monitor_reported.add(sid)
+        elif was_listed and not is_tourist:
+            left.append(sid[:8])
+            tour.monitor_reported.discard(sid)
+        elif is_tourist:
+            changed.append(tourist_entry(sid, info))
+    tour.monitor_pending.clear()
+    return dict(get_monitor_summary(tour), type='diff', joined=joined, left=left, changed=changed)
+
+def get_connection_stats(tour):
+    """Full snapshot of a tour (monitor join and /api/monitor)"""
+    return dict(
+        get_monitor_summary(tour),
+        type='snapshot',
+        tourist_list=[tourist_entry(sid, info) for sid, info in tour.users.items() if info['role'] == 'tourist']
+    )
+
+# --- WebRTC Peer Connection Lifecycle ---
+# Every RTCPeerConnection is tracked per sid, closed (and unsubscribed from the MediaRelay) on
+# disconnect or renegotiation, and reaped when it stalls. Tourist PCs are capped by a budget;
+# tourists beyond it stay on the WebSocket audio path instead of degrading everyone.
+MAX_PEER_CONNECTIONS = int(os.environ.get("MAX_PEER_CONNECTIONS", "40"))  # tourist PCs
+PC_CONNECT_TIMEOUT = float(os.environ.get("PC_CONNECT_TIMEOUT", "30"))  # ICE must connect within this
+PC_IDLE_TIMEOUT = float(os.environ.get("PC_IDLE_TIMEOUT", "120"))  # tourist PC without guide audio
+PC_REAP_INTERVAL = float(os.environ.get("PC_REAP_INTERVAL", "15"))
+
+class PeerRegistry:
+    """RTCPeerConnections by sid"""
+
+    def __init__(self):
+        self.peers = {}  # {sid: {'pc', 'role', 'tour', 'created', 'state_changed'}}
+        self.closed = 0
+        self.rejected = 0
+
+    def tourist_count(self):
+        return sum(1 for entry in self.peers.values() if entry['role'] == 'tourist')
+
+    def has_capacity(self):
+        return self.tourist_count() < MAX_PEER_CONNECTIONS
+
+    def register(self, sid, pc, role, tour_id):
+        now = time.monotonic()
+        self.peers[sid] = {'pc': pc, 'role': role, 'tour': tour_id, 'created': now, 'state_changed': now}
+
+    def touch(self, sid, pc):
+        entry = self.peers.get(sid)
+        if entry and entry['pc'] is pc:
+            entry['state_changed'] = time.monotonic()
+
+    async def close(self, sid, reason, pc=None):
+        """Close the sid's PC (only if it is still pc, when given)"""
+        entry = self.peers.get(sid)
+        if entry is None or (pc is not None and entry['pc'] is not pc):
+            if pc is not None and pc.connectionState != "closed":
+                await close_peer_connection(pc)
+            return
+        del self.peers[sid]
+        self.closed += 1
+        tour = tours.get(entry['tour'])
+        if tour is not None and tour.guide_pc is entry['pc']:
+            tour.guide_pc = None
+            tour.guide_track = None
+            tour.audio_forwarder.detach()
+            tour.recording.detach_guide_track()
+        logger.info(f"Closing {entry['role']} peer connection of {sid} ({reason})")
+        await close_peer_connection(entry['pc'])
+
+    async def reap(self):
+        now = time.monotonic()
+        for sid, entry in list(self.peers.items()):
+            pc = entry['pc']
+            age = now - entry['created']
+            in_state = now - entry['state_changed']
+            reason = None
+            if sid not in connected_users:
+                reason = "orphaned"
+            elif pc.connectionState in ("failed", "closed"):
+                reason = pc.connectionState
+            elif pc.iceConnectionState in ("new", "checking") and age > PC_CONNECT_TIMEOUT:
+                reason = "stalled"
+            elif pc.iceConnectionState == "disconnected" and in_state > PC_CONNECT_TIMEOUT:
+                reason = "disconnected"
+            elif entry['role'] == 'tourist' and age > PC_IDLE_TIMEOUT and not any(s.track for s in pc.getSenders()):
+                reason = "idle"
+            if reason:
+                await self.close(sid, reason)
+                if sid in connected_users:
+                    # Otherwise the client keeps showing a dead stream and never falls back
+                    await sio_server.emit('webrtc_closed', {'reason': reason, 'fallback': 'websocket'}, room=sid)
+
+    def stats(self):
+        states = Counter(entry['pc'].iceConnectionState for entry in self.peers.values())
+        return {
+            'total': len(self.peers),
+            'tourists': self.tourist_count(),
+            'budget': MAX_PEER_CONNECTIONS,
+            'ice_states': dict(states),
+            'closed': self.closed,
+            'rejected': self.rejected,
+        }
+
+async def close_peer_connection(pc):
+    # Stopping relayed sender tracks unsubscribes them from the tour's MediaRelay
+    for sender in pc.getSenders():
+        if sender.track is not None:
+            sender.track.stop()
+    try:
+        await pc.close()
+    except Exception as e:
+        logger.error(f"Error closing peer connection: {e}")
+
+peer_registry = PeerRegistry()
+
+metrics.gauge('webrtc_peer_connections', "Open RTCPeerConnections by role",
+              lambda: [({'role': role}, count) for role, count in Counter(e['role'] for e in peer_registry.peers.values()).items()])
+metrics.gauge('webrtc_ice_connection_states', "Open RTCPeerConnections by ICE connection state",
+              lambda: [({'state': state}, count) for state, count in peer_registry.stats()['ice_states'].items()])
+metrics.gauge('webrtc_peer_connections_closed_total', "RTCPeerConnections closed", lambda: peer_registry.closed, type='counter')
+metrics.gauge('webrtc_peer_connections_rejected_total', "Tourist PCs refused by the peer budget",
+              lambda: peer_registry.rejected, type='counter')
+
+async def reap_peer_connections():
+    while True:
+        await asyncio.sleep(PC_REAP_INTERVAL)
+        try:
+            await peer_registry.reap()
+        except Exception as e:
+            logger.error(f"Peer reaper error: {e}")
+
+async def start_peer_reaper():
+    app.state.peer_reaper = asyncio.create_task(reap_peer_connections())
+
 @sio_server.event
 async def offer(sid, data):
-    global guide_track, guide_pc
-    
     sdp = data['sdp']
     type_ = data['type']
     role = data.get('role', 'tourist')
+    tour = tour_for_sid(sid)
+    
+    # Renegotiation: drop this sid's previous PC (and its relay subscription) first
+    await peer_registry.close(sid, "renegotiated")
+
+    if not WEBRTC_ENABLED:
+        await sio_server.emit('webrtc_unavailable', {'reason': 'disabled', 'fallback': 'websocket'}, room=sid)
+        return
+
+    if role == 'tourist' and not peer_registry.has_capacity():
+        peer_registry.rejected += 1
+        logger.warning(f"WebRTC budget of {MAX_PEER_CONNECTIONS} reached - {sid} stays on WebSocket audio")
+        await sio_server.emit('webrtc_unavailable', {'reason': 'capacity', 'fallback': 'websocket'}, room=sid)
+        return
+
+    if role == 'guide' and tour.guide_pc is not None:
+        # A new guide PC replaces the old one
+        old_sid = next((s for s, e in peer_registry.peers.items() if e['pc'] is tour.guide_pc), None)
+        if old_sid is not None:
+            await peer_registry.close(old_sid, "replaced by new guide connection")
+        else:
+            await close_peer_connection(tour.guide_pc)
+        tour.guide_pc = None
     
-    pc = RTCPeerConnection()
-    pcs.add(pc)
+    pc = aiortc.RTCPeerConnection()
+    peer_registry.register(sid, pc, role, tour.id)
     
     @pc.on("iceconnectionstatechange")
     async def on_iceconnectionstatechange():
         logger.info(f"ICE connection state is {pc.iceConnectionState}")
+        peer_registry.touch(sid, pc)
         if pc.iceConnectionState == "failed" or pc.iceConnectionState == "closed":
-            pcs.discard(pc)
-            await pc.close()
+            await peer_registry.close(sid, f"ICE {pc.iceConnectionState}", pc=pc)
 
     if role == 'guide':
-        guide_pc = pc
-        rec_filename = f"recordings/guide_{uuid.uuid4().hex[:8]}.wav"
-        recorder = MediaRecorder(rec_filename)
+        tour.guide_pc = pc
         @pc.on("track")
         async def on_track(track):
-            global guide_track
-            logger.info(f"Guide track received: kind={track.kind}, id={track.id}")
+            logger.info(f"Guide track received for tour '{tour.id}': kind={track.kind}, id={track.id}")
             if track.kind == "audio":
-                guide_track = track
+                tour.guide_track = track
+                tour.audio_forwarder.attach(track, tour.relay)
                 
-                # Start Recording
-                os.makedirs("recordings", exist_ok=True)
-                recorder.addTrack(track)
-                await recorder.start()
-                logger.info(f"Recording started: {rec_filename}")
+                # Start Recording (segmented OGG/Opus, written off the event loop)
+                tour.recording.attach_guide_track(track, tour.relay)
+                logger.info(f"Recording started for tour '{tour.id}'")
                 
-                # Notify all tourists that guide is ready
-                logger.info("Broadcasting guide_ready event to tourists")
-                await sio_server.emit('guide_ready', room='tourists')
+                # Notify the tour's tourists that guide is ready
+                logger.info(f"Broadcasting guide_ready event to tour '{tour.id}'")
+                await emit_to_tourists('guide_ready', None, tour.room('tourists'))
             
             @track.on("ended")
             async def on_ended():
                 logger.info(f"Track {track.id} ended")
-                await recorder.stop()
-                logger.info(f"Recording stopped: {rec_filename}")
                 
-        await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=type_))
+        await pc.setRemoteDescription(aiortc.RTCSessionDescription(sdp=sdp, type=type_))
         answer = await pc.createAnswer()
         await pc.setLocalDescription(answer)
         
         await sio_server.emit('answer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}, room=sid)
 
     elif role == 'tourist':
-        # If there is a guide track, add it
-        if guide_track:
-            logger.info(f"Adding guide track to tourist {sid}")
-            relayed_track = relay.subscribe(guide_track)
-            pc.addTrack(relayed_track)
+        # If there is a guide track in this tour, add it
+        if tour.guide_track or cluster.guide_elsewhere(tour):
+            logger.info(f"Adding guide track of tour '{tour.id}' to tourist {sid}")
+            add_guide_audio(tour, pc, sdp)
         else:
-            logger.warning("No guide track available yet")
+            logger.warning(f"No guide track available yet in tour '{tour.id}'")
             # If no guide track, we still complete the handshake, but no audio flows.
             # The client must re-negotiate (send new offer) when 'guide_ready' is received.
 
@@ -206,74 +2163,144 @@ async def offer(sid, data):
         # Usually easier if Client Initiates.
         # So: Tourist sends Offer -> Server adds Track -> Server Sends Answer.
         
-        await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=type_))
+        await pc.setRemoteDescription(aiortc.RTCSessionDescription(sdp=sdp, type=type_))
         answer = await pc.createAnswer()
         await pc.setLocalDescription(answer)
         
         await sio_server.emit('answer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}, room=sid)
 
-# Stat counter and audio init segment cache
-audio_chunks_count = 0
-audio_init_segment = None
-audio_session_active = False
-
 @sio_server.event
 async def binary_audio(sid, data):
-    global audio_chunks_count, audio_init_segment, audio_session_active
+    await ingest_guide_audio(tour_for_sid(sid), data)
+
+async def ingest_guide_audio(tour, data):
+    """One MediaRecorder chunk from the guide (socket.io binary_audio or the raw /ws/audio socket)"""
+    relay_audio_chunk(tour, data)
+    is_init = tour.audio_chunks_count == 1
+    tour.recording.ws_chunk(data, is_init)
+    await cluster.share_audio(tour, data, is_init)
+
+def relay_audio_chunk(tour, data):
+    """Fan one WS audio chunk out to this worker's tourists (from the guide or another worker)"""
+    if tour.audio_chunks_count and data[:4] == WEBM_EBML_ID:
+        # A new recorder session: drop the previous one's state here, in order with the chunks
+        # (reset_audio_session travels over socket.io, the chunks may come over /ws/audio)
+        tour.reset_audio()
+    tour.audio_chunks_count += 1
     
-    audio_chunks_count += 1
+    if tour.audio_chunks_count == 1:
+        tour.audio_init_segment = data
+        tour.audio_session_active = True
+        logger.info(f"Cached audio initialization segment for tour '{tour.id}'")
     
-    if audio_chunks_count == 1:
-        audio_init_segment = data
-        audio_session_active = True
-        logger.info("Cached audio initialization segment")
+    if tour.audio_chunks_count % 50 == 0:
+        logger.info(f"Relayed {tour.audio_chunks_count} audio chunks via WS (tour '{tour.id}')")
     
-    if audio_chunks_count % 50 == 0:
-        logger.info(f"Relayed {audio_chunks_count} audio chunks via WS")
-        
-    await sio_server.emit('audio_chunk', data, room='tourists')
+    metrics.inc('audio_relay_chunks_total', tour=tour.id)
+    metrics.inc('audio_relay_bytes_total', len(data), tour=tour.id)
+    audio_relay_meter.add(len(data))
+    tour.audio_fanout.publish(data, init=tour.audio_chunks_count == 1)
+
+def audio_socket_user(sid):
+    """(tour, role) of a socket.io sid connected to this worker or, in multi-worker mode, another one"""
+    user = connected_users.get(sid)
+    if user is not None:
+        return get_tour(user['tour']), user['role']
+    entry = cluster.remote_users.get(sid)
+    tour = tours.get(entry[0]) if entry else None
+    if tour is not None and sid in tour.users:
+        return tour, tour.users[sid]['role']
+    return None, None
+
+@app.websocket("/ws/audio")
+async def audio_socket(websocket: WebSocket, sid: str = ""):
+    """Raw audio path for a joined socket.io client: guides send chunks, tourists receive frames"""
+    tour, role = audio_socket_user(sid)
+    if role not in ('guide', 'tourist'):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscriber = None
+    if role == 'tourist':
+        subscriber = tour.audio_fanout.attach_raw(sid, websocket)
+        if tour.audio_init_segment:
+            tour.audio_fanout.catch_up(sid, tour.audio_init_segment)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if role == 'guide' and message.get('bytes'):
+                await ingest_guide_audio(tour, message['bytes'])
+    finally:
+        if subscriber is not None:
+            tour.audio_fanout.detach_raw(sid, subscriber)
+
+@sio_server.event
+async def audio_transport(sid, data):
+    """A tourist opened ('raw') or lost ('socketio') its /ws/audio socket - stop or resume audio_chunk events"""
+    user = connected_users.get(sid)
+    if not user or user['role'] != 'tourist':
+        return
+    fanout = tour_for_sid(sid).audio_fanout
+    if (data or {}).get('mode') == 'raw':
+        subscriber = fanout.subscribers.get(sid)
+        if subscriber is not None and not subscriber.raw:
+            fanout.unsubscribe(sid)
+    else:
+        fanout.subscribe(sid)
 
 @sio_server.event
 async def reset_audio_session(sid):
-    global audio_chunks_count, audio_init_segment, audio_session_active, guide_info
-    audio_chunks_count = 0
-    audio_init_segment = None
-    audio_session_active = False
-    guide_info['broadcasting'] = True
-    logger.info("Audio session reset - Guide started broadcasting")
-    await broadcast_monitor_update()
+    """Guide is starting a new recorder; its audio state is reset by the recorder's first chunk
+    (see relay_audio_chunk), so chunks that overtake this event are not thrown away"""
+    tour = tour_for_sid(sid)
+    tour.guide_info['broadcasting'] = True
+    logger.info(f"Guide started a new audio session (tour '{tour.id}')")
+    await publish_guide_status(tour)
+    await broadcast_monitor_update(tour)
 
 @sio_server.event
 async def stop_broadcast(sid):
-    global guide_info, guide_track
-    guide_info['broadcasting'] = False
-    guide_track = None
-    logger.info("Guide stopped broadcasting")
-    await sio_server.emit('guide_status', {'online': True, 'broadcasting': False}, room='tourists')
-    await broadcast_monitor_update()
+    tour = tour_for_sid(sid)
+    tour.guide_info['broadcasting'] = False
+    tour.guide_track = None
+    tour.recording.close_ws()
+    logger.info(f"Guide stopped broadcasting (tour '{tour.id}')")
+    await publish_guide_status(tour)
+    await broadcast_monitor_update(tour)
 
 @sio_server.event
 async def start_broadcast(sid):
-    global guide_info
-    guide_info['broadcasting'] = True
-    guide_info['started_at'] = datetime.now().isoformat()
-    logger.info("Guide started broadcasting")
-    await sio_server.emit('guide_status', {'online': True, 'broadcasting': True}, room='tourists')
-    await broadcast_monitor_update()
+    tour = tour_for_sid(sid)
+    tour.guide_info['broadcasting'] = True
+    tour.guide_info['started_at'] = datetime.now().isoformat()
+    logger.info(f"Guide started broadcasting (tour '{tour.id}')")
+    await publish_guide_status(tour)
+    await broadcast_monitor_update(tour)
 
 @sio_server.event
 async def request_audio_init(sid):
-    global audio_init_segment
-    if audio_init_segment:
-        logger.info(f"Sending init segment to {sid}")
-        await sio_server.emit('audio_init', audio_init_segment, room=sid)
+    tour = tour_for_sid(sid)
+    if tour.audio_init_segment:
+        count = tour.audio_fanout.catch_up(sid, tour.audio_init_segment)
+        if count:
+            logger.info(f"Sending init segment + {count - 1} catch-up chunks to {sid}")
+
+@sio_server.event
+async def resume_audio(sid):
+    """A demoted tourist asks to be put back on the WS audio path"""
+    user = connected_users.get(sid)
+    if user and user['role'] == 'tourist':
+        tour = tour_for_sid(sid)
+        tour.audio_fanout.subscribe(sid)
+        logger.info(f"Resumed WS audio for {sid} (tour '{tour.id}')")
 
 @sio_server.event
 async def request_guide_status(sid):
-    is_guide_online = (guide_info['sid'] is not None)
-    is_broadcasting = guide_info.get('broadcasting', False)
-    logger.info(f"Manual status request from {sid}: online={is_guide_online}, broadcasting={is_broadcasting}")
-    await sio_server.emit('guide_status', {'online': is_guide_online, 'broadcasting': is_broadcasting}, room=sid)
+    status = tour_for_sid(sid).guide_status()
+    logger.info(f"Manual status request from {sid}: online={status['online']}, broadcasting={status['broadcasting']}")
+    await sio_server.emit('guide_status', status, room=sid)
 
 @sio_server.event
 async def request_reconnect(sid):
@@ -282,21 +2309,171 @@ async def request_reconnect(sid):
     # For now, we just acknowledge.
     await sio_server.emit('reconnect_ack', room=sid)
 
-from deep_translator import GoogleTranslator
-
 # --- Information Registration System (New) ---
 import sqlite3
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
-    logger.warning("Pandas not found. Excel/CSV features will be disabled.")
 
 from fastapi import UploadFile, File, Form
 from pydantic import BaseModel
 import io
 import concurrent.futures
-import functools
+import csv
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+# --- Server-Side Translation ---
+# Each final transcript is translated once per language in use and pushed to per-language rooms,
+# instead of every tourist phone calling the translator for the same sentence.
+TRANSLATOR_BACKEND = os.environ.get("TRANSLATOR_BACKEND", "google")  # 'google' or 'stub' (offline testing)
+TRANSLATION_WORKERS = int(os.environ.get("TRANSLATION_WORKERS", "4"))
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", "2048"))
+TRANSLATION_TIMEOUT = float(os.environ.get("TRANSLATION_TIMEOUT", "8"))
+# Backend calls submitted but not finished. A call that times out keeps its worker until the backend
+# returns, so a hung backend would otherwise pile every later translation up behind it.
+TRANSLATION_BACKLOG_MAX = int(os.environ.get("TRANSLATION_BACKLOG_MAX", str(TRANSLATION_WORKERS * 4)))
+
+# Client language codes that mean "show the original text"
+UNTRANSLATED_LANGS = {'original'}
+
+class GoogleTranslatorBackend:
+    """Online translation through deep_translator (blocking, runs on the worker pool)"""
+    name = "google"
+
+    def translate(self, text, src, dst):
+        from deep_translator import GoogleTranslator  # loaded with the first translation, not at startup
+        return GoogleTranslator(source=src or 'auto', target=dst).translate(text)
+
+class StubTranslatorBackend:
+    """Offline translator for tests and venues without internet: tags the text with the target language"""
+    name = "stub"
+
+    def translate(self, text, src, dst):
+        return f"[{dst}] {text}"
+
+TRANSLATOR_BACKENDS = {
+    'google': GoogleTranslatorBackend,
+    'stub': StubTranslatorBackend,
+}
+
+class TranslationEngine:
+    """Bounded worker pool + LRU cache keyed by (text, src, dst)"""
+
+    def __init__(self, backend, workers=TRANSLATION_WORKERS, cache_size=TRANSLATION_CACHE_SIZE):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+        self.inflight = {}  # {(text, src, dst): asyncio.Future} - coalesces identical concurrent requests
+        self.backlog = 0  # backend calls not finished yet (including timed-out ones still running)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def _cache_get(self, key):
+        with self.lock:
+            value = self.cache.get(key)
+            if value is not None:
+                self.cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, key, value):
+        with self.lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    async def translate(self, text, src, dst):
+        """Translate text, returning None on failure so clients can fall back to their own translation"""
+        if dst in UNTRANSLATED_LANGS or dst == src:
+            return None
+        key = (text, src, dst)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        if key in self.inflight:
+            return await asyncio.shield(self.inflight[key])
+        if self.backlog >= TRANSLATION_BACKLOG_MAX:
+            self.skipped += 1
+            return None
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.inflight[key] = future
+        result = None
+        started = time.perf_counter()
+        try:
+            with self.lock:
+                self.backlog += 1
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, self._call_backend, text, src, dst),
+                timeout=TRANSLATION_TIMEOUT
+            )
+            if result:
+                self._cache_put(key, result)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Translation error ({src}->{dst}): {e}")
+        finally:
+            metrics.observe('translation_seconds', time.perf_counter() - started,
+                            backend=self.backend.name, outcome='ok' if result else 'error')
+            self.inflight.pop(key, None)
+            future.set_result(result)
+        return result
+
+    def _call_backend(self, text, src, dst):
+        try:
+            return self.backend.translate(text, src, dst)
+        finally:
+            with self.lock:
+                self.backlog -= 1
+
+    @staticmethod
+    def target_languages(langs, src):
+        """The languages in langs that need a translation from src"""
+        return sorted(lang for lang in langs if lang not in UNTRANSLATED_LANGS and lang != src)
+
+    async def translate_many(self, text, src, langs):
+        """Translate text into every language in langs concurrently -> {lang: translation}"""
+        langs = self.target_languages(langs, src)
+        results = await asyncio.gather(*(self.translate(text, src, lang) for lang in langs))
+        return {lang: result for lang, result in zip(langs, results) if result}
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'cache_entries': len(self.cache),
+            'cache_size': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'inflight': len(self.inflight),
+            'backlog': self.backlog,
+            'backlog_max': TRANSLATION_BACKLOG_MAX,
+            'skipped': self.skipped,
+        }
+
+def create_translation_engine(backend_name=TRANSLATOR_BACKEND):
+    backend_cls = TRANSLATOR_BACKENDS.get(backend_name)
+    if backend_cls is None:
+        logger.warning(f"Unknown translator backend '{backend_name}', falling back to 'stub'")
+        backend_cls = StubTranslatorBackend
+    return TranslationEngine(backend_cls())
+
+translation_engine = create_translation_engine()
+
+metrics.histogram('translation_seconds', "Translator backend latency per (text, target language) cache miss")
+metrics.gauge('translation_cache_hits_total', "Translations served from the cache", lambda: translation_engine.hits, type='counter')
+metrics.gauge('translation_cache_misses_total', "Translations sent to the backend", lambda: translation_engine.misses, type='counter')
+metrics.gauge('translation_inflight', "Translations waiting on the backend", lambda: len(translation_engine.inflight))
+
+def tour_languages(tour):
+    """Languages currently selected by the tour's tourists"""
+    return {lang for lang, count in tour.lang_counts.items() if count > 0}
 
 # Transcript/Translation Handler
 @sio_server.event
@@ -306,6 +2483,7 @@ async def transcript_msg(sid, data):
     text = data.get('text', '')
     is_final = data.get('isFinal', True) 
     source_lang = data.get('source_lang', 'ko')
+    tour = tour_for_sid(sid)
 
     # Validate and clean text
     if text:
@@ -314,36 +2492,13 @@ async def transcript_msg(sid, data):
     if not text:
         return
 
-    # Create simplified response structure
-    # Server NO LONGER translates. It just broadcasts the original.
-    response = {
-        'original': text,
-        'source_lang': source_lang,
-        'translations': {}, # Clients will fill this themselves found
-        'isFinal': is_final
-    }
-
-    # Save to DB/File (Original Only)
-    if is_final:
-        try:
-            with open("guide_transcript.txt", "a", encoding="utf-8") as f:
-                f.write(f"{text}\n")
-            
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            # We save empty translations JSON for compatibility
-            c.execute("INSERT INTO transcripts (text, translations) VALUES (?, ?)", (text, "{}"))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"File/DB save error: {e}")
+    if not is_final:
+        # Interim hypotheses: coalesced and sent as deltas of the original only
+        tour.interim.submit(text, source_lang)
+        return
 
-    # Broadcast to all
-    await sio_server.emit('transcript', response, room='tourists')
-    await sio_server.emit('transcript', response, room='guides')
-    
-    if is_final:
-        logger.info(f"[TRANSCRIPT] Broadcasted: '{text[:20]}...' (No server-side translation)")
+    # Finals: saved and sent in arrival order, translations follow (see FinalTranscripts)
+    tour.finals.submit(text, source_lang)
 
 
 # (Imports merged with top section)
@@ -353,8 +2508,23 @@ async def transcript_msg(sid, data):
 DB_PATH = "places.db"
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    """Create or upgrade the schema. Every worker runs this at startup, so it all happens in one
+    BEGIN IMMEDIATE transaction: the column and legacy-session checks in create_schema are made
+    while holding the write lock, and a worker that waited sees the upgrade the first one made."""
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            create_schema(conn.cursor())
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def create_schema(c):
     c.execute('''
         CREATE TABLE IF NOT EXISTS places (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -368,18 +2538,610 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             text TEXT NOT NULL,
             translations TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            tour_id TEXT,
+            session_id INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
+    # Databases created before search/sessions were added lack these columns
+    columns = {r[1] for r in c.execute("PRAGMA table_info(transcripts)")}
+    if 'tour_id' not in columns:
+        c.execute("ALTER TABLE transcripts ADD COLUMN tour_id TEXT")
+    if 'session_id' not in columns:
+        c.execute("ALTER TABLE transcripts ADD COLUMN session_id INTEGER")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_created ON transcripts (created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_session ON transcripts (session_id, id)")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tour_id TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            ended_at TIMESTAMP,
+            transcript_count INTEGER NOT NULL DEFAULT 0,
+            summary TEXT,
+            summary_transcript_id INTEGER NOT NULL DEFAULT 0,
+            summary_count INTEGER NOT NULL DEFAULT 0,
+            archive_file TEXT,
+            archived_at TIMESTAMP
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_tour ON sessions (tour_id, id)")
+    # Transcripts saved before sessions existed become one closed session per tour
+    legacy = c.execute(
+        "SELECT COALESCE(tour_id, ?), MIN(created_at), MAX(created_at), COUNT(*) FROM transcripts "
+        "WHERE session_id IS NULL GROUP BY 1", (DEFAULT_TOUR_ID,)
+    ).fetchall()
+    for tour_id, started_at, ended_at, count in legacy:
+        session_id = c.execute("INSERT INTO sessions (tour_id, started_at, ended_at, transcript_count) VALUES (?, ?, ?, ?)",
+                               (tour_id, started_at, ended_at, count)).lastrowid
+        c.execute("UPDATE transcripts SET session_id = ? WHERE session_id IS NULL AND COALESCE(tour_id, ?) = ?",
+                  (session_id, DEFAULT_TOUR_ID, tour_id))
+        logger.info(f"Moved {count} earlier transcripts of tour '{tour_id}' into session {session_id}")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS recordings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL UNIQUE,
+            tour_id TEXT,
+            source TEXT,
+            format TEXT,
+            started_at TIMESTAMP,
+            ended_at TIMESTAMP,
+            duration_seconds REAL,
+            size_bytes INTEGER,
+            transcript_from INTEGER,
+            transcript_to INTEGER,
+            status TEXT NOT NULL DEFAULT 'complete'
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_recordings_tour ON recordings (tour_id, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_recordings_started ON recordings (started_at)")
+
+async def create_tables():
+    await asyncio.get_running_loop().run_in_executor(None, init_db)
+
+# --- Full-Text Search ---
+# FTS5 indexes over transcripts (original text + every translation) and places, kept in sync by
+# triggers so every writer (write-behind batches, imports, clear_session) is covered. Words match
+# as prefixes, so "경복궁" also finds "경복궁을"; time bounds become rowid ranges, which FTS5 applies
+# inside the index instead of filtering every match.
+SEARCH_PAGE_MAX = 100
+SEARCH_TERMS_MAX = 16
+SEARCH_SNIPPET_TOKENS = 16
+SEARCH_TYPES = ('all', 'transcript', 'place')
+
+# Translations are indexed as their values only, not the JSON keys and punctuation
+TRANSLATION_VALUES_SQL = ("CASE WHEN json_valid({0}) "
+                          "THEN (SELECT group_concat(value, char(10)) FROM json_each({0})) END")
+
+# Idempotent as a whole: leftovers of an interrupted build are completed and re-indexed from scratch
+SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+        text, translations, tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+    f'''CREATE TRIGGER IF NOT EXISTS transcripts_fts_insert AFTER INSERT ON transcripts BEGIN
+        INSERT INTO transcripts_fts (rowid, text, translations)
+        VALUES (new.id, new.text, {TRANSLATION_VALUES_SQL.format('new.translations')});
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS transcripts_fts_delete AFTER DELETE ON transcripts BEGIN
+        DELETE FROM transcripts_fts WHERE rowid = old.id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS transcripts_fts_update AFTER UPDATE OF text, translations ON transcripts BEGIN
+        UPDATE transcripts_fts SET text = new.text, translations = {TRANSLATION_VALUES_SQL.format('new.translations')}
+        WHERE rowid = new.id;
+    END''',
+    "DELETE FROM transcripts_fts",
+    f'''INSERT INTO transcripts_fts (rowid, text, translations)
+        SELECT id, text, {TRANSLATION_VALUES_SQL.format('translations')} FROM transcripts''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+        name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+    '''CREATE TRIGGER IF NOT EXISTS places_fts_insert AFTER INSERT ON places BEGIN
+        INSERT INTO places_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS places_fts_delete AFTER DELETE ON places BEGIN
+        DELETE FROM places_fts WHERE rowid = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS places_fts_update AFTER UPDATE OF name, description ON places BEGIN
+        UPDATE places_fts SET name = new.name, description = new.description WHERE rowid = new.id;
+    END''',
+    "DELETE FROM places_fts",
+    "INSERT INTO places_fts (rowid, name, description) SELECT id, name, description FROM places",
+    # Transcripts of archived sessions (moved out of the transcripts table) stay searchable here.
+    # Filled by archive_session, never rebuilt from transcripts; the JSON translations are kept unindexed.
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS archived_transcripts_fts USING fts5(
+        text, translations, translations_json UNINDEXED, created_at UNINDEXED, tour_id UNINDEXED,
+        session_id UNINDEXED, tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+]
+
+search_enabled = False
+
+def search_index_built(conn):
+    # archived_transcripts_fts is created last, so it only exists once the whole schema does
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'archived_transcripts_fts'").fetchone() is not None
+
+def index_archived_sessions(conn):
+    """Sessions archived before archived_transcripts_fts existed: index them from their files"""
+    sessions = conn.execute("SELECT id, tour_id, archive_file FROM sessions WHERE archive_file IS NOT NULL").fetchall()
+    for session_id, tour_id, filename in sessions:
+        try:
+            conn.executemany(
+                "INSERT INTO archived_transcripts_fts (rowid, text, translations, translations_json, created_at, "
+                "tour_id, session_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((r[0], r[1], "\n".join(parse_translations(r[2]).values()), r[2], r[3], tour_id, session_id)
+                 for r in read_archive(filename))
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Archived session {session_id} not indexed for search: {e}")
+
+def init_search_index():
+    """Create the FTS tables and triggers once, indexing rows stored before search existed.
+    Every worker runs this at startup: the build happens under a write lock and is re-checked once
+    the lock is held, so only one of them builds and the others see the finished index."""
+    global search_enabled
+    # Autocommit mode: the sqlite3 module would not open a transaction around CREATE statements,
+    # so BEGIN/COMMIT are issued explicitly to make the build all-or-nothing
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    try:
+        if not search_index_built(conn):
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                built = not search_index_built(conn)  # another worker may have built it while we waited
+                if built:
+                    for statement in SEARCH_SCHEMA:
+                        conn.execute(statement)
+                    index_archived_sessions(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            if built:
+                logger.info(f"Search index built in {time.perf_counter() - started:.2f}s")
+        search_enabled = True
+    except sqlite3.OperationalError as e:
+        if 'fts5' in str(e).lower():
+            logger.warning(f"Full-text search disabled (SQLite without FTS5): {e}")
+        else:
+            logger.error(f"Full-text search disabled: could not build the search index: {e}")
+    finally:
+        conn.close()
+
+async def create_search_index():
+    await asyncio.get_running_loop().run_in_executor(None, init_search_index)
+
+def fts_query(text):
+    """User input -> FTS5 query: every word must match (as a prefix); operators are not exposed.
+    Single characters match whole tokens only - the prefix index starts at 2 characters and a
+    1-character prefix would scan most of the index."""
+    terms = re.findall(r"\w+", text)[:SEARCH_TERMS_MAX]
+    return " ".join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+
+def marked_snippet(raw):
+    """snippet() puts control characters around matches: escape the text, then turn them into <mark>"""
+    return html.escape(raw or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+def search_transcripts(conn, query, limit, since=None, until=None, tour=None, session=None):
+    where, params = ["transcripts_fts MATCH ?"], [query]
+    if since:
+        where.append("transcripts_fts.rowid >= (SELECT MIN(id) FROM transcripts WHERE created_at >= ?)")
+        params.append(since)
+    if until:
+        where.append("transcripts_fts.rowid <= (SELECT MAX(id) FROM transcripts WHERE created_at < ?)")
+        params.append(until)
+    if tour:
+        where.append("t.tour_id = ?")
+        params.append(tour)
+    if session is not None:
+        where.append("t.session_id = ?")
+        params.append(session)
+    rows = conn.execute(
+        "SELECT t.id, t.text, t.translations, t.created_at, t.tour_id, t.session_id, "
+        f"snippet(transcripts_fts, -1, char(2), char(3), '…', {SEARCH_SNIPPET_TOKENS}), "
+        "bm25(transcripts_fts, 1.0, 0.5) AS score "
+        "FROM transcripts_fts JOIN transcripts t ON t.id = transcripts_fts.rowid "
+        f"WHERE {' AND '.join(where)} ORDER BY score LIMIT ?",
+        params + [limit]
+    ).fetchall()
+    return [{"type": "transcript", "id": r[0], "text": r[1], "translations": parse_translations(r[2]),
+             "created_at": r[3], "tour_id": r[4], "session_id": r[5], "snippet": marked_snippet(r[6]),
+             "score": round(-r[7], 3), "archived": False}
+            for r in rows]
+
+def search_archived_transcripts(conn, query, limit, since=None, until=None, tour=None, session=None):
+    """Same as search_transcripts over sessions moved to SESSION_ARCHIVE_DIR; the filters apply to
+    the matches only, as the unindexed columns are not in the FTS index"""
+    where, params = ["archived_transcripts_fts MATCH ?"], [query]
+    if since:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("created_at < ?")
+        params.append(until)
+    if tour:
+        where.append("tour_id = ?")
+        params.append(tour)
+    if session is not None:
+        where.append("session_id = ?")
+        params.append(session)
+    rows = conn.execute(
+        "SELECT rowid, text, translations_json, created_at, tour_id, session_id, "
+        f"snippet(archived_transcripts_fts, -1, char(2), char(3), '…', {SEARCH_SNIPPET_TOKENS}), "
+        "bm25(archived_transcripts_fts, 1.0, 0.5) AS score "
+        f"FROM archived_transcripts_fts WHERE {' AND '.join(where)} ORDER BY score LIMIT ?",
+        params + [limit]
+    ).fetchall()
+    return [{"type": "transcript", "id": r[0], "text": r[1], "translations": parse_translations(r[2]),
+             "created_at": r[3], "tour_id": r[4], "session_id": r[5], "snippet": marked_snippet(r[6]),
+             "score": round(-r[7], 3), "archived": True}
+            for r in rows]
+
+def search_places(conn, query, limit, since=None, until=None):
+    where, params = ["places_fts MATCH ?"], [query]
+    if since:
+        where.append("p.created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("p.created_at < ?")
+        params.append(until)
+    rows = conn.execute(
+        "SELECT p.id, p.name, p.description, p.created_at, "
+        f"snippet(places_fts, -1, char(2), char(3), '…', {SEARCH_SNIPPET_TOKENS}), "
+        "bm25(places_fts, 2.0, 1.0) AS score "
+        "FROM places_fts JOIN places p ON p.id = places_fts.rowid "
+        f"WHERE {' AND '.join(where)} ORDER BY score LIMIT ?",
+        params + [limit]
+    ).fetchall()
+    return [{"type": "place", "id": r[0], "name": r[1], "description": r[2], "created_at": r[3],
+             "snippet": marked_snippet(r[4]), "score": round(-r[5], 3)}
+            for r in rows]
+
+def run_search(query, type, limit, offset, since, until, tour, session):
+    """Blocking search (default executor). Both indexes are ranked by bm25 and merged by score."""
+    started = time.perf_counter()
+    wanted = offset + limit + 1
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        results = []
+        if type in ('all', 'transcript'):
+            results += search_transcripts(conn, query, wanted, since, until, tour, session)
+            results += search_archived_transcripts(conn, query, wanted, since, until, tour, session)
+        if type in ('all', 'place') and not tour and session is None:  # places do not belong to a tour
+            results += search_places(conn, query, wanted, since, until)
+    finally:
+        conn.close()
+    results.sort(key=lambda r: r["score"], reverse=True)
+    elapsed = time.perf_counter() - started
+    metrics.observe('search_seconds', elapsed)
+    next_offset = offset + limit if len(results) > offset + limit else None
+    return {"results": results[offset:offset + limit], "next_offset": next_offset, "took_ms": round(elapsed * 1000, 2)}
+
+metrics.histogram('search_seconds', "Full-text search latency (both indexes, including snippets)")
+
+@app.get("/search")
+async def search(q: str, type: str = "all", limit: int = 20, offset: int = 0, since: Optional[str] = None,
+                 until: Optional[str] = None, tour: Optional[str] = None, session: Optional[int] = None):
+    """Ranked search over transcripts (original and translations) and places, filterable by type
+    ('all', 'transcript', 'place'), created_at range (UTC 'YYYY-MM-DD HH:MM:SS' prefixes), tour and
+    session, archived sessions included ("archived": true). Snippets are HTML-escaped with <mark> around
+    matches; page on with next_offset. The persistence writer is not flushed first, so a transcript
+    becomes searchable with its batch (within PERSIST_FLUSH_INTERVAL)."""
+    if not search_enabled:
+        return {"status": "error", "message": "Full-text search is not available (SQLite without FTS5)"}
+    if type not in SEARCH_TYPES:
+        return {"status": "error", "message": f"Unknown type '{type}'. Use all, transcript or place"}
+    query = fts_query(q)
+    if not query:
+        return {"query": q, "results": [], "next_offset": None, "took_ms": 0.0}
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    offset = max(0, offset)
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, run_search, query, type, limit, offset, since, until, tour, session)
+    return {"query": q, **result}
+
+# --- Write-Behind Persistence ---
+# Event handlers only enqueue (O(1)); a dedicated thread owns one long-lived WAL connection and
+# group-commits batches by size or time, so the event loop relaying audio never touches disk.
+PERSIST_BATCH_SIZE = int(os.environ.get("PERSIST_BATCH_SIZE", "64"))
+PERSIST_FLUSH_INTERVAL = float(os.environ.get("PERSIST_FLUSH_INTERVAL", "0.5"))
+PERSIST_BUSY_TIMEOUT = float(os.environ.get("PERSIST_BUSY_TIMEOUT", "5"))  # SQLite waits this long on a lock
+PERSIST_BATCH_ATTEMPTS = int(os.environ.get("PERSIST_BATCH_ATTEMPTS", "5"))  # per batch on "database is locked"
+PERSIST_RETRY_DELAY = 0.5  # first backoff after a lock error, doubled up to PERSIST_RETRY_MAX_DELAY
+PERSIST_RETRY_MAX_DELAY = 5.0
+TRANSCRIPT_FILE = "guide_transcript.txt"
+
+_WRITER_STOP = object()
+
+class PersistenceWriter:
+    """Background batched writer for transcript rows and the plain-text transcript file"""
+
+    def __init__(self, db_path, batch_size=PERSIST_BATCH_SIZE, flush_interval=PERSIST_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        # Metrics
+        self.max_depth = 0
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.retries = 0
+        self.restarts = 0
+        self.last_batch_size = 0
+        self.last_commit_ms = 0.0
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            if self.thread is not None and not self.stopping.is_set():
+                self.restarts += 1
+                logger.error(f"Persistence writer thread died, restarting it ({self.queue.qsize()} writes pending)")
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name="persistence-writer", daemon=True)
+            self.thread.start()
+            logger.info(f"Persistence writer started (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    def alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def ensure_running(self):
+        """Start the writer, or restart it if its thread died (but not after stop())"""
+        if not self.alive() and not self.stopping.is_set():
+            self.start()
+
+    def submit(self, sql, params, text_line=None):
+        """Queue one statement (and optionally a line for the transcript file). Safe to call from the event loop."""
+        self.ensure_running()
+        self.queue.put_nowait((sql, params, text_line))
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def flush(self, timeout=5.0):
+        """Wait until everything queued so far is committed (used before reads that must see it).
+        Returns False when that did not happen: the writer is stopped or did not get there in time."""
+        self.ensure_running()
+        if not self.alive():
+            pending = self.queue.qsize()
+            if pending:
+                logger.error(f"Persistence writer is stopped; {pending} writes will not be committed")
+            return pending == 0
+        done = threading.Event()
+        self.queue.put_nowait(done)
+        flushed = await asyncio.get_running_loop().run_in_executor(None, done.wait, timeout)
+        if not flushed:
+            logger.warning(f"Persistence flush timed out after {timeout}s ({self.queue.qsize()} writes pending)")
+        return flushed
+
+    def stop(self, timeout=10.0):
+        """Flush pending writes and stop the writer thread"""
+        with self.lock:
+            self.stopping.set()
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                return
+            self.queue.put_nowait(_WRITER_STOP)
+        thread.join(timeout)
+        logger.info(f"Persistence writer stopped ({self.written} rows written, {self.queue.qsize()} left in queue)")
+
+    def _connect(self):
+        """Open the writer's connection, retrying while another process holds the database locked.
+        Returns None if stop() is called meanwhile."""
+        delay = PERSIST_RETRY_DELAY
+        while True:
+            conn = None
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=PERSIST_BUSY_TIMEOUT)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                return conn
+            except sqlite3.Error as e:
+                if conn is not None:
+                    conn.close()
+                self.errors += 1
+                logger.warning(f"Persistence writer cannot open {self.db_path} ({e}), retrying in {delay:.1f}s")
+                if self.stopping.wait(delay):
+                    return None
+                delay = min(delay * 2, PERSIST_RETRY_MAX_DELAY)
+
+    def _run(self):
+        conn = self._connect()
+        if conn is None:
+            return
+        stopping = False
+        try:
+            while not stopping:
+                batch, waiters = [], []
+                item = self.queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _WRITER_STOP:
+                        stopping = True
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if stopping:
+                    # Drain whatever is left so shutdown never loses a transcript
+                    while True:
+                        try:
+                            item = self.queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if isinstance(item, threading.Event):
+                            waiters.append(item)
+                        elif item is not _WRITER_STOP:
+                            batch.append(item)
+                if batch:
+                    self._write_batch(conn, batch)
+                for waiter in waiters:
+                    waiter.set()
+        except Exception as e:
+            # Unexpected: the thread ends and the next submit()/flush() restarts it
+            self.errors += 1
+            logger.error(f"Persistence writer crashed: {e}")
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        started = time.perf_counter()
+        lines = [text_line for _, _, text_line in batch if text_line is not None]
+        if lines:
+            try:
+                with open(TRANSCRIPT_FILE, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{line}\n" for line in lines))
+            except OSError as e:
+                self.errors += 1
+                logger.error(f"Transcript file append error: {e}")
+
+        delay = PERSIST_RETRY_DELAY
+        for attempt in range(1, PERSIST_BATCH_ATTEMPTS + 1):
+            try:
+                # Consecutive rows of the same statement go through a single executemany
+                run_sql, run_params = None, []
+                for sql, params, _ in batch:
+                    if sql != run_sql and run_params:
+                        conn.executemany(run_sql, run_params)
+                        run_params = []
+                    run_sql = sql
+                    run_params.append(params)
+                if run_params:
+                    conn.executemany(run_sql, run_params)
+                conn.commit()
+                self.written += len(batch)
+                break
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                # Another connection held the lock past busy_timeout: back off and retry the batch
+                if attempt < PERSIST_BATCH_ATTEMPTS and ("locked" in str(e) or "busy" in str(e)):
+                    self.retries += 1
+                    logger.warning(f"Persistence batch of {len(batch)} rows: {e}, retry {attempt} in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, PERSIST_RETRY_MAX_DELAY)
+                    continue
+                self.errors += 1
+                logger.error(f"Persistence batch error ({len(batch)} rows dropped): {e}")
+                break
+            except Exception as e:
+                self.errors += 1
+                conn.rollback()
+                logger.error(f"Persistence batch error ({len(batch)} rows dropped): {e}")
+                break
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        elapsed = time.perf_counter() - started
+        self.last_commit_ms = elapsed * 1000
+        metrics.observe('db_write_seconds', elapsed)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+            'retries': self.retries,
+            'restarts': self.restarts,
+            'last_batch_size': self.last_batch_size,
+            'last_commit_ms': round(self.last_commit_ms, 2),
+            'running': self.alive(),
+        }
+
+persistence_writer = PersistenceWriter(DB_PATH)
+
+metrics.histogram('db_write_seconds', "Write-behind batch latency (transcript file append + executemany + commit)")
+metrics.gauge('db_write_queue_depth', "Rows waiting for the persistence writer", lambda: persistence_writer.queue.qsize())
+metrics.gauge('db_rows_written_total', "Rows committed by the persistence writer", lambda: persistence_writer.written, type='counter')
+metrics.gauge('db_writer_running', "1 while the persistence writer thread is alive", lambda: int(persistence_writer.alive()))
+
+async def start_persistence_writer():
+    persistence_writer.start()
+
+async def stop_persistence_writer():
+    await asyncio.get_running_loop().run_in_executor(None, persistence_writer.stop)
+
+atexit.register(persistence_writer.stop)
+
+@app.get("/api/persistence")
+async def get_persistence_stats():
+    """Write-behind queue metrics"""
+    return persistence_writer.stats()
+
+# Models
+class Place(BaseModel):
+    name: str
+    description: str = ""
+
+# --- Places Catalog (in-memory) ---
+# Tourist page loads read places from memory. add_place/upload_places bump the version, which
+# invalidates the cached rows and changes the ETag so phones revalidate with a cheap 304.
+class PlacesCatalog:
+    """Cached copy of the places table, newest first"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.version = 0
+        self.loaded_version = -1
+        self.places = []
+        self.ids = []  # negated ids (ascending) for keyset bisect
+        self.digest = ""
+        self.full_body = b""
+        self.load_lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+
+    def _load(self):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("SELECT id, name, description FROM places ORDER BY id DESC")
+        rows = c.fetchall()
+        conn.close()
+        return [{"id": r[0], "name": r[1], "description": r[2]} for r in rows]
 
-init_db()
+    async def ensure_loaded(self):
+        if self.loaded_version == self.version:
+            return
+        async with self.load_lock:
+            if self.loaded_version == self.version:
+                return
+            version = self.version
+            places = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            self.places = places
+            self.ids = [-p["id"] for p in places]
+            self.full_body = json.dumps({"places": places, "next_cursor": None}, ensure_ascii=False).encode("utf-8")
+            self.digest = hashlib.sha1(self.full_body).hexdigest()[:16]
+            self.loaded_version = version
+            logger.info(f"Places catalog loaded: {len(places)} places (version {version})")
 
-# Models
-class Place(BaseModel):
-    name: str
-    description: str = ""
+    def page(self, limit=None, cursor=None):
+        """Keyset page: places with id < cursor, newest first"""
+        start = bisect.bisect_right(self.ids, -cursor) if cursor is not None else 0
+        if limit is None:
+            items = self.places[start:]
+            return items, None
+        items = self.places[start:start + limit]
+        next_cursor = items[-1]["id"] if start + limit < len(self.places) and items else None
+        return items, next_cursor
+
+places_catalog = PlacesCatalog(DB_PATH)
+
+PLACES_PAGE_MAX = 500
 
 @app.post("/add_place")
 async def add_place(place: Place):
@@ -389,264 +3151,1257 @@ async def add_place(place: Place):
         c.execute("INSERT INTO places (name, description) VALUES (?, ?)", (place.name, place.description))
         conn.commit()
         conn.close()
+        places_catalog.invalidate()
+        await cluster.share_event('places')
         logger.info(f"Added place: {place.name}")
         return {"status": "success", "message": f"Place '{place.name}' added."}
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return {"status": "error", "message": str(e)}
 
+# --- Bulk Places Import ---
+# Uploads are streamed to a temp file, parsed incrementally on a dedicated worker thread and
+# inserted with batched executemany inside one transaction; progress goes out over socket.io.
+IMPORT_BATCH_SIZE = 1000
+IMPORT_UPLOAD_CHUNK = 1024 * 1024
+IMPORT_REJECTED_REPORT_LIMIT = 100
+import_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="places-import")
+
+# Excel on Korean Windows saves "CSV" as CP949; "CSV UTF-8" is utf-8 with a BOM
+CSV_ENCODINGS = ('utf-8-sig', 'cp949')
+
+def detect_csv_encoding(path, chunk_size=1024 * 1024):
+    """First encoding in CSV_ENCODINGS that decodes the whole file strictly (streamed, not loaded)"""
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    decoder.decode(chunk, final=not chunk)
+                    if not chunk:
+                        break
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSV file is neither UTF-8 nor CP949 (EUC-KR) text. Save it as 'CSV UTF-8' and upload it again.")
+
+@contextmanager
+def open_upload_rows(path, filename):
+    """(header, rows_iterator) of a CSV/XLSX/XLS file, read without loading it all at once; the
+    file is closed when the with block exits, however it exits"""
+    if filename.endswith('.csv'):
+        f = open(path, newline='', encoding=detect_csv_encoding(path))
+        try:
+            reader = csv.reader(f)
+            yield next(reader, None), reader
+        finally:
+            f.close()
+    elif filename.endswith('.xlsx'):
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            yield next(rows, None), rows
+        finally:
+            wb.close()
+    else:
+        # Legacy .xls has no streaming reader: fall back to pandas
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ValueError("Pandas library not installed on server. Cannot process .xls files.")
+        df = pd.read_excel(path)
+        yield list(df.columns), df.itertuples(index=False, name=None)
+
+def import_places_file(path, filename, progress=None):
+    """Blocking import (runs on import_executor). Returns counts and rejected rows."""
+    imported = 0
+    rejected = 0
+    rejected_rows = []
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with open_upload_rows(path, filename) as (header, rows):
+            # Expected columns: 'name', 'description'
+            columns = [str(c).strip().lower() if c is not None else '' for c in (header or [])]
+            if 'name' not in columns:
+                raise ValueError("Missing 'name' column in file.")
+            name_idx = columns.index('name')
+            desc_idx = columns.index('description') if 'description' in columns else None
+
+            conn.execute("BEGIN")
+            batch = []
+            for line_no, row in enumerate(rows, start=2):
+                if not row or all(v is None or str(v).strip() == '' for v in row):
+                    continue  # blank line
+                name = row[name_idx] if name_idx < len(row) else None
+                desc = row[desc_idx] if desc_idx is not None and desc_idx < len(row) else None
+                if name is None or (isinstance(name, float) and name != name) or not str(name).strip():
+                    rejected += 1
+                    if len(rejected_rows) < IMPORT_REJECTED_REPORT_LIMIT:
+                        rejected_rows.append({'row': line_no, 'reason': "missing name"})
+                    continue
+                if desc is None or (isinstance(desc, float) and desc != desc):
+                    desc = ''
+                batch.append((str(name), str(desc)))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    conn.executemany("INSERT INTO places (name, description) VALUES (?, ?)", batch)
+                    imported += len(batch)
+                    batch = []
+                    if progress:
+                        progress(imported, rejected)
+            if batch:
+                conn.executemany("INSERT INTO places (name, description) VALUES (?, ?)", batch)
+                imported += len(batch)
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {'imported': imported, 'rejected': rejected, 'rejected_rows': rejected_rows}
+
 @app.post("/upload_places")
-async def upload_places(file: UploadFile = File(...)):
+async def upload_places(file: UploadFile = File(...), sid: Optional[str] = Form(None)):
+    tmp_path = None
     try:
-        if pd is None:
-            return {"status": "error", "message": "Pandas library not installed on server. Cannot process files."}
-            
-        contents = await file.read()
-        filename = file.filename or "uploaded_file"
-        if filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(contents))
-        elif filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(io.BytesIO(contents))
-        else:
+        filename = (file.filename or "uploaded_file").lower()
+        if not filename.endswith(('.csv', '.xls', '.xlsx')):
             return {"status": "error", "message": "Invalid file format. Use .csv or .xlsx"}
 
-        # Expected columns: 'name', 'description'
-        # Normalize columns
-        df.columns = [c.lower() for c in df.columns]
-        
-        if 'name' not in df.columns:
-            return {"status": "error", "message": "Missing 'name' column in file."}
+        loop = asyncio.get_running_loop()
 
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        count = 0
-        for _, row in df.iterrows():
-            name = row['name']
-            desc = row.get('description', '')
-            c.execute("INSERT INTO places (name, description) VALUES (?, ?)", (name, desc))
-            count += 1
-            
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Imported {count} places from file")
-        return {"status": "success", "message": f"Successfully imported {count} places."}
+        # Stream the upload to disk in chunks
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(IMPORT_UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                await loop.run_in_executor(None, out.write, chunk)
+
+        def progress(imported, rejected):
+            if sid:
+                asyncio.run_coroutine_threadsafe(
+                    sio_server.emit('import_progress', {'imported': imported, 'rejected': rejected, 'done': False}, room=sid),
+                    loop
+                )
 
+        result = await loop.run_in_executor(
+            import_executor, import_places_file, tmp_path, filename, progress
+        )
+        places_catalog.invalidate()
+        await cluster.share_event('places')
+        if sid:
+            await sio_server.emit('import_progress', {'imported': result['imported'], 'rejected': result['rejected'], 'done': True}, room=sid)
+
+        count = result['imported']
+        logger.info(f"Imported {count} places from file ({result['rejected']} rejected)")
+        message = f"Successfully imported {count} places."
+        if result['rejected']:
+            message += f" {result['rejected']} rows rejected."
+        return {"status": "success", "message": message, **result}
+
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         logger.error(f"Upload Error: {e}")
         return {"status": "error", "message": str(e)}
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 @app.get("/places")
-async def get_places():
+async def get_places(request: Request, limit: Optional[int] = None, cursor: Optional[int] = None):
+    await places_catalog.ensure_loaded()
+    if limit is not None:
+        limit = max(1, min(limit, PLACES_PAGE_MAX))
+    etag = f'"{places_catalog.digest}-{cursor or 0}-{limit or 0}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if limit is None and cursor is None:
+        body = places_catalog.full_body
+    else:
+        places, next_cursor = places_catalog.page(limit, cursor)
+        body = json.dumps({"places": places, "next_cursor": next_cursor}, ensure_ascii=False).encode("utf-8")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# --- Transcript Sessions ---
+# Every final transcript belongs to a session: one run of a tour, opened by its first transcript and
+# closed by /clear_session or after SESSION_IDLE_MINUTES without a transcript. History, summaries
+# and downloads are per session and read through the (session_id, id) index, so they cost the same
+# however many tours the database holds. Sessions closed for SESSION_ARCHIVE_HOURS are moved out of
+# the transcripts table into gzipped NDJSON files under SESSION_ARCHIVE_DIR and read from there;
+# their text moves to archived_transcripts_fts, so /search still finds it.
+SESSION_IDLE_MINUTES = float(os.environ.get("SESSION_IDLE_MINUTES", "180"))
+SESSION_ARCHIVE_HOURS = float(os.environ.get("SESSION_ARCHIVE_HOURS", "168"))  # after close
+SESSION_MAINTENANCE_INTERVAL = float(os.environ.get("SESSION_MAINTENANCE_INTERVAL", "300"))
+SESSION_ARCHIVE_DIR = "session_archive"
+SESSIONS_PAGE_MAX = 200
+
+# Stored count once closed; open sessions are counted through the index
+SESSION_COLUMNS = ("s.id, s.tour_id, s.started_at, s.ended_at, CASE WHEN s.ended_at IS NULL THEN "
+                   "(SELECT COUNT(*) FROM transcripts WHERE session_id = s.id) ELSE s.transcript_count END, "
+                   "s.summary, s.archive_file, s.archived_at")
+LAST_TRANSCRIPT_AT_SQL = ("COALESCE((SELECT created_at FROM transcripts WHERE session_id = s.id "
+                          "ORDER BY id DESC LIMIT 1), s.started_at)")
+
+def session_row(r):
+    status = 'open' if r[3] is None else ('archived' if r[7] else 'closed')
+    return {"id": r[0], "tour_id": r[1], "started_at": r[2], "ended_at": r[3], "transcript_count": r[4],
+            "summary": r[5], "archive_file": r[6], "archived_at": r[7], "status": status}
+
+def open_session(tour_id):
+    """(id, created) of the tour's open session, creating it if there is none. The check and insert
+    share a write transaction, so workers racing on the same tour end up in one session."""
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT id FROM sessions WHERE tour_id = ? AND ended_at IS NULL ORDER BY id DESC LIMIT 1",
+                           (tour_id,)).fetchone()
+        created = row is None
+        if created:
+            row = (conn.execute("INSERT INTO sessions (tour_id, started_at) VALUES (?, ?)",
+                                (tour_id, utc_timestamp())).lastrowid,)
+        conn.commit()
+        return row[0], created
+    finally:
+        conn.close()
+
+def close_sessions(tour_id=None, idle_before=None):
+    """Close the tour's open session, or every open session idle since idle_before; returns
+    [(id, tour_id)]. Idle sessions end at their last transcript."""
+    where, params = ["s.ended_at IS NULL"], []
+    if tour_id is not None:
+        where.append("s.tour_id = ?")
+        params.append(tour_id)
+    if idle_before is not None:
+        where.append(f"{LAST_TRANSCRIPT_AT_SQL} < ?")
+        params.append(idle_before)
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        rows = conn.execute(f"SELECT s.id, s.tour_id, {LAST_TRANSCRIPT_AT_SQL} FROM sessions s "
+                            f"WHERE {' AND '.join(where)}", params).fetchall()
+        for session_id, _, last_at in rows:
+            conn.execute(
+                "UPDATE sessions SET ended_at = ?, transcript_count = (SELECT COUNT(*) FROM transcripts "
+                "WHERE session_id = ?) WHERE id = ? AND ended_at IS NULL",
+                (last_at if idle_before is not None else utc_timestamp(), session_id, session_id)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return [(r[0], r[1]) for r in rows]
+
+def find_session(session_id=None, tour_id=DEFAULT_TOUR_ID):
+    """Session by id, or the tour's latest one; None if there is none"""
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, name, description FROM places ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    
-    places = [{"id": r[0], "name": r[1], "description": r[2]} for r in rows]
-    return {"places": places}
+    try:
+        if session_id is not None:
+            row = conn.execute(f"SELECT {SESSION_COLUMNS} FROM sessions s WHERE s.id = ?", (session_id,)).fetchone()
+        else:
+            row = conn.execute(f"SELECT {SESSION_COLUMNS} FROM sessions s WHERE s.tour_id = ? ORDER BY s.id DESC LIMIT 1",
+                               (tour_id,)).fetchone()
+    finally:
+        conn.close()
+    return session_row(row) if row else None
 
-@app.get("/history")
-async def get_history():
+def read_archive(filename):
+    """(id, text, translations, created_at) rows of an archived session, oldest first"""
+    with gzip.open(os.path.join(SESSION_ARCHIVE_DIR, filename), "rt", encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            yield r["id"], r["text"], json.dumps(r["translations"], ensure_ascii=False), r["created_at"]
+
+def session_rows(session, after_id=0):
+    """(id, text, translations, created_at) rows of one session after after_id, oldest first,
+    from the transcripts table or the session's archive (blocking; iterate on one thread)"""
+    if session["archive_file"]:
+        yield from (r for r in read_archive(session["archive_file"]) if r[0] > after_id)
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        yield from conn.execute(
+            "SELECT id, text, translations, created_at FROM transcripts WHERE session_id = ? AND id > ? ORDER BY id ASC",
+            (session["id"], after_id)
+        )
+    finally:
+        conn.close()
+
+def archive_session(session_id):
+    """Write a closed session's transcripts to a gzipped NDJSON file, then move them from the
+    transcripts table (and, through its triggers, transcripts_fts) to archived_transcripts_fts,
+    where they stay searchable. Returns (rows, bytes).
+    Safe to run twice: the snapshot read sees all rows or none, and only the first update counts.
+    Only rows that made it into the file are deleted."""
+    os.makedirs(SESSION_ARCHIVE_DIR, exist_ok=True)
+    filename = f"session_{session_id}.ndjson.gz"
+    path = os.path.join(SESSION_ARCHIVE_DIR, filename)
+    partial = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        count, last_id = 0, 0
+        with gzip.open(partial, "wt", encoding="utf-8") as f:
+            for r in conn.execute("SELECT id, text, translations, created_at FROM transcripts WHERE session_id = ? "
+                                  "ORDER BY id ASC", (session_id,)):
+                f.write(json.dumps({"id": r[0], "text": r[1], "translations": parse_translations(r[2]),
+                                    "created_at": r[3]}, ensure_ascii=False) + "\n")
+                count, last_id = count + 1, r[0]
+        if count:
+            os.replace(partial, path)
+            size = os.path.getsize(path)
+        else:
+            os.remove(partial)
+            filename, size = None, 0
+        updated = conn.execute(
+            "UPDATE sessions SET archive_file = ?, archived_at = ?, transcript_count = ? "
+            "WHERE id = ? AND ended_at IS NOT NULL AND archived_at IS NULL",
+            (filename, utc_timestamp(), count, session_id)
+        ).rowcount
+        if updated:
+            if search_enabled:
+                conn.execute(
+                    "INSERT INTO archived_transcripts_fts (rowid, text, translations, translations_json, created_at, "
+                    f"tour_id, session_id) SELECT t.id, t.text, {TRANSLATION_VALUES_SQL.format('t.translations')}, "
+                    "t.translations, t.created_at, s.tour_id, t.session_id FROM transcripts t "
+                    "JOIN sessions s ON s.id = t.session_id WHERE t.session_id = ? AND t.id <= ?",
+                    (session_id, last_id)
+                )
+            conn.execute("DELETE FROM transcripts WHERE session_id = ? AND id <= ?", (session_id, last_id))
+        conn.commit()
+        return (count, size) if updated else (0, 0)
+    finally:
+        conn.close()
+
+def sessions_due_for_archive(closed_before):
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return [r[0] for r in conn.execute(
+            "SELECT id FROM sessions WHERE ended_at IS NOT NULL AND ended_at <= ? AND archived_at IS NULL ORDER BY id",
+            (closed_before,)
+        )]
+    finally:
+        conn.close()
+
+class TranscriptSessions:
+    """Open session per tour (cached on the Tour), idle closing and archiving"""
+
+    def __init__(self):
+        self.opening = {}  # {tour_id: Task} - transcripts arriving meanwhile wait for the same lookup
+        self.opened = 0
+        self.closed = 0
+        self.archived = 0
+        self.archived_rows = 0
+        self.archive_bytes = 0
+        self.errors = 0
+        self.last_maintenance_ms = 0.0
+
+    async def current(self, tour):
+        """Id of the tour's open session, opening one with the tour's first transcript"""
+        if tour.session_id is not None:
+            return tour.session_id
+        task = self.opening.get(tour.id)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(None, open_session, tour.id))
+            self.opening[tour.id] = task
+            task.add_done_callback(lambda _: self.opening.pop(tour.id, None))
+        session_id, created = await task
+        if created and tour.session_id is None:
+            self.opened += 1
+            logger.info(f"Opened session {session_id} for tour '{tour.id}'")
+        tour.session_id = session_id
+        return session_id
+
+    async def close(self, tour_id=None, idle_before=None):
+        """Close the tour's open session (or every idle one) everywhere; the next transcript opens a new one"""
+        await persistence_writer.flush()
+        closed = await asyncio.get_running_loop().run_in_executor(None, close_sessions, tour_id, idle_before)
+        for session_id, closed_tour in closed:
+            tour = tours.get(closed_tour)
+            if tour is not None and tour.session_id == session_id:
+                tour.session_id = None
+            await cluster.share_event('session_closed', closed_tour)
+            logger.info(f"Closed session {session_id} of tour '{closed_tour}'")
+        self.closed += len(closed)
+        return [session_id for session_id, _ in closed]
+
+    async def maintain(self):
+        """Close idle sessions, then archive the ones closed more than SESSION_ARCHIVE_HOURS ago"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        closed = await self.close(idle_before=utc_timestamp(SESSION_IDLE_MINUTES * 60))
+        archived = []
+        for session_id in await loop.run_in_executor(None, sessions_due_for_archive, utc_timestamp(SESSION_ARCHIVE_HOURS * 3600)):
+            try:
+                rows, size = await loop.run_in_executor(None, archive_session, session_id)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Archiving session {session_id} failed: {e}")
+                continue
+            archived.append(session_id)
+            self.archived += 1
+            self.archived_rows += rows
+            self.archive_bytes += size
+            logger.info(f"Archived session {session_id} ({rows} transcripts, {size} bytes)")
+        self.last_maintenance_ms = (time.perf_counter() - started) * 1000
+        return {"closed": closed, "archived": archived}
+
+    def stats(self):
+        return {
+            'open_sessions': {tour_id: tour.session_id for tour_id, tour in tours.items() if tour.session_id is not None},
+            'opened': self.opened,
+            'closed': self.closed,
+            'archived': self.archived,
+            'archived_rows': self.archived_rows,
+            'archive_bytes': self.archive_bytes,
+            'errors': self.errors,
+            'last_maintenance_ms': round(self.last_maintenance_ms, 2),
+            'idle_minutes': SESSION_IDLE_MINUTES,
+            'archive_hours': SESSION_ARCHIVE_HOURS,
+        }
+
+transcript_sessions = TranscriptSessions()
+
+metrics.gauge('sessions_archived_total', "Closed sessions moved to archive files",
+              lambda: transcript_sessions.archived, type='counter')
+metrics.gauge('session_rows_archived_total', "Transcript rows moved to archive files",
+              lambda: transcript_sessions.archived_rows, type='counter')
+
+async def maintain_sessions():
+    while True:
+        await asyncio.sleep(SESSION_MAINTENANCE_INTERVAL)
+        try:
+            await transcript_sessions.maintain()
+        except Exception as e:
+            logger.error(f"Session maintenance error: {e}")
+
+async def start_session_maintenance():
+    app.state.session_maintenance = asyncio.create_task(maintain_sessions())
+
+async def resolve_session(session=None, tour=None):
+    """Session by id, else the tour's latest one, after pending transcripts are committed"""
+    await persistence_writer.flush()
+    return await asyncio.get_running_loop().run_in_executor(None, find_session, session, normalize_tour_id(tour))
+
+@app.get("/sessions")
+async def list_sessions(tour: Optional[str] = None, limit: int = 50, cursor: Optional[int] = None):
+    """Sessions newest first, keyset-paginated by id (next_cursor), filterable by tour"""
+    limit = max(1, min(limit, SESSIONS_PAGE_MAX))
+    where, params = [], []
+    if tour:
+        where.append("s.tour_id = ?")
+        params.append(normalize_tour_id(tour))
+    if cursor is not None:
+        where.append("s.id < ?")
+        params.append(cursor)
+    sql = f"SELECT {SESSION_COLUMNS} FROM sessions s"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    await persistence_writer.flush()
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, text, translations, created_at FROM transcripts ORDER BY id DESC")
-    rows = c.fetchall()
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
     
-    history = []
-    for r in rows:
-        translations = {}
-        try:
-            if r[2]:
-                translations = json.loads(r[2])
-        except:
-            pass
-        history.append({
-            "id": r[0],
-            "text": r[1],
-            "translations": translations,
-            "created_at": r[3]
-        })
+    sessions = [session_row(r) for r in rows[:limit]]
+    next_cursor = sessions[-1]["id"] if len(rows) > limit else None
+    return {"sessions": sessions, "next_cursor": next_cursor}
     
-    return {"history": history}
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: int):
+    session = await resolve_session(session_id)
+    if session is None:
+        return {"status": "error", "message": f"Unknown session {session_id}"}
+    return session
 
-@app.post("/summarize")
-async def summarize_session():
+@app.post("/sessions/archive")
+async def run_session_maintenance():
+    """Run session maintenance now (close idle sessions, archive due ones)"""
+    return await transcript_sessions.maintain()
+
+def fetch_history(session, limit=None, cursor=None):
+    """Newest-first (id, text, translations, created_at) rows of a session, up to limit + 1"""
+    if session["archive_file"]:
+        rows = [r for r in read_archive(session["archive_file"]) if cursor is None or r[0] < cursor][::-1]
+        return rows[:limit + 1] if limit else rows
+    sql = "SELECT id, text, translations, created_at FROM transcripts WHERE session_id = ?"
+    params = [session["id"]]
+    if cursor is not None:
+        sql += " AND id < ?"
+        params.append(cursor)
+    sql += " ORDER BY id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    conn = sqlite3.connect(DB_PATH)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT text FROM transcripts ORDER BY id ASC")
-        rows = c.fetchall()
+        return conn.execute(sql, params).fetchall()
+    finally:
         conn.close()
-        
-        if not rows:
-            return {"status": "error", "message": "No transcripts to summarize"}
-        
-        all_text = "\n".join([r[0] for r in rows])
-        
-        if len(all_text) < 50:
-            return {"status": "error", "message": "Not enough content to summarize"}
-        
-        client = OpenAI(
+
+@app.get("/history")
+async def get_history(session: Optional[int] = None, tour: Optional[str] = None, limit: Optional[int] = None,
+                      cursor: Optional[int] = None):
+    """Transcripts of a session (default: the tour's latest), newest first; with limit, page on with next_cursor"""
+    found = await resolve_session(session, tour)
+    if found is None:
+        return {"session": None, "history": [], "next_cursor": None}
+    limit = max(1, min(limit, SESSIONS_PAGE_MAX)) if limit else None
+    rows = await asyncio.get_running_loop().run_in_executor(None, fetch_history, found, limit, cursor)
+
+    history = [{"id": r[0], "text": r[1], "translations": parse_translations(r[2]), "created_at": r[3]}
+               for r in rows[:limit]]
+    next_cursor = history[-1]["id"] if limit and len(rows) > limit else None
+    return {"session": found, "history": history, "next_cursor": next_cursor}
+
+@app.get("/sessions/{session_id}/history")
+async def get_session_history(session_id: int, limit: Optional[int] = None, cursor: Optional[int] = None):
+    return await get_history(session_id, limit=limit, cursor=cursor)
+
+# --- Session Summarization ---
+# /summarize starts a background job and returns immediately; clients poll /summarize/{job_id}.
+# Long sessions are summarized map-reduce style in chunks, and a rolling summary stored on the
+# session means each run only processes transcripts added since the previous one.
+SUMMARY_BACKEND = os.environ.get("SUMMARY_BACKEND", "openai")  # 'openai' or 'stub' (offline testing)
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_TIMEOUT = float(os.environ.get("SUMMARY_TIMEOUT", "60"))
+SUMMARY_CHUNK_CHARS = int(os.environ.get("SUMMARY_CHUNK_CHARS", "8000"))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "3"))
+
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that summarizes tour guide sessions. Provide a clear, concise summary of the key points discussed. Output in Korean if the content is primarily Korean, otherwise match the main language."
+
+class OpenAISummaryBackend:
+    """Async OpenAI-compatible chat backend (point AI_INTEGRATIONS_OPENAI_BASE_URL at a local fake server for tests)"""
+    name = "openai"
+
+    def __init__(self):
+        from openai import AsyncOpenAI  # the SDK is slow to import; only needed once a summary is requested
+        self.client = AsyncOpenAI(
             api_key=os.environ.get("AI_INTEGRATIONS_OPENAI_API_KEY"),
-            base_url=os.environ.get("AI_INTEGRATIONS_OPENAI_BASE_URL")
+            base_url=os.environ.get("AI_INTEGRATIONS_OPENAI_BASE_URL"),
+            timeout=SUMMARY_TIMEOUT,
+            max_retries=2
         )
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+
+    async def complete(self, prompt, max_tokens=1000):
+        response = await self.client.chat.completions.create(
+            model=SUMMARY_MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes tour guide sessions. Provide a clear, concise summary of the key points discussed. Output in Korean if the content is primarily Korean, otherwise match the main language."},
-                {"role": "user", "content": f"Please summarize this tour guide session transcript:\n\n{all_text[:8000]}"}
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
             ],
-            max_tokens=1000
+            max_tokens=max_tokens
         )
-        
-        summary = response.choices[0].message.content
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        summary_file = f"session_summary_{timestamp}.txt"
-        with open(summary_file, "w", encoding="utf-8") as f:
-            f.write(f"Session Summary - {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-            f.write("=" * 50 + "\n\n")
-            f.write(summary + "\n\n")
-            f.write("=" * 50 + "\n")
-            f.write("Full Transcript:\n\n")
-            f.write(all_text)
-        
-        return {
-            "status": "success",
-            "summary": summary,
-            "file": summary_file,
-            "transcript_count": len(rows)
-        }
-        
+        return response.choices[0].message.content or ""
+
+class StubSummaryBackend:
+    """Offline backend: returns the first line of each paragraph of the prompt body"""
+    name = "stub"
+
+    async def complete(self, prompt, max_tokens=1000):
+        body = prompt.split("\n\n", 1)[-1]
+        return "\n".join(line for line in body.splitlines()[:5] if line.strip())
+
+SUMMARY_BACKENDS = {
+    'openai': OpenAISummaryBackend,
+    'stub': StubSummaryBackend,
+}
+
+summary_backend = None
+summary_jobs = {}  # {job_id: job dict}
+SUMMARY_JOB_TTL = 3600  # seconds a job's status stays readable from other workers
+summary_lock = asyncio.Lock()  # one summarization run at a time (rolling state)
+
+def get_summary_backend():
+    global summary_backend
+    if summary_backend is None:
+        backend_cls = SUMMARY_BACKENDS.get(SUMMARY_BACKEND)
+        if backend_cls is None:
+            logger.warning(f"Unknown summary backend '{SUMMARY_BACKEND}', falling back to 'stub'")
+            backend_cls = StubSummaryBackend
+        summary_backend = backend_cls()
+    return summary_backend
+
+def split_into_chunks(lines, max_chars=SUMMARY_CHUNK_CHARS):
+    """Group lines into chunks of at most max_chars (a single longer line is split)"""
+    chunks, current, size = [], [], 0
+    for line in lines:
+        while len(line) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) + 1 > max_chars and current:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+metrics.histogram('summary_request_seconds', "Summary backend latency per completion request")
+metrics.histogram('summary_job_seconds', "Wall time of a /summarize job")
+
+async def timed_complete(backend, stage, prompt, **kwargs):
+    started = time.perf_counter()
+    try:
+        return await backend.complete(prompt, **kwargs)
+    finally:
+        metrics.observe('summary_request_seconds', time.perf_counter() - started, backend=backend.name, stage=stage)
+
+async def map_reduce_summary(backend, lines, previous_summary=None):
+    """Summarize each chunk (map), then merge chunk summaries with the rolling summary (reduce)"""
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize_chunk(chunk):
+        async with semaphore:
+            return await timed_complete(backend, 'map', f"Please summarize this part of a tour guide session transcript:\n\n{chunk}", max_tokens=600)
+
+    partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in split_into_chunks(lines)))
+    if previous_summary:
+        partials = [previous_summary] + list(partials)
+
+    # Reduce until everything fits into one prompt
+    while len(partials) > 1:
+        groups = split_into_chunks(partials)
+        if len(groups) == 1:
+            return await timed_complete(
+                backend, 'reduce', f"Merge these consecutive partial summaries of one tour guide session into a single summary:\n\n{groups[0]}"
+            )
+        partials = await asyncio.gather(*(summarize_chunk(group) for group in groups))
+    return partials[0] if partials else ""
+
+def load_summary_state(session_id):
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT summary_transcript_id, summary, summary_count FROM sessions WHERE id = ?",
+                           (session_id,)).fetchone()
+    finally:
+        conn.close()
+    return row or (0, None, 0)
+
+def save_summary_state(session_id, last_id, summary, count):
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute("UPDATE sessions SET summary_transcript_id = ?, summary = ?, summary_count = ? WHERE id = ?",
+                     (last_id, summary, count, session_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def fetch_transcripts_since(session, last_id):
+    return [(r[0], r[1]) for r in session_rows(session, last_id)]
+
+def write_summary_file(session, summary):
+    """Blocking: summary + the session's full transcript, streamed from the DB or its archive"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_file = f"session_summary_{session['id']}_{timestamp}.txt"
+    with open(summary_file, "w", encoding="utf-8") as f:
+        f.write(f"Session Summary - {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
+        f.write(f"Tour: {session['tour_id']}, session {session['id']} (started {session['started_at']} UTC)\n")
+        f.write("=" * 50 + "\n\n")
+        f.write(summary + "\n\n")
+        f.write("=" * 50 + "\n")
+        f.write("Full Transcript:\n\n")
+        for r in session_rows(session):
+            f.write(r[1] + "\n")
+    return summary_file
+
+def summary_job_view(job):
+    return {k: v for k, v in job.items() if k != 'task'}
+
+async def run_summary_job(job, session):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    job['status'] = 'running'
+    await cluster.put_value(f"summary_job:{job['job_id']}", summary_job_view(job), SUMMARY_JOB_TTL)
+    try:
+        async with summary_lock:
+            await persistence_writer.flush()
+            last_id, previous_summary, previous_count = await loop.run_in_executor(None, load_summary_state, session['id'])
+            rows = await loop.run_in_executor(None, fetch_transcripts_since, session, last_id)
+
+            if not rows and not previous_summary:
+                raise ValueError("No transcripts to summarize")
+            if rows:
+                new_text_length = sum(len(r[1]) for r in rows)
+                if not previous_summary and new_text_length < 50:
+                    raise ValueError("Not enough content to summarize")
+                job['new_transcripts'] = len(rows)
+                summary = await map_reduce_summary(get_summary_backend(), [r[1] for r in rows], previous_summary)
+                last_id = rows[-1][0]
+                count = previous_count + len(rows)
+                await loop.run_in_executor(None, save_summary_state, session['id'], last_id, summary, count)
+            else:
+                summary, count = previous_summary, previous_count
+
+            summary_file = await loop.run_in_executor(None, write_summary_file, session, summary)
+
+        job.update(status='success', summary=summary, file=summary_file, transcript_count=count,
+                   finished_at=datetime.now().isoformat())
+        logger.info(f"Summary job {job['job_id']} done (session {session['id']}, {job.get('new_transcripts', 0)} new transcripts)")
+    except ValueError as e:
+        job.update(status='error', message=str(e), finished_at=datetime.now().isoformat())
     except Exception as e:
         logger.error(f"Summarization error: {e}")
-        return {"status": "error", "message": str(e)}
+        job.update(status='error', message=str(e), finished_at=datetime.now().isoformat())
+    metrics.observe('summary_job_seconds', time.perf_counter() - started, status=job['status'])
+    # Polls may land on another worker
+    await cluster.put_value(f"summary_job:{job['job_id']}", summary_job_view(job), SUMMARY_JOB_TTL)
 
-@app.get("/download_transcript")
-async def download_transcript():
+@app.post("/summarize")
+async def summarize_session(session: Optional[int] = None, tour: Optional[str] = None):
+    """Start (or join) a background summarization job for a session (default: the tour's latest)"""
+    found = await resolve_session(session, tour)
+    if found is None:
+        return {"status": "error", "message": "No session to summarize"}
+    for job in summary_jobs.values():
+        if job['session_id'] == found['id'] and job['status'] in ('pending', 'running'):
+            return {"status": "accepted", "job_id": job['job_id'], "session_id": found['id']}
+
+    # Keep only recent finished jobs
+    for job_id in list(summary_jobs)[:-20]:
+        summary_jobs.pop(job_id, None)
+
+    job = {'job_id': uuid.uuid4().hex[:12], 'session_id': found['id'], 'status': 'pending',
+           'started_at': datetime.now().isoformat()}
+    summary_jobs[job['job_id']] = job
+    job['task'] = asyncio.create_task(run_summary_job(job, found))
+    return {"status": "accepted", "job_id": job['job_id'], "session_id": found['id']}
+
+@app.post("/sessions/{session_id}/summarize")
+async def summarize_session_by_id(session_id: int):
+    return await summarize_session(session_id)
+
+@app.get("/summarize/{job_id}")
+async def get_summary_job(job_id: str):
+    job = summary_jobs.get(job_id)
+    if job is None:
+        shared = await cluster.get_value(f"summary_job:{job_id}")
+        if shared is not None:
+            return shared
+        return {"status": "error", "message": "Unknown summary job"}
+    return summary_job_view(job)
+
+# --- Streaming Transcript Export ---
+# Rows are pulled from a cursor (or a session's archive file) in chunks on a worker thread and
+# written to the response as they arrive, so memory stays flat regardless of how long the session was.
+TRANSCRIPT_STREAM_CHUNK = 500
+
+async def iter_query_batches(sql, params=(), chunk_size=TRANSCRIPT_STREAM_CHUNK):
+    """Run a query on a worker thread and yield its rows in lists of chunk_size"""
+    loop = asyncio.get_running_loop()
+    conn = await loop.run_in_executor(None, functools.partial(sqlite3.connect, DB_PATH, check_same_thread=False))
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT text, translations, created_at FROM transcripts ORDER BY id ASC")
-        rows = c.fetchall()
+        cursor = await loop.run_in_executor(None, conn.execute, sql, params)
+        while True:
+            rows = await loop.run_in_executor(None, cursor.fetchmany, chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
         conn.close()
-        
+
+async def iter_transcript_batches(session, chunk_size=TRANSCRIPT_STREAM_CHUNK):
+    """Yield lists of (id, text, translations, created_at) rows of one session, oldest first"""
+    if not session["archive_file"]:
+        async for rows in iter_query_batches(
+            "SELECT id, text, translations, created_at FROM transcripts WHERE session_id = ? ORDER BY id ASC",
+            (session["id"],), chunk_size=chunk_size
+        ):
+            yield rows
+        return
+    loop = asyncio.get_running_loop()
+    archived = read_archive(session["archive_file"])
+    try:
+        while True:
+            rows = await loop.run_in_executor(None, lambda: list(itertools.islice(archived, chunk_size)))
+            if not rows:
+                break
+            yield rows
+    finally:
+        archived.close()
+
+def parse_translations(raw):
+    try:
+        return json.loads(raw) if raw else {}
+    except Exception:
+        return {}
+
+async def stream_transcript_text(session):
+    yield (f"Tour Guide Session Transcript\n"
+           f"Tour: {session['tour_id']}, session {session['id']} (started {session['started_at']} UTC)\n"
+           f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
+           + "=" * 50 + "\n\n")
+    async for rows in iter_transcript_batches(session):
         output = io.StringIO()
-        output.write(f"Tour Guide Session Transcript\n")
-        output.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-        output.write("=" * 50 + "\n\n")
-        
         for r in rows:
-            output.write(f"[{r[2]}]\n")
-            output.write(f"Original: {r[0]}\n")
-            try:
-                translations = json.loads(r[1]) if r[1] else {}
-                for lang, text in translations.items():
-                    output.write(f"{lang}: {text}\n")
-            except:
-                pass
+            output.write(f"[{r[3]}]\n")
+            output.write(f"Original: {r[1]}\n")
+            for lang, text in parse_translations(r[2]).items():
+                output.write(f"{lang}: {text}\n")
             output.write("\n")
+        yield output.getvalue()
+        
+async def stream_transcript_ndjson(session):
+    async for rows in iter_transcript_batches(session):
+        yield "".join(
+            json.dumps({"id": r[0], "text": r[1], "translations": parse_translations(r[2]), "created_at": r[3]},
+                       ensure_ascii=False) + "\n"
+            for r in rows
+        )
+
+async def stream_transcript_csv(session):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    # BOM so Excel opens Korean text correctly
+    output.write("\ufeff")
+    writer.writerow(["id", "created_at", "text", "translations"])
+    async for rows in iter_transcript_batches(session):
+        for r in rows:
+            writer.writerow([r[0], r[3], r[1], r[2] or "{}"])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+    if output.tell():
+        yield output.getvalue()
         
-        content = output.getvalue()
+TRANSCRIPT_EXPORT_FORMATS = {
+    'txt': (stream_transcript_text, "text/plain; charset=utf-8"),
+    'ndjson': (stream_transcript_ndjson, "application/x-ndjson"),
+    'csv': (stream_transcript_csv, "text/csv; charset=utf-8"),
+}
         
-        from fastapi.responses import Response
-        return Response(
-            content=content,
-            media_type="text/plain",
-            headers={"Content-Disposition": f'attachment; filename="transcript_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt"'}
+@app.get("/download_transcript")
+async def download_transcript(format: str = "txt", session: Optional[int] = None, tour: Optional[str] = None):
+    """Transcript of a session (default: the tour's latest) as txt, ndjson or csv"""
+    try:
+        if format not in TRANSCRIPT_EXPORT_FORMATS:
+            return {"status": "error", "message": f"Unknown format '{format}'. Use txt, ndjson or csv"}
+        found = await resolve_session(session, tour)
+        if found is None:
+            return {"status": "error", "message": "No session to download"}
+
+        generator, media_type = TRANSCRIPT_EXPORT_FORMATS[format]
+        filename = f"transcript_{found['tour_id']}_{found['id']}.{format}"
+        return StreamingResponse(
+            generator(found),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
         
     except Exception as e:
         logger.error(f"Download error: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/sessions/{session_id}/download")
+async def download_session(session_id: int, format: str = "txt"):
+    return await download_transcript(format, session_id)
+
+@app.get("/history/export")
+async def export_history(format: str = "ndjson", session: Optional[int] = None, tour: Optional[str] = None):
+    """Streaming history export (ndjson by default, also csv/txt)"""
+    return await download_transcript(format, session, tour)
+
 @app.post("/clear_session")
-async def clear_session():
+async def clear_session(tour: Optional[str] = None):
+    """End the tour's current session; its transcripts stay available under /sessions and the
+    next transcript starts a new one"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("DELETE FROM transcripts")
-        conn.commit()
-        conn.close()
+        closed = await transcript_sessions.close(normalize_tour_id(tour))
         
-        if os.path.exists("guide_transcript.txt"):
-            os.remove("guide_transcript.txt")
+        if os.path.exists(TRANSCRIPT_FILE):
+            os.remove(TRANSCRIPT_FILE)
         
-        return {"status": "success", "message": "Session cleared"}
+        return {"status": "success", "message": "Session closed", "closed": closed}
     except Exception as e:
         logger.error(f"Clear session error: {e}")
         return {"status": "error", "message": str(e)}
 
-@app.get("/export_places")
-async def export_places():
+# --- Places Export ---
+# Export artifacts are built off the event loop and cached per places_catalog.version, so repeat
+# downloads are served straight from memory until a place is added or imported.
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+export_cache = {}  # {format: (version, bytes)}
+xlsx_export_lock = asyncio.Lock()
+
+def build_places_xlsx():
+    """Blocking: write the places table with openpyxl's write-only (streaming) workbook"""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Places')
+    ws.append(['name', 'description', 'created_at'])
+    conn = sqlite3.connect(DB_PATH)
     try:
-        if pd is None:
-            return {"status": "error", "message": "Pandas library not installed. Cannot export."}
-            
-        conn = sqlite3.connect(DB_PATH)
-        # Read into DataFrame
-        df = pd.read_sql_query("SELECT name, description, created_at FROM places", conn)
+        for row in conn.execute("SELECT name, description, created_at FROM places ORDER BY id ASC"):
+            ws.append(list(row))
+    finally:
         conn.close()
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
 
-        # Save to BytesIO
-        output = io.BytesIO()
-        df.to_excel(output, index=False, sheet_name='Places', engine='openpyxl')
-        
+async def stream_places_csv(version):
+    """Stream places as CSV from a cursor; the finished file is cached for this version"""
+    parts = []
+    output = io.StringIO()
+    writer = csv.writer(output)
+    output.write("\ufeff")
+    writer.writerow(['name', 'description', 'created_at'])
+    async for rows in iter_query_batches("SELECT name, description, created_at FROM places ORDER BY id ASC"):
+        writer.writerows(rows)
+        chunk = output.getvalue().encode("utf-8")
         output.seek(0)
-        
-        # Return as downloadable file
-        from fastapi.responses import StreamingResponse
+        output.truncate(0)
+        parts.append(chunk)
+        yield chunk
+    if output.tell():
+        chunk = output.getvalue().encode("utf-8")
+        parts.append(chunk)
+        yield chunk
+    if places_catalog.version == version:
+        export_cache['csv'] = (version, b"".join(parts))
+
+@app.get("/export_places")
+async def export_places(format: str = "xlsx"):
+    try:
+        if format not in ('xlsx', 'csv'):
+            return {"status": "error", "message": f"Unknown format '{format}'. Use xlsx or csv"}
+
+        version = places_catalog.version
+        if format == 'xlsx':
+            media_type = XLSX_MEDIA_TYPE
+        else:
+            media_type = 'text/csv; charset=utf-8'
         headers = {
-            'Content-Disposition': 'attachment; filename="registered_places.xlsx"'
+            'Content-Disposition': f'attachment; filename="registered_places.{format}"'
         }
-        return StreamingResponse(output, headers=headers, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+        cached = export_cache.get(format)
+        if cached and cached[0] == version:
+            return Response(content=cached[1], headers=headers, media_type=media_type)
+
+        if format == 'csv':
+            return StreamingResponse(stream_places_csv(version), headers=headers, media_type=media_type)
+
+        async with xlsx_export_lock:
+            cached = export_cache.get('xlsx')
+            if not cached or cached[0] != version:
+                content = await asyncio.get_running_loop().run_in_executor(None, build_places_xlsx)
+                export_cache['xlsx'] = (version, content)
+                logger.info(f"Built places export (xlsx, version {version}, {len(content)} bytes)")
+            content = export_cache['xlsx'][1]
+        return Response(content=content, headers=headers, media_type=media_type)
 
     except Exception as e:
         logger.error(f"Export Error: {e}")
         return {"status": "error", "message": str(e)}
 
+# --- Recordings Catalog ---
+# /api/recordings reads the recordings table (kept current by the recording writer) instead of
+# stat-ing every file; files are served with byte ranges so players can seek in long segments.
+RECORDINGS_PAGE_MAX = 200
+RECORDING_MEDIA_TYPES = {"ogg": "audio/ogg", "webm": "audio/webm", "wav": "audio/wav"}
+RECORDING_STREAM_CHUNK = 64 * 1024
+
+def recording_row(r):
+    return {
+        "id": r[0], "filename": r[1], "url": f"/recordings/{r[1]}", "tour_id": r[2], "source": r[3],
+        "format": r[4], "started_at": r[5], "ended_at": r[6], "duration_seconds": r[7],
+        "size_bytes": r[8], "transcript_from": r[9], "transcript_to": r[10], "status": r[11],
+    }
+
+def ogg_opus_duration(path):
+    # Opus granule positions count 48 kHz samples: the last page's, minus the pre-skip, is the length
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        f.seek(max(0, os.path.getsize(path) - 65307))  # the last page fits in the largest possible page
+        tail = f.read()
+    at, last = head.find(b"OpusHead"), tail.rfind(b"OggS\x00")
+    if at < 0 or last < 0 or len(tail) < last + 14:
+        return None
+    pre_skip = struct.unpack_from("<H", head, at + 10)[0]
+    granule = struct.unpack_from("<q", tail, last + 6)[0]
+    return max(0, granule - pre_skip) / 48000 if granule > 0 else None
+
+def webm_duration(path):
+    # Segment Info: Duration (0x4489, float) in TimecodeScale units (0x2AD7B1, default 1 ms).
+    # Browser MediaRecorder streams carry no Duration, so these stay unknown.
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    at = head.find(b"\x44\x89")
+    if at < 0 or head[at + 2] not in (0x84, 0x88):
+        return None
+    size = head[at + 2] & 0x0F
+    value = struct.unpack_from(">f" if size == 4 else ">d", head, at + 3)[0]
+    scale = 1000000
+    at = head.find(b"\x2a\xd7\xb1")
+    if at >= 0 and 0x81 <= head[at + 3] <= 0x88:
+        size = head[at + 3] & 0x0F
+        scale = int.from_bytes(head[at + 4:at + 4 + size], "big")
+    return value * scale / 1e9
+
+def recording_duration(path):
+    """Seconds, read from the file's own headers without PyAV (None if unknown), so reconciling
+    the catalog at startup does not import it"""
+    try:
+        fmt = path.rsplit(".", 1)[-1]
+        if fmt == "wav":
+            with wave.open(path, "rb") as w:
+                return w.getnframes() / w.getframerate()
+        if fmt == "ogg":
+            return ogg_opus_duration(path)
+        if fmt == "webm":
+            return webm_duration(path)
+    except (OSError, EOFError, IndexError, ZeroDivisionError, struct.error, wave.Error):
+        pass
+    return None
+
+def reconcile_recordings_index():
+    """Startup pass: index files recorded before the catalog existed, finish rows left 'recording'
+    by a crash, and drop rows whose files were deleted"""
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    on_disk = {f for f in os.listdir(RECORDINGS_DIR) if f.rsplit(".", 1)[-1] in RECORDING_MEDIA_TYPES}
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        indexed = {r[0]: r[1] for r in conn.execute("SELECT filename, status FROM recordings")}
+        added = 0
+        for filename in on_disk:
+            if filename in indexed and indexed[filename] == 'complete':
+                continue
+            path = os.path.join(RECORDINGS_DIR, filename)
+            stat = os.stat(path)
+            duration = recording_duration(path)
+            duration = round(duration, 2) if duration else None
+            ended_at = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            started_at = (datetime.fromtimestamp(stat.st_mtime - duration, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                          if duration else ended_at)
+            parts = filename.rsplit(".", 1)[0].split("_")
+            # New names are {source}_{tour}_{date}_{time}_{id}; legacy WAVs are guide_{id}
+            tour_id = "_".join(parts[1:-3]) if len(parts) >= 5 else DEFAULT_TOUR_ID
+            conn.execute(
+                "INSERT INTO recordings (filename, tour_id, source, format, started_at, ended_at, "
+                "duration_seconds, size_bytes, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'complete') "
+                "ON CONFLICT(filename) DO UPDATE SET ended_at = excluded.ended_at, "
+                "duration_seconds = excluded.duration_seconds, size_bytes = excluded.size_bytes, status = 'complete'",
+                (filename, tour_id, parts[0], filename.rsplit(".", 1)[-1], started_at, ended_at, duration, stat.st_size)
+            )
+            added += 1
+        missing = [(f,) for f in indexed if f not in on_disk]
+        conn.executemany("DELETE FROM recordings WHERE filename = ?", missing)
+        conn.commit()
+        if added or missing:
+            logger.info(f"Recordings index reconciled: {added} indexed, {len(missing)} removed")
+    finally:
+        conn.close()
+
+async def reconcile_recordings():
+    await asyncio.get_running_loop().run_in_executor(None, reconcile_recordings_index)
+
 @app.get("/api/recordings")
-async def get_recordings():
-    files = []
-    if os.path.exists("recordings"):
-        for f in os.listdir("recordings"):
-            if f.endswith(".wav"):
-                files.append(f)
-    # Sort by time (newest first)
-    files.sort(key=lambda x: os.path.getmtime(os.path.join("recordings", x)), reverse=True)
-    return {"files": files}
+async def get_recordings(limit: int = 50, cursor: Optional[int] = None, tour: Optional[str] = None,
+                         source: Optional[str] = None, since: Optional[str] = None,
+                         until: Optional[str] = None, status: Optional[str] = None):
+    """Recordings newest first, keyset-paginated by id (next_cursor), filterable by tour, source
+    ('guide'/'ws'), status and started_at range (UTC 'YYYY-MM-DD HH:MM:SS' prefixes)"""
+    limit = max(1, min(limit, RECORDINGS_PAGE_MAX))
+    where, params = [], []
+    for column, value in (("tour_id", tour), ("source", source), ("status", status)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if cursor is not None:
+        where.append("id < ?")
+        params.append(cursor)
+    if since:
+        where.append("started_at >= ?")
+        params.append(since)
+    if until:
+        where.append("started_at < ?")
+        params.append(until)
+    sql = ("SELECT id, filename, tour_id, source, format, started_at, ended_at, duration_seconds, size_bytes, "
+           "transcript_from, transcript_to, status FROM recordings")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    await persistence_writer.flush()
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    recordings = [recording_row(r) for r in rows[:limit]]
+    next_cursor = recordings[-1]["id"] if len(rows) > limit else None
+    return {"recordings": recordings, "files": [r["filename"] for r in recordings], "next_cursor": next_cursor}
+
+def parse_byte_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, None if absent, ValueError if unsatisfiable"""
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].split(",")[0].strip()
+    first, _, last = spec.partition("-")
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        length = int(last)
+        if length <= 0:
+            raise ValueError(spec)
+        start, end = max(size - length, 0), size - 1
+    if start >= size or start > end:
+        raise ValueError(spec)
+    return start, end
+
+def iter_file_range(path, start, end):
+    # Sync generator: StreamingResponse runs it in the threadpool, off the event loop
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RECORDING_STREAM_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@app.api_route("/recordings/{filename}", methods=["GET", "HEAD"])
+async def get_recording_file(filename: str, request: Request):
+    """Recording download/playback with HTTP Range support"""
+    path = os.path.join(RECORDINGS_DIR, os.path.basename(filename))
+    if filename != os.path.basename(filename) or not os.path.isfile(path):
+        return Response(status_code=404)
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{size}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Type": RECORDING_MEDIA_TYPES.get(filename.rsplit(".", 1)[-1], "application/octet-stream"),
+    }
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        status_code, start, end = 200, 0, size - 1
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers)
+    return StreamingResponse(iter_file_range(path, start, end), status_code=status_code, headers=headers)
+
+metrics.gauge('connected_clients', "Clients connected to this worker by role",
+              lambda: [({'role': role}, count) for role, count in Counter(u['role'] for u in list(connected_users.values())).items()])
+metrics.gauge('recording_queue_depth', "Frames/chunks waiting for the recording writer", lambda: recording_writer.queue.qsize())
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: handler/emit/DB/translation/summary latency, relay throughput, backlogs, peers"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/recorder")
+async def get_recorder_stats():
+    """Recording writer buffer and segment counters"""
+    return recording_writer.stats()
 
 @app.get("/api/monitor")
-async def get_monitor_stats():
+async def get_monitor_stats(tour: str = DEFAULT_TOUR_ID):
     """API endpoint for monitoring dashboard"""
-    return get_connection_stats()
+    found = existing_tour(tour)
+    return get_connection_stats(found) if found else unknown_tour(tour)
 
-@app.get("/monitor", response_class=HTMLResponse)
-async def monitor_page(request: Request):
-    """Monitoring dashboard page"""
-    with open("static/monitor.html", encoding="utf-8") as f:
-        return f.read()
+@app.get("/api/interim")
+async def get_interim_stats(tour: str = DEFAULT_TOUR_ID):
+    """Interim transcript coalescing counters"""
+    found = existing_tour(tour)
+    return found.interim.stats() if found else unknown_tour(tour)
+
+@app.get("/api/relay")
+async def get_relay_stats(tour: str = DEFAULT_TOUR_ID):
+    """Per-tourist WS audio queue and lag counters"""
+    found = existing_tour(tour)
+    return found.audio_fanout.stats() if found else unknown_tour(tour)
+
+@app.get("/api/forwarding")
+async def get_forwarding_stats(tour: str = DEFAULT_TOUR_ID):
+    """Encode-once WebRTC forwarder of a tour"""
+    found = existing_tour(tour)
+    return found.audio_forwarder.stats() if found else unknown_tour(tour)
+
+@app.get("/api/cluster")
+async def get_cluster_stats():
+    """Worker identity and shared-state traffic (answered by whichever worker got the request)"""
+    return cluster.stats()
+
+@app.get("/api/peers")
+async def get_peer_stats():
+    """WebRTC peer connections and budget"""
+    return peer_registry.stats()
+
+@app.get("/api/sessions")
+async def get_session_stats():
+    return transcript_sessions.stats()
 
-# Ensure recordings directory exists before mounting
-os.makedirs("recordings", exist_ok=True)
+@app.get("/api/static")
+async def get_static_stats():
+    """In-memory static assets: hashed URLs, sizes per encoding, bytes sent"""
+    return static_assets.stats()
 
-# Mount recordings for download
-app.mount("/recordings", StaticFiles(directory="recordings"), name="recordings")
+@app.get("/api/startup")
+async def get_startup_stats():
+    """Startup hook time and which heavy optional modules have been loaded so far"""
+    return {
+        'startup_seconds': startup_timing['seconds'],
+        'webrtc_enabled': WEBRTC_ENABLED,
+        'loaded': {name: name in sys.modules for name in HEAVY_MODULES},
+        'lazy_import_seconds': lazy_import_seconds,
+    }
+
+@app.get("/api/admission")
+async def get_admission_stats():
+    """Join admission queue state"""
+    return join_admission.stats()
+
+@app.get("/api/tours")
+async def list_tours():
+    """Active tours hosted by this server"""
+    return {"tours": [get_monitor_summary(t) for t in list(tours.values())]}
+
+@app.api_route("/monitor", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def monitor_page(request: Request):
+    """Monitoring dashboard page"""
+    return static_assets.response(request, static_assets.assets["monitor.html"])
 
 @app.post("/shutdown")
 async def shutdown_server():
     logger.info("Shutdown requested")
+    persistence_writer.stop()  # SIGKILL below skips the lifespan shutdown
+    recording_writer.stop()
     os.kill(os.getpid(), 9) # Force kill for immediate effect on Windows
     return {"status": "shutting_down"}
 
 @app.post("/restart")
 async def restart_server():
     logger.info("Restart requested")
+    persistence_writer.stop()  # execv below skips the lifespan shutdown
+    recording_writer.stop()
     import sys
     # This replaces the current process with a new one
     python_exe = sys.executable or "python"
@@ -772,9 +4527,29 @@ def generate_self_signed_cert(cert_file="cert.pem", key_file="key.pem"):
         print(f"❌ Error generating SSL cert: {e}")
         sys.exit(1)
 
+def start_local_broker(port=6390):
+    """Run local_broker.py next to the workers when no CLIENT_MANAGER_URL was given"""
+    import socket
+    import subprocess
+    import sys
+    broker = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_broker.py"),
+                               "--port", str(port)])
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return broker, f"redis://127.0.0.1:{port}/0"
+
 if __name__ == "__main__":
     import uvicorn
     import socket
+
+    parser = argparse.ArgumentParser(description="Mobile Guide Server")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WORKERS", "1")),
+                        help="worker processes sharing port 5000 (needs CLIENT_MANAGER_URL or starts local_broker.py)")
+    args = parser.parse_args()
     
     # Generate SSL certs for HTTPS
     generate_self_signed_cert()
@@ -825,10 +4600,29 @@ if __name__ == "__main__":
         print(f"⚠️  Could not generate QR code: {e}")
 
     # Run with SSL
-    uvicorn.run(
-        sio_app, 
-        host="0.0.0.0", 
-        port=5000,
-        ssl_keyfile="key.pem",
-        ssl_certfile="cert.pem"
-    )
+    if args.workers > 1:
+        broker = None
+        if not CLIENT_MANAGER_URL:
+            broker, os.environ["CLIENT_MANAGER_URL"] = start_local_broker()
+            print(f"🔗 Local broker started for {args.workers} workers: {os.environ['CLIENT_MANAGER_URL']}")
+        try:
+            # Workers import the app themselves and pick CLIENT_MANAGER_URL up from the environment
+            uvicorn.run(
+                "server:sio_app",
+                host="0.0.0.0",
+                port=5000,
+                workers=args.workers,
+                ssl_keyfile="key.pem",
+                ssl_certfile="cert.pem"
+            )
+        finally:
+            if broker is not None:
+                broker.terminate()
+    else:
+        uvicorn.run(
+            sio_app, 
+            host="0.0.0.0", 
+            port=5000,
+            ssl_keyfile="key.pem",
+            ssl_certfile="cert.pem"
+        )
@@ -1,4 +1,7 @@
-const socket = io();
+// Websocket first: multi-worker servers (CLIENT_MANAGER_URL) accept no long-polling
+const socket = io({ transports: ['websocket', 'polling'] });
+// Tour group this page belongs to (?tour=<id>), one server can host several tours
+const tourId = new URLSearchParams(window.location.search).get('tour') || 'default';
 let role = null;
 let pc = null;
 let localStream = null;
@@ -10,6 +13,8 @@ let recognition = null;
 // Manual audio control state (prevent auto-reconnect loops)
 // Tourist audio is always active once role is selected
 let touristAudioActive = false;
+// Set when the server has no WebRTC capacity left for us; audio then comes over the WebSocket path
+let webrtcUnavailable = false;
 
 // Offline Mode: For local/intranet environments without internet
 // In offline mode, STT/translation is disabled, only audio streaming works
@@ -970,7 +975,11 @@ function setupFallbackRecorder(stream) {
                 // Log only occasionally to avoid spam, but log first few
                 if (txBytes === 0) log("Recorder produced first data: " + e.data.size + " bytes");
 
-                if (socket.connected) {
+                if (audioSocket && audioSocket.readyState === WebSocket.OPEN) {
+                    audioSocket.send(e.data);
+                    txBytes += e.data.size;
+                    updateCounters();
+                } else if (socket.connected) {
                     socket.emit('binary_audio', e.data);
                     txBytes += e.data.size;
                     updateCounters();
@@ -1150,8 +1159,10 @@ document.addEventListener('DOMContentLoaded', () => {
         };
     }
 });
-// Guide status handler - unified handler at line ~1065
-socket.on('guide_status', (data) => {
+// Guide status handler - state changes arrive as 'guide_status', the initial state in the join_room ack
+socket.on('guide_status', handleGuideStatus);
+
+function handleGuideStatus(data) {
     log("Guide Status Update: " + JSON.stringify(data));
     const statusEl = document.getElementById('tourist-status');
     if (!statusEl) return;
@@ -1177,7 +1188,7 @@ socket.on('guide_status', (data) => {
         statusEl.style.color = "#dc3545";
         statusEl.style.fontWeight = "normal";
     }
-});
+}
 
 socket.on('guide_ready', () => {
     log("Guide Ready (WebRTC Track Active)");
@@ -1196,11 +1207,12 @@ socket.on('connect', () => {
     els.touristStatus.textContent = "Connected to Server";
     els.guideStatus.style.color = ""; // Reset color
     document.body.style.borderTop = "5px solid #28a745"; // Visual connection indicator
+    webrtcUnavailable = false; // Fresh connection, the server may have capacity again
     if (role) {
         // Re-join if we were already there (Reconnect logic)
         const langSel = document.getElementById('lang-select');
         const lang = langSel ? langSel.value : 'en';
-        socket.emit('join_room', { role: role, language: lang });
+        socket.emit('join_room', { role: role, language: lang, tour: tourId }, onJoinAck);
     }
 });
 
@@ -1219,6 +1231,7 @@ socket.on('disconnect', () => {
 
 // Correction for Tourist Logic:
 async function startTouristReceiver() {
+    if (webrtcUnavailable) return;
     createPeerConnection();
     // Add Transceiver to receive Audio only
     pc.addTransceiver('audio', { direction: 'recvonly' });
@@ -1264,10 +1277,15 @@ window.selectRole = function (r) {
         els.touristStatus.textContent = "Connected. Listening...";
         els.touristStatus.style.color = "#28a745";
 
-        // Ensure we try to connect if guide is already live
-        socket.emit('request_guide_status');
+        // Current guide state (and audio catch-up if live) comes back in the join_room ack
     }
-    socket.emit('join_room', { role: role, language: lang });
+    socket.emit('join_room', { role: role, language: lang, tour: tourId }, onJoinAck);
+}
+
+// join_room acknowledgement carries the current guide state
+function onJoinAck(ack) {
+    if (ack && ack.guide_status && role === 'tourist') handleGuideStatus(ack.guide_status);
+    if (ack && ack.status === 'ok') openAudioSocket();
 }
 
 // Handle language change for tourists
@@ -1536,6 +1554,16 @@ socket.on('audio_init', (data) => {
     log("Audio Init received (Ignored)");
 });
 
+// Late join / reconnect: init segment + the most recent decodable cluster in one message
+socket.on('audio_catchup', (data) => {
+    if (!touristAudioActive || !data || !data.chunks || data.chunks.length === 0) return;
+    const blob = new Blob(data.chunks, { type: 'audio/webm;codecs=opus' });
+    rxBytes += blob.size;
+    updateCounters();
+    log("[Audio] Catch-up received: " + data.chunks.length + " chunks, " + blob.size + " bytes");
+    appendToStream(blob);
+});
+
 socket.on('audio_chunk', (data) => {
     if (!touristAudioActive) return;
     rxBytes += data.byteLength || data.size || 0;
@@ -1545,6 +1573,125 @@ socket.on('audio_chunk', (data) => {
     appendToStream(data);
 });
 
+// Raw audio socket (/ws/audio): chunks arrive as binary messages with a 13-byte header
+// (flags u8, seq u32, server time ms u64) instead of socket.io events; the guide sends on it too.
+// audio_chunk / binary_audio above remain the fallback while it is not open.
+const AUDIO_HEADER_BYTES = 13;
+const AUDIO_FLAG_INIT = 0x02;
+const AUDIO_FLAG_CATCHUP = 0x04;
+const AUDIO_SOCKET_DEMOTED = 4001;
+let audioSocket = null;
+let audioSocketSid = null;
+let audioSocketRetry = null;
+let lastAudioSeq = null;
+
+function openAudioSocket() {
+    if (!socket.id || (role !== 'tourist' && role !== 'guide')) return;
+    if (audioSocket && audioSocketSid === socket.id && audioSocket.readyState <= WebSocket.OPEN) return;
+    if (audioSocket) audioSocket.close();
+    clearTimeout(audioSocketRetry);
+
+    const proto = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const ws = new WebSocket(`${proto}//${location.host}/ws/audio?sid=${encodeURIComponent(socket.id)}`);
+    ws.binaryType = 'arraybuffer';
+    audioSocket = ws;
+    audioSocketSid = socket.id;
+    lastAudioSeq = null;
+
+    ws.onopen = () => {
+        log("[Audio] Raw audio socket open");
+        if (role === 'tourist') socket.emit('audio_transport', { mode: 'raw' });
+    };
+    ws.onmessage = (e) => handleAudioFrame(e.data);
+    ws.onclose = (e) => {
+        if (audioSocket !== ws) return;
+        audioSocket = null;
+        if (e.code === AUDIO_SOCKET_DEMOTED) return; // audio_demoted retries later
+        log("[Audio] Raw audio socket closed (" + e.code + "), using socket.io audio");
+        if (role === 'tourist' && socket.connected) socket.emit('audio_transport', { mode: 'socketio' });
+        if (socket.connected) audioSocketRetry = setTimeout(openAudioSocket, 3000);
+    };
+}
+
+function handleAudioFrame(buffer) {
+    if (role !== 'tourist' || !touristAudioActive || buffer.byteLength <= AUDIO_HEADER_BYTES) return;
+    const view = new DataView(buffer);
+    const flags = view.getUint8(0);
+    const seq = view.getUint32(1);
+    if (lastAudioSeq !== null && !(flags & (AUDIO_FLAG_INIT | AUDIO_FLAG_CATCHUP)) && seq !== ((lastAudioSeq + 1) >>> 0)) {
+        log("[Audio] " + (((seq - lastAudioSeq - 1) >>> 0)) + " chunks skipped by the server");
+    }
+    lastAudioSeq = seq;
+    rxBytes += buffer.byteLength;
+    updateCounters();
+    if (flags & AUDIO_FLAG_CATCHUP) log("[Audio] Catch-up received: " + (buffer.byteLength - AUDIO_HEADER_BYTES) + " bytes");
+    appendToStream(buffer.slice(AUDIO_HEADER_BYTES));
+}
+
+
+// Server took us off the WS audio path because our connection could not keep up.
+// Transcripts keep flowing; try live audio again after a pause.
+socket.on('audio_demoted', (data) => {
+    log("[Audio] Demoted by server: " + (data && data.reason));
+    if (els.touristStatus) {
+        els.touristStatus.textContent = "⚠️ Weak connection - showing text, retrying audio soon...";
+        els.touristStatus.style.color = "#ff9800";
+    }
+    setTimeout(() => {
+        if (role === 'tourist' && touristAudioActive) {
+            socket.emit('resume_audio');
+            socket.emit('request_audio_init');
+            openAudioSocket();
+        }
+    }, 20000);
+});
+
+
+// Close our peer connections and stay on the WebSocket audio relay until the next reconnect
+function fallBackToWebSocketAudio() {
+    webrtcUnavailable = true;
+    if (pc) {
+        pc.close();
+        pc = null;
+    }
+    webRTCStreamer.cleanupConnection();
+    if (webrtcAudioElement) {
+        webrtcAudioElement.remove();
+        webrtcAudioElement = null;
+    }
+    if (role === 'guide') {
+        // Send the microphone over WebSocket instead
+        if (isBroadcasting && localStream && !(window.mediaRecorder && window.mediaRecorder.state === 'recording')) {
+            setupFallbackRecorder(localStream);
+            els.guideStatus.textContent = "Broadcasting (WebSocket audio)...";
+        }
+    }
+}
+
+// Server is at its WebRTC peer connection budget: drop our offer and keep
+// listening on the WebSocket audio relay instead.
+socket.on('webrtc_unavailable', (data) => {
+    log("[WebRTC] Unavailable: " + (data && data.reason) + ", falling back to " + (data && data.fallback));
+    fallBackToWebSocketAudio();
+    if (role === 'guide') return;
+    if (els.touristStatus) {
+        els.touristStatus.textContent = data && data.reason === 'disabled'
+            ? "🔊 Using WebSocket audio"
+            : "🔊 Many listeners - using WebSocket audio";
+    }
+});
+
+// Server closed our peer connection (stalled, failed or idle): the stream is dead, so
+// switch to the WebSocket audio relay and pick it up at its latest decodable point.
+socket.on('webrtc_closed', (data) => {
+    log("[WebRTC] Closed by server: " + (data && data.reason) + ", falling back to " + (data && data.fallback));
+    fallBackToWebSocketAudio();
+    if (role === 'tourist' && touristAudioActive) {
+        socket.emit('request_audio_init');
+        if (els.touristStatus) els.touristStatus.textContent = "🔊 Using WebSocket audio";
+    }
+});
+
 
 // --- Smart Signaling: Handle Late Join / Guide Restart ---
 // --- Smart Signaling: Handle Late Join / Guide Restart ---
@@ -1665,6 +1812,10 @@ class WebRTCAudioStreamer {
     }
 
     async startTouristSession() {
+        if (webrtcUnavailable) {
+            log("[WebRTCAudioStreamer] WebRTC unavailable, staying on WebSocket audio");
+            return;
+        }
         // Ensure AudioContext is ready
         initAudioContext();
         if (audioCtx.state === 'suspended') await audioCtx.resume();
@@ -1749,7 +1900,44 @@ async function translateClientSide(text, targetLang) {
 }
 
 // Transcript Receiver - Works for both Guide and Tourist
-socket.on('transcript', async (data) => {
+socket.on('transcript', (data) => {
+    // Finals arrive in full and close the interim utterance they belong to
+    if (data.isFinal && data.utterance === interimUtterance) interimUtterance = null;
+    handleTranscript(data);
+});
+
+// Server-side translations follow their final as {utterance, translations: {lang: text}}; an empty
+// dict means the server could not translate it, so the tourist translates the original itself
+socket.on('transcript_translation', async (data) => {
+    if (role !== 'tourist') return;
+    const box = document.getElementById('transcript-box');
+    const bubble = box && box.querySelector(`.message-bubble[data-utterance="${data.utterance}"]`);
+    if (!bubble) return;
+    delete bubble.dataset.utterance;
+    const langSelect = document.getElementById('lang-select');
+    const langInfo = langSelect ? langSelect.value : 'original';
+    const text = (data.translations && data.translations[langInfo]) || await translateClientSide(bubble.dataset.original, langInfo);
+    bubble.querySelector('.message-content').innerHTML = text;
+    if (ttsEnabled) speakTranscript(text, langInfo);
+});
+
+// Interim hypotheses arrive throttled, as deltas against the previous one of the same utterance:
+// {u: utterance id, p: length of the previous text to keep, s: new suffix, l: source language}
+let interimUtterance = null;
+let interimText = '';
+
+socket.on('transcript_delta', (delta) => {
+    if (delta.u !== interimUtterance) {
+        if (delta.p > 0) return; // joined mid-utterance: wait for the next full resend
+        interimUtterance = delta.u;
+        interimText = '';
+    }
+    if (delta.p > interimText.length) return;
+    interimText = interimText.slice(0, delta.p) + delta.s;
+    handleTranscript({ original: interimText, source_lang: delta.l, translations: {}, isFinal: false });
+});
+
+async function handleTranscript(data) {
     // log("[Android Debug] Transcript received: " + JSON.stringify(data).substring(0, 200));
 
     // IMPORTANT: If we receive transcript, guide MUST be online and broadcasting
@@ -1768,12 +1956,16 @@ socket.on('transcript', async (data) => {
     const ttsBtn = document.getElementById('tts-btn');
 
     let displayText = data.original;
+    let translationToFollow = false;
 
     // CLIENT-SIDE TRANSLATION LOGIC
     if (role === 'tourist' && langInfo !== 'original' && langInfo !== 'ko') {
         // If server sent translation (cached?), use it. Otherwise fetch.
         if (data.translations && data.translations[langInfo]) {
             displayText = data.translations[langInfo];
+        } else if (data.isFinal && (data.translating || []).includes(langInfo)) {
+            // Show the original now; transcript_translation replaces it
+            translationToFollow = true;
         } else {
             // Only translate FINAL results to save API calls and reduce flickering
             if (data.isFinal) {
@@ -1805,26 +1997,33 @@ socket.on('transcript', async (data) => {
 
         box.appendChild(bubble);
         box.scrollTop = box.scrollHeight;
+        return bubble;
     };
 
     if (role === 'tourist' && touristBox) {
-        updateBox(touristBox, displayText, data.isFinal);
-
-        if (data.isFinal && ttsEnabled) {
-            const utterance = new SpeechSynthesisUtterance(displayText);
-            // ... (language logic)
-            if (langInfo === 'en') utterance.lang = 'en-US';
-            else if (langInfo === 'ja') utterance.lang = 'ja-JP';
-            else if (langInfo === 'zh-CN') utterance.lang = 'zh-CN';
-            else utterance.lang = 'ko-KR';
-            window.speechSynthesis.speak(utterance);
+        const bubble = updateBox(touristBox, displayText, data.isFinal);
+
+        if (translationToFollow) {
+            bubble.dataset.utterance = data.utterance;
+            bubble.dataset.original = data.original;
+        } else if (data.isFinal && ttsEnabled) {
+            speakTranscript(displayText, langInfo);
         }
     }
 
     if (role === 'guide' && guideBox) {
         updateBox(guideBox, data.original, data.isFinal);
     }
-});
+}
+
+function speakTranscript(text, langInfo) {
+    const utterance = new SpeechSynthesisUtterance(text);
+    if (langInfo === 'en') utterance.lang = 'en-US';
+    else if (langInfo === 'ja') utterance.lang = 'ja-JP';
+    else if (langInfo === 'zh-CN') utterance.lang = 'zh-CN';
+    else utterance.lang = 'ko-KR';
+    window.speechSynthesis.speak(utterance);
+}
 
 // TTS Toggle (Moved to DOMContentLoaded above)
 // const ttsBtn = document.getElementById('tts-btn'); ... REMOVED
@@ -1945,6 +2144,7 @@ window.uploadExcel = async function () {
 
     const formData = new FormData();
     formData.append('file', fileInput.files[0]);
+    formData.append('sid', socket.id); // server reports import_progress to this socket
 
     status.textContent = "Uploading...";
     status.style.color = "yellow";
@@ -1983,6 +2183,14 @@ window.uploadExcel = async function () {
     }
 };
 
+// Bulk import progress (large place spreadsheets)
+socket.on('import_progress', (data) => {
+    const status = document.getElementById('admin-status');
+    if (!status || data.done) return;
+    status.textContent = `Importing... ${data.imported} rows` + (data.rejected ? ` (${data.rejected} rejected)` : '');
+    status.style.color = "yellow";
+});
+
 window.loadPlaces = async function () {
     try {
         const res = await fetch('/places');
@@ -2050,7 +2258,7 @@ window.broadcastPlaceInfo = function (place) {
 // History Functions
 window.loadHistory = async function () {
     try {
-        const res = await fetch('/history');
+        const res = await fetch('/history?tour=' + encodeURIComponent(tourId));
         const data = await res.json();
         const container = document.getElementById('history-list');
         if (!container) return;
@@ -2082,7 +2290,7 @@ window.loadHistory = async function () {
 
 window.downloadHistory = async function () {
     try {
-        const res = await fetch('/history');
+        const res = await fetch('/history?tour=' + encodeURIComponent(tourId));
         const data = await res.json();
 
         if (!data.history || data.history.length === 0) {
@@ -2124,14 +2332,17 @@ window.loadRecordings = async function () {
 
         container.innerHTML = "";
 
-        if (data.files && data.files.length > 0) {
-            data.files.forEach(file => {
+        if (data.recordings && data.recordings.length > 0) {
+            data.recordings.forEach(rec => {
                 const div = document.createElement('div');
-                div.style.cssText = "border-bottom: 1px solid #444; padding: 5px; margin-bottom: 5px; display: flex; justify-content: space-between; align-items: center;";
+                div.style.cssText = "border-bottom: 1px solid #444; padding: 5px; margin-bottom: 5px; display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap;";
 
+                const duration = rec.duration_seconds ? ` · ${Math.round(rec.duration_seconds)}s` : (rec.status === 'recording' ? ' · recording' : '');
+                // preload="none": the server answers Range requests, so playback and seeking fetch only what is needed
                 div.innerHTML = `
-                    <span style="color: #ddd; font-size: 0.8rem;">${file}</span>
-                    <a href="/recordings/${file}" download style="background: #28a745; color: white; text-decoration: none; padding: 2px 8px; border-radius: 4px; font-size: 0.8rem;">Download</a>
+                    <span style="color: #ddd; font-size: 0.8rem;">${rec.filename}${duration}</span>
+                    <a href="${rec.url}" download style="background: #28a745; color: white; text-decoration: none; padding: 2px 8px; border-radius: 4px; font-size: 0.8rem;">Download</a>
+                    <audio controls preload="none" src="${rec.url}" style="width: 100%; height: 32px; margin-top: 4px;"></audio>
                 `;
                 container.appendChild(div);
             });
@@ -2149,8 +2360,15 @@ window.summarizeSession = async function () {
     if (status) status.textContent = "Generating AI summary...";
 
     try {
-        const res = await fetch('/summarize', { method: 'POST' });
-        const data = await res.json();
+        // Summarization runs as a background job on the server: start it, then poll
+        const res = await fetch('/summarize?tour=' + encodeURIComponent(tourId), { method: 'POST' });
+        let data = await res.json();
+
+        while (data.status === 'accepted' || data.status === 'pending' || data.status === 'running') {
+            await new Promise(r => setTimeout(r, 1500));
+            const poll = await fetch('/summarize/' + (data.job_id));
+            data = await poll.json();
+        }
 
         if (data.status === 'success') {
             const summaryText = data.summary;
@@ -2168,14 +2386,14 @@ window.summarizeSession = async function () {
 
 window.downloadTranscript = async function () {
     try {
-        window.location.href = '/download_transcript';
+        window.location.href = '/download_transcript?tour=' + encodeURIComponent(tourId);
     } catch (e) {
         alert("Download error: " + e);
     }
 }
 
 window.clearSession = async function () {
-    if (!confirm("Are you sure you want to clear all session transcripts? This cannot be undone.")) {
+    if (!confirm("End the current session? Its transcripts are kept as a past session and new transcripts start a new one.")) {
         return;
     }
 
@@ -2183,11 +2401,11 @@ window.clearSession = async function () {
     if (status) status.textContent = "Clearing session...";
 
     try {
-        const res = await fetch('/clear_session', { method: 'POST' });
+        const res = await fetch('/clear_session?tour=' + encodeURIComponent(tourId), { method: 'POST' });
         const data = await res.json();
 
         if (data.status === 'success') {
-            alert("Session cleared successfully!");
+            alert("Session closed. New transcripts start a new session.");
             if (status) status.textContent = "Session cleared";
             loadHistory();
         } else {
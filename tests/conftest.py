@@ -0,0 +1,46 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+# python -m pytest tests  (pytest on top of requirements.txt)
+
+# server.py lives at the repository root and is imported as a module
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline and without WebRTC; server.py reads these at import
+os.environ.setdefault("WEBRTC_ENABLED", "0")
+os.environ.setdefault("TRANSLATOR_BACKEND", "stub")
+os.environ.setdefault("SUMMARY_BACKEND", "stub")
+
+
+@pytest.fixture(scope="session")
+def live_server(tmp_path_factory):
+    """server.py on a free local port. It runs in a temp directory, so places.db, recordings and
+    session archives are created there; static/ is linked from the repository."""
+    import uvicorn
+
+    import server
+
+    workdir = tmp_path_factory.mktemp("server")
+    os.symlink(os.path.join(ROOT, "static"), workdir / "static")
+    previous = os.getcwd()
+    os.chdir(workdir)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    uv = uvicorn.Server(uvicorn.Config(server.sio_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=uv.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not uv.started:
+        assert thread.is_alive() and time.monotonic() < deadline, "server did not start"
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    uv.should_exit = True
+    thread.join(10)
+    os.chdir(previous)
@@ -0,0 +1,44 @@
+import asyncio
+
+import server
+
+
+def tourist(language='en'):
+    return {'role': 'tourist', 'language': language, 'connected_at': '2026-01-01T00:00:00'}
+
+
+def flush(tour, monkeypatch):
+    monkeypatch.setattr(server, 'MONITOR_UPDATE_INTERVAL', 0)
+    asyncio.run(server.flush_monitor_update(tour))
+
+
+def test_diff_reports_joined_changed_and_left():
+    tour = server.Tour('monitor-diff')
+    tour.add_user('tourist-a-sid', tourist())
+    diff = server.get_monitor_diff(tour)
+    assert [t['sid'] for t in diff['joined']] == ['tourist-']
+    assert diff['total_tourists'] == 1 and diff['tourists_by_language'] == {'en': 1}
+
+    tour.set_language('tourist-a-sid', 'ja')
+    diff = server.get_monitor_diff(tour)
+    assert diff['joined'] == [] and diff['changed'][0]['language'] == 'ja'
+
+    tour.remove_user('tourist-a-sid')
+    diff = server.get_monitor_diff(tour)
+    assert diff['left'] == ['tourist-'] and diff['total_tourists'] == 0
+    assert server.get_monitor_diff(tour)['left'] == []
+
+
+def test_left_reported_for_tourist_present_before_the_monitor(monkeypatch):
+    tour = server.Tour('monitor-late')
+    tour.add_user('tourist-b-sid', tourist())
+    flush(tour, monkeypatch)  # push with no monitor connected
+
+    tour.add_user('monitor-sid', {'role': 'monitor', 'language': 'en', 'connected_at': '2026-01-01T00:00:00'})
+    snapshot = server.get_connection_stats(tour)
+    assert [t['sid'] for t in snapshot['tourist_list']] == ['tourist-']
+
+    tour.remove_user('tourist-b-sid')
+    diff = server.get_monitor_diff(tour)
+    assert diff['left'] == ['tourist-']
+    assert diff['total_tourists'] == 0
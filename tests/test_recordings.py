@@ -0,0 +1,62 @@
+import struct
+import wave
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-0, 500-600", (0, 0)),
+])
+def test_parse_byte_range(header, expected):
+    assert server.parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-400", "bytes=-0", "bytes=abc-"])
+def test_unsatisfiable_byte_range(header):
+    with pytest.raises(ValueError):
+        server.parse_byte_range(header, 1000)
+
+
+def test_wav_duration(tmp_path):
+    path = str(tmp_path / "guide_1.wav")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\0\0" * 16000 * 3)
+    assert server.recording_duration(path) == 3.0
+
+
+def ogg_page(granule, payload):
+    return b"OggS\x00\x00" + struct.pack("<q", granule) + bytes(12) + b"\x01" + bytes([len(payload)]) + payload
+
+
+def test_ogg_opus_duration_subtracts_pre_skip(tmp_path):
+    head = b"OpusHead\x01\x01" + struct.pack("<H", 312) + bytes(7)
+    path = tmp_path / "guide_a_20260101_120000_1.ogg"
+    path.write_bytes(ogg_page(0, head) + ogg_page(0, b"OpusTags") + ogg_page(48000 * 5 + 312, b"\0" * 10))
+    assert server.recording_duration(str(path)) == 5.0
+
+
+def test_webm_duration_from_segment_info(tmp_path):
+    path = tmp_path / "recorder_a_20260101_120000_2.webm"
+    path.write_bytes(server.WEBM_EBML_ID + bytes(20) + b"\x2a\xd7\xb1\x83\x0f\x42\x40"
+                     + b"\x44\x89\x88" + struct.pack(">d", 4090.0))
+    assert server.recording_duration(str(path)) == pytest.approx(4.09)
+
+
+def test_unknown_duration(tmp_path):
+    path = tmp_path / "recorder_a_20260101_120000_3.webm"
+    path.write_bytes(server.WEBM_EBML_ID + bytes(64))  # MediaRecorder streams carry no Duration
+    assert server.recording_duration(str(path)) is None
+    assert server.recording_duration(str(tmp_path / "missing.ogg")) is None
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+import server
+
+
+def test_fts_query_prefix_matches_every_word():
+    assert server.fts_query("경복궁 palace") == '"경복궁"* "palace"*'
+
+
+def test_fts_query_drops_operators_and_punctuation():
+    assert server.fts_query('"AND OR NEAR( *') == '"AND"* "OR"* "NEAR"*'
+    assert server.fts_query("  ") == ""
+
+
+def test_fts_query_single_characters_match_whole_tokens():
+    assert server.fts_query("a 궁") == '"a" "궁"'
+
+
+def test_fts_query_caps_the_number_of_terms():
+    assert server.fts_query(" ".join(f"w{i}" for i in range(40))).count('"*') == server.SEARCH_TERMS_MAX
+
+
+def test_marked_snippet_escapes_html():
+    assert server.marked_snippet("<b>\x02경복궁\x03</b>") == "&lt;b&gt;<mark>경복궁</mark>&lt;/b&gt;"
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DB_PATH", str(tmp_path / "places.db"))
+    monkeypatch.setattr(server, "SESSION_ARCHIVE_DIR", str(tmp_path / "session_archive"))
+    server.init_db()
+    server.init_search_index()
+    if not server.search_enabled:
+        pytest.skip("SQLite without FTS5")
+    return server.DB_PATH
+
+
+def add_session(path, tour, texts):
+    conn = sqlite3.connect(path)
+    session = conn.execute("INSERT INTO sessions (tour_id, started_at, ended_at) VALUES (?, ?, ?)",
+                           (tour, "2026-01-01 10:00:00", "2026-01-01 11:00:00")).lastrowid
+    conn.executemany("INSERT INTO transcripts (text, translations, tour_id, session_id) VALUES (?, ?, ?, ?)",
+                     [(text, '{"en": "palace tour"}', tour, session) for text in texts])
+    conn.commit()
+    conn.close()
+    return session
+
+
+def test_search_filters_by_tour_and_session(database):
+    first = add_session(database, "a", ["경복궁을 방문합니다", "남산타워입니다"])
+    add_session(database, "b", ["경복궁은 1395년에 지어졌습니다"])
+    found = server.run_search(server.fts_query("경복궁"), "transcript", 10, 0, None, None, None, None)["results"]
+    assert {r["tour_id"] for r in found} == {"a", "b"}
+    found = server.run_search(server.fts_query("경복궁"), "transcript", 10, 0, None, None, "a", None)["results"]
+    assert [r["text"] for r in found] == ["경복궁을 방문합니다"]
+    found = server.run_search(server.fts_query("palace"), "all", 10, 0, None, None, None, first)["results"]
+    assert len(found) == 2 and all(r["session_id"] == first for r in found)
+
+
+def test_archived_sessions_stay_searchable(database):
+    session = add_session(database, "a", ["경복궁을 방문합니다"])
+    assert server.archive_session(session)[0] == 1
+    found = server.run_search(server.fts_query("경복궁"), "transcript", 10, 0, None, None, "a", session)["results"]
+    assert len(found) == 1
+    assert found[0]["archived"] and found[0]["translations"] == {"en": "palace tour"}
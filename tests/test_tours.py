@@ -0,0 +1,86 @@
+import asyncio
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import socketio
+
+import server
+
+TIMEOUT = 5
+
+
+def get_json(url, path, **params):
+    with urllib.request.urlopen(f"{url}{path}?{urllib.parse.urlencode(params)}", timeout=TIMEOUT) as response:
+        return json.loads(response.read())
+
+
+class Client:
+    """socket.io client that records every event it receives"""
+
+    def __init__(self):
+        self.sio = socketio.AsyncClient()
+        self.events = []
+        self.sio.on('*', lambda event, data=None: self.events.append((event, data)))
+
+    def received(self, event):
+        return [data for name, data in self.events if name == event]
+
+    async def join(self, url, **data):
+        await self.sio.connect(url, transports=['websocket'])
+        return await self.sio.call('join_room', data, timeout=TIMEOUT)
+
+    async def wait_for(self, event):
+        for _ in range(TIMEOUT * 20):
+            if self.received(event):
+                return self.received(event)
+            await asyncio.sleep(0.05)
+        raise AssertionError(f"no {event} event")
+
+
+async def check_isolation(url):
+    guide, tourist_a, tourist_b, monitor_b = Client(), Client(), Client(), Client()
+    try:
+        await guide.join(url, role='guide', tour='iso-a')
+        await tourist_a.join(url, role='tourist', tour='iso-a', language='en')
+        await tourist_b.join(url, role='tourist', tour='iso-b', language='en')
+        await monitor_b.join(url, role='monitor', tour='iso-b')
+
+        snapshot = (await monitor_b.wait_for('monitor_update'))[0]
+        assert snapshot['tour'] == 'iso-b' and snapshot['total_tourists'] == 1
+
+        await guide.sio.emit('transcript_msg', {'text': '경복궁에 오신 것을 환영합니다', 'isFinal': True, 'source_lang': 'ko'})
+        await guide.sio.emit('binary_audio', server.WEBM_EBML_ID + bytes(32))
+        transcript = (await tourist_a.wait_for('transcript'))[0]
+        assert transcript['original'] == '경복궁에 오신 것을 환영합니다'
+        await tourist_a.wait_for('audio_chunk')
+        await asyncio.sleep(0.5)
+        assert tourist_b.received('transcript') == [] and tourist_b.received('audio_chunk') == []
+        assert all(update['tour'] == 'iso-b' for update in monitor_b.received('monitor_update'))
+
+        history_a, history_b, stats_b = await asyncio.gather(
+            asyncio.to_thread(get_json, url, '/history', tour='iso-a'),
+            asyncio.to_thread(get_json, url, '/history', tour='iso-b'),
+            asyncio.to_thread(get_json, url, '/api/monitor', tour='iso-b'),
+        )
+        assert [row['text'] for row in history_a['history']] == ['경복궁에 오신 것을 환영합니다']
+        assert history_b['history'] == []
+        assert stats_b['total_tourists'] == 1 and not stats_b['guide_online']
+    finally:
+        for client in (guide, tourist_a, tourist_b, monitor_b):
+            await client.sio.disconnect()
+
+
+def test_tours_are_isolated(live_server):
+    asyncio.run(check_isolation(live_server))
+
+
+def test_read_only_endpoints_do_not_create_tours(live_server):
+    before = set(server.tours)
+    for path in ('/api/monitor', '/api/interim', '/history'):
+        try:
+            get_json(live_server, path, tour='never-joined')
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    assert set(server.tours) == before
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def deltas(monkeypatch):
+    sent = []
+
+    async def capture(event, data, room, **kwargs):
+        sent.append(data)
+
+    monkeypatch.setattr(server, 'emit_to_tourists', capture)
+    return sent
+
+
+def push(interim, text, source_lang='ko'):
+    interim.pending = (text, source_lang)
+    asyncio.run(interim.flush())
+
+
+def apply(text, delta):
+    """What app.js does: keep the first p UTF-16 units, append s"""
+    units = text.encode('utf-16-le')[:delta['p'] * 2].decode('utf-16-le')
+    return units + delta['s']
+
+
+def test_common_prefix_length():
+    assert server.common_prefix_length('경복궁은', '경복궁을') == 3
+    assert server.common_prefix_length('', 'abc') == 0
+    assert server.common_prefix_length('abc', 'abc') == 3
+
+
+def test_utf16_length_counts_like_javascript():
+    assert server.utf16_length('abc') == 3
+    assert server.utf16_length('경복궁') == 3
+    assert server.utf16_length('😀') == 2
+
+
+def test_interim_deltas_rebuild_the_text(deltas, monkeypatch):
+    monkeypatch.setattr(server, 'INTERIM_FULL_EVERY', 100)
+    interim = server.InterimTranscripts(server.Tour('interim'))
+    texts = ['오늘 우리는', '오늘 우리는 경복궁을', '오늘 우리는 경복궁에 😀', '오늘 우리는 경복궁에 😀 갑니다']
+    shown = ''
+    for text in texts:
+        push(interim, text)
+        shown = apply(shown, deltas[-1])
+        assert shown == text
+    assert deltas[0]['p'] == 0 and deltas[0]['u'] == 1
+    assert deltas[1] == {'u': 1, 'p': 6, 's': ' 경복궁을', 'l': 'ko'}
+
+
+def test_interim_unchanged_text_is_not_sent(deltas):
+    interim = server.InterimTranscripts(server.Tour('interim-repeat'))
+    push(interim, '안녕하세요')
+    push(interim, '안녕하세요')
+    assert len(deltas) == 1
+
+
+def test_interim_resends_in_full_every_nth_push(deltas, monkeypatch):
+    monkeypatch.setattr(server, 'INTERIM_FULL_EVERY', 2)
+    interim = server.InterimTranscripts(server.Tour('interim-full'))
+    for text in ('가', '가나', '가나다'):
+        push(interim, text)
+    assert [d['p'] for d in deltas] == [0, 1, 0]
+    assert deltas[2]['s'] == '가나다'
+
+
+def test_final_starts_a_new_utterance(deltas):
+    interim = server.InterimTranscripts(server.Tour('interim-final'))
+    push(interim, '첫 문장')
+    assert interim.finish_utterance() == 1
+    push(interim, '첫 문장 다음')
+    assert deltas[-1] == {'u': 2, 'p': 0, 's': '첫 문장 다음', 'l': 'ko'}
@@ -0,0 +1,47 @@
+import pytest
+
+import server
+
+PLACES = "name,description\n경복궁,조선의 법궁\n남산타워,서울의 전망대\n"
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_detects_utf8_with_and_without_bom(tmp_path):
+    assert server.detect_csv_encoding(write(tmp_path, "bom.csv", PLACES.encode("utf-8-sig"))) == "utf-8-sig"
+    assert server.detect_csv_encoding(write(tmp_path, "plain.csv", PLACES.encode("utf-8"))) == "utf-8-sig"
+
+
+def test_detects_cp949(tmp_path):
+    assert server.detect_csv_encoding(write(tmp_path, "excel.csv", PLACES.encode("cp949"))) == "cp949"
+
+
+def test_multibyte_character_split_across_chunks(tmp_path):
+    path = write(tmp_path, "split.csv", ("가" * 1000).encode("utf-8"))
+    assert server.detect_csv_encoding(path, chunk_size=7) == "utf-8-sig"
+
+
+def test_rejects_binary(tmp_path):
+    with pytest.raises(ValueError):
+        server.detect_csv_encoding(write(tmp_path, "image.csv", bytes(range(256)) * 4))
+
+
+def test_upload_rows_decode_cp949(tmp_path):
+    path = write(tmp_path, "excel.csv", PLACES.encode("cp949"))
+    with server.open_upload_rows(path, "excel.csv") as (header, rows):
+        assert header == ["name", "description"]
+        assert next(rows) == ["경복궁", "조선의 법궁"]
+
+
+def test_upload_rows_closed_when_import_fails(tmp_path):
+    path = write(tmp_path, "excel.csv", PLACES.encode("cp949"))
+    with pytest.raises(RuntimeError):
+        with server.open_upload_rows(path, "excel.csv") as (header, rows):
+            handle = rows
+            raise RuntimeError("import failed")
+    with pytest.raises(ValueError):
+        next(handle)  # csv.reader over a closed file